@@ -20,6 +20,12 @@ class UserClipSettingsModel(ormar.Model):
     audio_threshold: str = ormar.String(max_length=200, nullable=True)  # noqa: WPS432
     sound_check: bool = ormar.Boolean(default=True)
     crop_interval: str = ormar.String(max_length=200, nullable=True)  # noqa: WPS432
+    analysis_mode: str = ormar.String(
+        max_length=20,  # noqa: WPS432
+        default="full",
+        nullable=True,
+        regex="^full$|^coarse$|^audio$",
+    )
 
 
 class UserModel(ormar.Model):
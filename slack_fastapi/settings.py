@@ -150,6 +150,14 @@ class Settings(BaseSettings):
     trained_models: List[str] = [
         Path(path).name for path in glob("trained_models/*.joblib")
     ]
+    slackcutter_cache_dir: str = "temp/cache/"
+    slackcutter_cache_max_bytes: int = 2 * 1024**3
+    # Sources this long or longer are analysed in bounded-memory streaming mode
+    slackcutter_streaming_min_seconds: int = 1800
+    # Parallel ffmpeg decoders per clip job
+    slackcutter_analysis_shards: int = os.cpu_count() or 1
+    # Most similar later scenes every scene is paired with, 0 - all scene pairs
+    slackcutter_pairing_neighbours: int = 0
 
     # Variables for the database
     db_host: str = os.getenv("SLACK_FASTAPI_DB_HOST", "localhost")
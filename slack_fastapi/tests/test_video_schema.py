@@ -0,0 +1,55 @@
+import pytest
+from pydantic import ValidationError
+
+from slack_fastapi.web.api.video.schema import ClipCreateSchema
+
+
+@pytest.mark.anyio
+async def test_clip_output_name_optional_with_outputs() -> None:
+    """Tests that output_name can be left out when outputs are set."""
+    clip_creation_object = ClipCreateSchema(
+        id=1,
+        outputs=[
+            {"output_name": "short"},
+            {"output_name": "long_clip", "max_seconds_lenght": 60},
+        ],
+    )
+
+    assert clip_creation_object.output_name is None
+    assert [output.output_name for output in clip_creation_object.outputs] == [
+        "short",
+        "long_clip",
+    ]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "request_body",
+    [
+        {"id": 1},
+        {"id": 1, "outputs": []},
+        {"id": 1, "outputs": [{"output_name": "clips"}, {"output_name": "clips"}]},
+    ],
+    ids=["no_name", "empty_outputs", "repeated_names"],
+)
+async def test_clip_create_rejects(request_body: dict) -> None:
+    """
+    Tests that a clip request without a name, or with bad outputs, is rejected.
+
+    :param request_body: ClipCreateSchema fields.
+    """
+    with pytest.raises(ValidationError):
+        ClipCreateSchema(**request_body)
+
+
+@pytest.mark.anyio
+async def test_clip_create_reports_bad_output_once() -> None:
+    """Tests that an invalid output is reported alone, without a missing name error."""
+    with pytest.raises(ValidationError) as exc_info:
+        ClipCreateSchema(
+            id=1,
+            outputs=[{"output_name": "clips", "max_seconds_lenght": 0}],
+        )
+
+    errors = exc_info.value.errors()
+    assert [error["loc"] for error in errors] == [("outputs", 0, "max_seconds_lenght")]
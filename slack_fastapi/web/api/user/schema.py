@@ -17,6 +17,11 @@ class UserClipSettingsSchema(BaseModel):
     audio_threshold: Optional[List[int]] = [25, 75]
     crop_interval: Optional[List[int]] = [1, 5]
     sound_check: Optional[bool] = True
+    # "coarse" analyses only the loudest regions of long sources
+    analysis_mode: Optional[str] = Field(
+        default="full",
+        regex="^full$|^coarse$|^audio$",
+    )
 
     @root_validator
     def validate_fields(  # noqa: N805, C901, WPS238, WPS231
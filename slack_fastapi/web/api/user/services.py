@@ -64,6 +64,7 @@ class UserHandler:
             ),
             crop_interval=list(map(int, user.clip_settings.crop_interval.split(","))),
             sound_check=user.clip_settings.sound_check,
+            analysis_mode=user.clip_settings.analysis_mode,
         )
 
     @staticmethod
@@ -1,6 +1,6 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, root_validator
 
 from slack_fastapi.web.api.generics.schemas import IdSchema, IdStrictSchema
 
@@ -29,10 +29,104 @@ class ClipSchema(VideoSchema):
     link: str = Field(max_length=1000)
 
 
-class ClipCreateSchema(IdStrictSchema):
-    """ClipCreateSchema model."""
+class ClipOutputSchema(BaseModel):
+    """ClipOutputSchema model."""
 
     output_name: str = Field(min_length=5, max_length=20)  # noqa: WPS432
+    max_seconds_lenght: Optional[int] = Field(ge=1, default=None)
+    sound_check: Optional[bool] = None
+
+
+class ClipRangeSchema(IdStrictSchema):
+    """ClipRangeSchema model."""
+
+    # Part of the source analysed for the clip, in seconds; unset - the whole source
+    start: Optional[int] = Field(ge=0, default=None)
+    end: Optional[int] = Field(ge=1, default=None)
+
+    @root_validator
+    def validate_range(  # noqa: N805
+        cls,  # noqa: N805
+        values: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """
+        Checks that the range is not empty.
+
+        :raises ValueError: Incorrect input
+        :param values: Dict
+        :return: values
+        """
+        start, end = values.get("start"), values.get("end")
+        if start is not None and end is not None and start >= end:
+            raise ValueError("start must be less than end")
+
+        return values
+
+
+class ClipCreateSchema(ClipRangeSchema):
+    """ClipCreateSchema model."""
+
+    # Clip name when outputs is unset, ignored otherwise
+    output_name: Optional[str] = Field(
+        min_length=5,
+        max_length=20,  # noqa: WPS432
+        default=None,
+    )
+    # Variants rendered from one analysis, unset fields fall back to user's clip settings
+    outputs: Optional[List[ClipOutputSchema]] = None
+
+    @root_validator
+    def validate_outputs(  # noqa: N805
+        cls,  # noqa: N805
+        values: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """
+        Checks that a clip name is given and output names are unique.
+
+        :raises ValueError: Incorrect input
+        :param values: Dict
+        :return: values
+        """
+        outputs = values.get("outputs")
+        # A missing key means that field already failed its own validation
+        if (
+            "outputs" in values
+            and outputs is None
+            and "output_name" in values
+            and values["output_name"] is None
+        ):
+            raise ValueError("Either output_name or outputs must be set.")
+        if outputs is not None:
+            if not outputs:
+                raise ValueError("outputs must contain at least one output")
+            names = [output.output_name for output in outputs]
+            if len(set(names)) != len(names):
+                raise ValueError("Output names must be unique.")
+
+        return values
+
+
+class ClipsCreatedSchema(IdSchema):
+    """ClipsCreatedSchema model."""
+
+    ids: List[int]
+
+
+class ClipSegmentSchema(BaseModel):
+    """ClipSegmentSchema model."""
+
+    start_sec: int = Field(ge=0)
+    end_sec: int = Field(ge=0)
+    pair: int = Field(ge=0)
+    probability: float = Field(ge=0, le=1)
+    score: float = Field(ge=0)
+
+
+class ClipPlanSchema(IdSchema):
+    """ClipPlanSchema model."""
+
+    duration: int = Field(ge=0)
+    segments: List[ClipSegmentSchema]
 
 
 class AllVideosSchema(BaseModel):
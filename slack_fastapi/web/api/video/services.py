@@ -1,14 +1,12 @@
 import asyncio
 import os
 import shutil
-from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any, Callable, Dict, List, Optional, Tuple
 from urllib.parse import quote
 
 import aioboto3
 import botocore.exceptions  # noqa: WPS301
-import ffmpeg
 import slackcutter
 from fastapi import HTTPException, UploadFile, status
 from fastapi.responses import Response
@@ -27,13 +25,24 @@ from slack_fastapi.web.api.video.schema import (
     AllClipsSchema,
     AllVideosSchema,
     ClipCreateSchema,
+    ClipOutputSchema,
+    ClipPlanSchema,
+    ClipRangeSchema,
     ClipSchema,
+    ClipSegmentSchema,
+    ClipsCreatedSchema,
     VideoPropertiesSchema,
     VideoSchema,
 )
 
 bodylog = LoggerMethods.get_bodies_logger()
 
+# Analysis results shared by all clip jobs, keyed by source md5 and settings.
+analysis_cache = slackcutter.AnalysisCache(  # type: ignore
+    settings.slackcutter_cache_dir,
+    settings.slackcutter_cache_max_bytes,
+)
+
 
 class VideoHandler:
     """Class for media operations."""
@@ -254,45 +263,28 @@ class VideoHandler:
         :param audio_content_type: Audio content type (mime type) if attached audio exists
         :return: VideoPropertiesSchema
         """
-        path = Path(settings.temp_dir)
-        path.mkdir(parents=True, exist_ok=True)
-
-        video_path = path.joinpath(video_dict["md5name"])
-
-        with open(video_path, "wb") as f:  # type: ignore # noqa WPS111
-            f.write(video_dict["body"])  # type: ignore
-
-        for codec in ffmpeg.probe(video_path)["streams"]:
-            if codec["codec_type"] == "video":
-                vid = codec
+        # One memoized ffprobe per content md5, the body is piped without a temp file.
+        media_info = await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: slackcutter.media_probe.probe(  # type: ignore
+                video_dict["body"],
+                content_hash=video_dict["md5name"].split(".")[0],
+            ),
+        )
 
         if video_dict["content_type"] == "video/webm":
-            dt = (
-                datetime.strptime(
-                    vid["tags"]["DURATION"][:-3],
-                    "%H:%M:%S.%f",  # noqa: WPS221
-                ),
-            )
-            video_duration = (
-                timedelta(
-                    hours=dt.hour,  # type: ignore
-                    minutes=dt.minute,  # type: ignore
-                    seconds=dt.second,  # type: ignore
-                    microseconds=dt.microsecond,  # type: ignore
-                ).total_seconds()
-                * 1000
-            )
+            video_duration = media_info.video_duration * 1000
         elif video_dict["content_type"] == "video/mp4":
-            video_duration = int(float(vid["duration"]) * 1000000)  # noqa: WPS432
-
-        video_path.unlink()
+            video_duration = int(
+                media_info.video_duration * 1000000,  # noqa: WPS432
+            )
 
         return VideoPropertiesSchema(
             duration=video_duration,
             video_content_type=video_dict["content_type"],
             audio_content_type=audio_content_type,
-            frame_width=vid["width"],
-            frame_height=vid["height"],
+            frame_width=media_info.width,
+            frame_height=media_info.height,
             size=len(video_dict["body"]),
         )
 
@@ -823,27 +815,25 @@ class VideoHandler:
         await clip_model.video_properties.delete()
 
     @staticmethod
-    async def create_clip(  # noqa: WPS217, WPS210, WPS231, C901, WPS213
-        clip_creation_object: ClipCreateSchema,
+    async def create_slackcutter(  # noqa: WPS210, WPS231
+        request_object: ClipRangeSchema,
+        user: Any,
         user_email: str,
         video_dao: VideoDAO,
-        user_dao: UserDAO,
-    ) -> IdSchema:
+        output_name: str = "output.mp4",
+    ) -> Tuple[Any, Path]:
         """
-        Generates clip, uploades it to S3 bucket and creates DB record.
+        Downloads source media to user's temp folder and sets SlackCutter up with user's clip settings.
 
         :raises HTTPException: CREATION_IN_PROCESS
         :raises HTTPException: SLACKCUTTER_ERROR
-        :param clip_creation_object: ClipCreateSchema
+        :param request_object: Request schema with VideoModel's id and analysed seconds range
+        :param user: UserModel with clip settings
         :param user_email: User's email
         :param video_dao: VideoDAO
-        :param user_dao: UserDAO
-        :return: IdSchema
+        :param output_name: Clip file name
+        :return: SlackCutter and user's temp folder, removed by the caller
         """
-        user = general_access_check(
-            await user_dao.get_user(email=user_email, select_related=True),
-        )
-
         temp_path = Path(
             settings.temp_dir,
             Generics.string2md5(user_email),
@@ -854,7 +844,7 @@ class VideoHandler:
                 LoggerMessages.exception(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="CREATION_IN_PROCESS",
-                    clip_creation_object=clip_creation_object.dict(),
+                    request_object=request_object.dict(),
                 ),
             )
             raise HTTPException(
@@ -863,7 +853,7 @@ class VideoHandler:
             )
 
         video_model = await VideoHandler.get_video_model(
-            video_id=clip_creation_object.id,
+            video_id=request_object.id,
             user_id=user.id,  # type: ignore
             video_dao=video_dao,
         )
@@ -913,17 +903,45 @@ class VideoHandler:
             callback=callback,
         )
 
-        slackcutter.config.temp_folder = temp_path.joinpath("slack").as_posix()  # type: ignore
-        slackcutter.config.output_folder = temp_path.joinpath("output").as_posix()  # type: ignore
+        workspace = slackcutter.Workspace(  # type: ignore
+            temp_dir=temp_path.joinpath("slack"),
+            output_dir=temp_path.joinpath("output"),
+        )
 
-        clip_name = clip_creation_object.output_name + ".mp4"  # noqa: WPS336
+        source_path = temp_path.joinpath(video_dict["name"])
+        source_hash = video_model.video_key.split("/")[-2].split(".")[0]
 
         try:
+            # Stored durations are in ms for webm and in us for mp4, so the seconds
+            # come from the same memoized probe SlackCutter checks the range with.
+            media_info = await asyncio.get_running_loop().run_in_executor(
+                None,
+                lambda: slackcutter.media_probe.probe(  # type: ignore
+                    source_path,
+                    content_hash=source_hash,
+                ),
+            )
+            source_seconds = media_info.duration
+            # Streaming is picked by the analysed length, the range when it's set.
+            analysed_seconds = min(
+                request_object.end or source_seconds,
+                source_seconds,
+            ) - (request_object.start or 0)
+            # SlackCutter wants clips shorter than the analysed length, so a range
+            # shorter than the user's clip length gets a clip just shorter than it.
+            max_seconds_length = max(
+                min(
+                    user.clip_settings.max_seconds_lenght,  # type: ignore
+                    int(analysed_seconds) - 1,
+                ),
+                1,
+            )
+
             slack = slackcutter.SlackCutter(  # type: ignore
-                source_name=temp_path.joinpath(video_dict["name"]).as_posix(),
+                source_name=source_path.as_posix(),
                 trained_model_name=user.clip_settings.trained_model,  # type: ignore
-                output_name=clip_name,
-                max_seconds_length=user.clip_settings.max_seconds_lenght,  # type: ignore
+                output_name=output_name,
+                max_seconds_length=max_seconds_length,
                 model_threshold=user.clip_settings.model_threshold,  # type: ignore
                 sound_check=user.clip_settings.sound_check,  # type: ignore
                 noice_threshold=list(
@@ -934,6 +952,16 @@ class VideoHandler:
                 ),
                 median_hit_modificator=user.clip_settings.median_hit_modificator,  # type: ignore
                 crop_interval=list(map(int, user.clip_settings.crop_interval.split(","))),  # type: ignore
+                workspace=workspace,
+                cache=analysis_cache,
+                source_hash=source_hash,
+                streaming=analysed_seconds
+                >= settings.slackcutter_streaming_min_seconds,
+                analysis_shards=settings.slackcutter_analysis_shards,
+                pairing_neighbours=settings.slackcutter_pairing_neighbours,
+                analysis_mode=user.clip_settings.analysis_mode,  # type: ignore
+                start=request_object.start,
+                end=request_object.end,
             )
         except Exception as e:
             shutil.rmtree(temp_path.as_posix())
@@ -942,29 +970,26 @@ class VideoHandler:
                 detail=f"SLACKCUTTER_ERROR, ERROR TYPE: {e}",
             )
 
-        try:
-            slack.make_clip()
-        except Exception as ex:
-            shutil.rmtree(temp_path.as_posix())
-
-            bodylog.debug(
-                LoggerMessages.exception(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="SLACKCUTTER_ERROR",
-                    clip_creation_object=clip_creation_object.dict(),
-                    error_type=ex,
-                ),
-            )
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"SLACKCUTTER_ERROR, ERROR TYPE: {ex}",
-            )
-
-        with open(temp_path.joinpath("output", clip_name).as_posix(), "rb") as f:
-            clip_body = f.read()
+        return slack, temp_path
 
-        shutil.rmtree(temp_path.as_posix())
+    @staticmethod
+    async def store_clip(  # noqa: WPS210
+        user: Any,
+        user_email: str,
+        clip_name: str,
+        clip_body: bytes,
+        video_dao: VideoDAO,
+    ) -> ClipModel:
+        """
+        Uploads rendered clip to S3 bucket and creates DB record if it's new.
 
+        :param user: UserModel
+        :param user_email: User's email
+        :param clip_name: Clip file name
+        :param clip_body: Clip file content
+        :param video_dao: VideoDAO
+        :return: ClipModel
+        """
         clip_dict = {
             "name": clip_name,
             "md5name": await VideoHandler.generate_md5_filename(
@@ -1018,8 +1043,201 @@ class VideoHandler:
                 properties_object=clip_properties,
             )
 
-        return IdSchema(
-            id=clip_model.id,
+        return clip_model
+
+    @staticmethod
+    async def create_clip(  # noqa: WPS217, WPS210, WPS231, C901, WPS213
+        clip_creation_object: ClipCreateSchema,
+        user_email: str,
+        video_dao: VideoDAO,
+        user_dao: UserDAO,
+    ) -> ClipsCreatedSchema:
+        """
+        Generates clips, uploades them to S3 bucket and creates DB records.
+
+        Every output variant is rendered from one analysis of the source.
+
+        :raises HTTPException: CREATION_IN_PROCESS
+        :raises HTTPException: SLACKCUTTER_ERROR, 400 when a variant is longer than the source
+        :param clip_creation_object: ClipCreateSchema
+        :param user_email: User's email
+        :param video_dao: VideoDAO
+        :param user_dao: UserDAO
+        :return: ClipsCreatedSchema
+        """
+        user = general_access_check(
+            await user_dao.get_user(email=user_email, select_related=True),
+        )
+
+        outputs = clip_creation_object.outputs or [
+            ClipOutputSchema(output_name=clip_creation_object.output_name),
+        ]
+
+        slack, temp_path = await VideoHandler.create_slackcutter(
+            request_object=clip_creation_object,
+            user=user,
+            user_email=user_email,
+            video_dao=video_dao,
+            output_name=outputs[0].output_name + ".mp4",  # noqa: WPS336
+        )
+        workspace = slack.workspace
+
+        # Every variant's length is checked against the source (or range) here,
+        # so a bad variant fails the request before the analysis is started;
+        # variants without a length take the user's one, fitted to the range.
+        default_seconds = slack.max_clip_seconds_lenght
+        try:
+            for output in outputs:
+                slack.max_clip_seconds_lenght = (
+                    output.max_seconds_lenght or default_seconds
+                )
+        except Exception as ex:
+            shutil.rmtree(temp_path.as_posix())
+
+            bodylog.debug(
+                LoggerMessages.exception(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="SLACKCUTTER_ERROR",
+                    clip_creation_object=clip_creation_object.dict(),
+                    error_type=ex,
+                ),
+            )
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"SLACKCUTTER_ERROR, ERROR TYPE: {output.output_name}: {ex}",
+            )
+        slack.max_clip_seconds_lenght = default_seconds
+
+        def make_clips() -> List[str]:  # noqa: WPS430
+            # One analysis and ranking, then every variant is cut from the plan.
+            slack.plan()
+
+            clip_names = []
+            for output in outputs:
+                clip_name = output.output_name + ".mp4"  # noqa: WPS336
+                slack.output_name = clip_name
+                slack.max_clip_seconds_lenght = (
+                    output.max_seconds_lenght or default_seconds
+                )
+                slack.sound_check = (
+                    user.clip_settings.sound_check  # type: ignore
+                    if output.sound_check is None
+                    else output.sound_check
+                )
+                slack.render()
+                clip_names.append(clip_name)
+
+            return clip_names
+
+        try:
+            # Blocking pipeline runs in the default executor, so the event loop
+            # keeps serving requests and other users' clips run concurrently.
+            clip_names = await asyncio.get_running_loop().run_in_executor(
+                None,
+                make_clips,
+            )
+        except Exception as ex:
+            shutil.rmtree(temp_path.as_posix())
+
+            bodylog.debug(
+                LoggerMessages.exception(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="SLACKCUTTER_ERROR",
+                    clip_creation_object=clip_creation_object.dict(),
+                    error_type=ex,
+                ),
+            )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"SLACKCUTTER_ERROR, ERROR TYPE: {ex}",
+            )
+
+        clip_bodies = []
+        for clip_name in clip_names:
+            with open(workspace.output_dir.joinpath(clip_name).as_posix(), "rb") as f:
+                clip_bodies.append(f.read())
+
+        shutil.rmtree(temp_path.as_posix())
+
+        clip_ids = []
+        for clip_name, clip_body in zip(clip_names, clip_bodies):
+            clip_model = await VideoHandler.store_clip(
+                user=user,
+                user_email=user_email,
+                clip_name=clip_name,
+                clip_body=clip_body,
+                video_dao=video_dao,
+            )
+            clip_ids.append(clip_model.id)
+
+        return ClipsCreatedSchema(
+            id=clip_ids[0],
+            ids=clip_ids,
+        )
+
+    @staticmethod
+    async def preview_clip(  # noqa: WPS210
+        id_object: ClipRangeSchema,
+        user_email: str,
+        video_dao: VideoDAO,
+        user_dao: UserDAO,
+    ) -> ClipPlanSchema:
+        """
+        Chooses clip segments with user's clip settings without rendering the clip.
+
+        :raises HTTPException: CREATION_IN_PROCESS
+        :raises HTTPException: SLACKCUTTER_ERROR
+        :param id_object: ClipRangeSchema with VideoModel's id and optional start/end seconds
+        :param user_email: User's email
+        :param video_dao: VideoDAO
+        :param user_dao: UserDAO
+        :return: ClipPlanSchema
+        """
+        user = general_access_check(
+            await user_dao.get_user(email=user_email, select_related=True),
+        )
+
+        slack, temp_path = await VideoHandler.create_slackcutter(
+            request_object=id_object,
+            user=user,
+            user_email=user_email,
+            video_dao=video_dao,
+        )
+
+        try:
+            clip_plan = await asyncio.get_running_loop().run_in_executor(
+                None,
+                slack.plan,
+            )
+        except Exception as ex:
+            bodylog.debug(
+                LoggerMessages.exception(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="SLACKCUTTER_ERROR",
+                    id_object=id_object.dict(),
+                    error_type=ex,
+                ),
+            )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"SLACKCUTTER_ERROR, ERROR TYPE: {ex}",
+            )
+        finally:
+            shutil.rmtree(temp_path.as_posix())
+
+        return ClipPlanSchema(
+            id=id_object.id,
+            duration=int((clip_plan["end_sec"] - clip_plan["start_sec"]).sum()),
+            segments=[
+                ClipSegmentSchema(
+                    start_sec=segment.start_sec,
+                    end_sec=segment.end_sec,
+                    pair=segment.pair,
+                    probability=segment.propaility,
+                    score=segment.score,
+                )
+                for segment in clip_plan.itertuples()
+            ],
         )
 
     @staticmethod
@@ -17,6 +17,9 @@ from slack_fastapi.web.api.video.schema import (
     AllClipsSchema,
     AllVideosSchema,
     ClipCreateSchema,
+    ClipPlanSchema,
+    ClipRangeSchema,
+    ClipsCreatedSchema,
 )
 from slack_fastapi.web.api.video.services import VideoHandler
 
@@ -116,22 +119,22 @@ async def get_videos(
 
 @router.post(
     "/clip",
-    response_model=IdSchema,
+    response_model=ClipsCreatedSchema,
 )
 async def create_clip(
     clip_creation_object: ClipCreateSchema,
     user_email: str = Depends(token_handler.auth_wrapper),
     video_dao: VideoDAO = Depends(),
     user_dao: UserDAO = Depends(),
-) -> IdSchema:
+) -> ClipsCreatedSchema:
     """
-    Endpoint to create clip and made entries in S3 bucket and DB.
+    Endpoint to create clips and made entries in S3 bucket and DB.
 
-    :param clip_creation_object: VideoModel's id and future clip name
+    :param clip_creation_object: VideoModel's id, future clip name and optional output variants
     :param user_email: User's email
     :param video_dao: VideoDAO
     :param user_dao: UserDAO
-    :return: ClipModel's id
+    :return: First ClipModel's id and ids of every variant
     """
     return await video_handler.create_clip(
         clip_creation_object=clip_creation_object,
@@ -141,6 +144,33 @@ async def create_clip(
     )
 
 
+@router.post(
+    "/video/clip/preview",
+    response_model=ClipPlanSchema,
+)
+async def preview_clip(
+    id_object: ClipRangeSchema,
+    user_email: str = Depends(token_handler.auth_wrapper),
+    video_dao: VideoDAO = Depends(),
+    user_dao: UserDAO = Depends(),
+) -> ClipPlanSchema:
+    """
+    Endpoint to get clip segments chosen with user's settings without rendering the clip.
+
+    :param id_object: ClipRangeSchema with VideoModel's id and optional start/end seconds
+    :param user_email: User's email
+    :param video_dao: VideoDAO
+    :param user_dao: UserDAO
+    :return: ClipPlanSchema
+    """
+    return await video_handler.preview_clip(
+        id_object=id_object,
+        user_email=user_email,
+        video_dao=video_dao,
+        user_dao=user_dao,
+    )
+
+
 @router.delete(
     "/clip",
     response_model=SuccessResponse,
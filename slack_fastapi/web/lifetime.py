@@ -1,8 +1,12 @@
+from pathlib import Path
 from typing import Awaitable, Callable
 
+import slackcutter
 from fastapi import FastAPI
+from loguru import logger
 
 from slack_fastapi.db.config import database
+from slack_fastapi.settings import settings
 
 
 def register_startup_event(
@@ -21,7 +25,14 @@ def register_startup_event(
     @app.on_event("startup")
     async def _startup() -> None:  # noqa: WPS430
         await database.connect()
-        pass  # noqa: WPS420
+        # Models are memory-mapped, so every worker shares their pages.
+        # A broken model only fails the clips that use it, on first use.
+        failed = slackcutter.model_registry.preload(
+            Path(slackcutter.config.trained_models_folder, model_name)
+            for model_name in settings.trained_models
+        )
+        for model_path, error in failed.items():
+            logger.warning(f"Trained model {model_path} is not preloaded: {error!r}")
 
     return _startup
 
@@ -2,3 +2,9 @@
 from slackcutter import config
 from slackcutter.core import SlackCutter
 from slackcutter.jobs import Jobs
+from slackcutter.registry import ModelRegistry, model_registry
+from slackcutter.profiler import PipelineProfile
+from slackcutter.workspace import Workspace
+from slackcutter.cache import AnalysisCache
+from slackcutter.forest import CompiledForest
+from slackcutter.probe import MediaInfo, MediaProbe, media_probe
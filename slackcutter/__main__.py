@@ -0,0 +1,4 @@
+"""Batch clip making, see slackcutter.batch."""
+from slackcutter.batch import main
+
+main()
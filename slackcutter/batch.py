@@ -0,0 +1,267 @@
+"""
+Batch clip making over a directory or manifest of sources.
+
+Run with ``python -m slackcutter sources/ --settings settings.json --output-dir clips/``.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Iterator, Union
+
+from slackcutter import config
+from slackcutter.cache import AnalysisCache
+from slackcutter.core import SlackCutter
+from slackcutter.jobs import Jobs
+from slackcutter.registry import model_registry
+from slackcutter.workspace import Workspace
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".avi", ".webm")
+
+
+def read_jobs(sources: Union[str, Path]) -> list[dict]:
+    """
+    Return clip jobs of a source directory or manifest.
+
+    A directory gives one job per video file in it. A .json manifest is a
+    list of source paths or of objects with "source" and optional
+    "output_name" and SlackCutter settings overriding the settings file.
+    Any other file lists one source path per line.
+
+    :param sources: Directory, .json manifest or text manifest.
+    :return: Jobs with "source", "output_name" and "settings".
+    """
+    sources = Path(sources)
+
+    if sources.is_dir():
+        entries: list = sorted(
+            path.as_posix()
+            for path in sources.iterdir()
+            if path.suffix.lower() in VIDEO_EXTENSIONS
+        )
+    elif sources.suffix.lower() == ".json":
+        entries = json.loads(sources.read_text(encoding="utf-8"))
+    else:
+        entries = [
+            line.strip()
+            for line in sources.read_text(encoding="utf-8").splitlines()
+            if line.strip() and not line.startswith("#")
+        ]
+
+    jobs = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"source": entry}
+
+        entry = dict(entry)
+        source = Path(entry.pop("source"))
+        if not source.is_absolute() and not sources.is_dir():
+            source = sources.parent / source
+
+        jobs.append(
+            {
+                "source": source.as_posix(),
+                "output_name": entry.pop("output_name", f"{source.stem}.mp4"),
+                "settings": entry,
+            },
+        )
+
+    return jobs
+
+
+def init_worker(models_folder: str, model_names: list) -> None:
+    """
+    Prepare a pool process: point config at the models and load them once.
+
+    Every job of the process then takes its model from model_registry.
+
+    :param models_folder: config.trained_models_folder of the batch.
+    :param model_names: Models used by the batch (ex: ["RanFor_Action Sports.joblib"]).
+    """
+    config.trained_models_folder = models_folder
+    model_registry.preload(Path(models_folder, name) for name in model_names)
+
+
+def run_job(
+    job: dict,
+    settings: dict,
+    output_dir: str,
+    cache_dir: Union[str, None] = None,
+) -> dict:
+    """
+    Make one clip and return its report line.
+
+    The clip is analysed in a temporary workspace and rendered to a hidden
+    temporary directory inside output_dir, then moved next to it only when
+    it's complete. An interrupted batch never leaves an output that a
+    resumed batch would skip, and the move never crosses filesystems.
+
+    :param job: Job from read_jobs.
+    :param settings: SlackCutter keyword arguments of the batch.
+    :param output_dir: Directory for the clips.
+    :param cache_dir: AnalysisCache directory shared by the pool, None - no caching.
+    :return: Report line.
+    """
+    output_dest = Path(output_dir, job["output_name"])
+    report: dict[str, Any] = {
+        "source": job["source"],
+        "output": output_dest.as_posix(),
+        "pid": os.getpid(),
+    }
+
+    started = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory(
+            prefix="slackcutter-batch-",
+        ) as temp_dir, tempfile.TemporaryDirectory(
+            prefix=".slackcutter-batch-",
+            dir=output_dest.parent,
+        ) as render_dir:
+            slack = SlackCutter(
+                job["source"],
+                output_name=output_dest.name,
+                workspace=Workspace(
+                    temp_dir=Path(temp_dir, "slack"),
+                    output_dir=Path(render_dir),
+                ),
+                cache=AnalysisCache(cache_dir) if cache_dir else None,
+                **{**settings, **job["settings"]},
+            )
+            slack.make_clip()
+            os.replace(slack.output_name, output_dest)
+
+        wall_time = time.perf_counter() - started
+        source_seconds = Jobs.probe_duration(Path(job["source"]))
+        report.update(
+            status="done",
+            wall_time=round(wall_time, 3),
+            source_seconds=round(source_seconds, 3),
+            realtime_factor=round(source_seconds / wall_time, 3),
+            stages=[stage.to_dict() for stage in slack.profile.stages],
+        )
+    except Exception as ex:
+        report.update(
+            status="failed",
+            wall_time=round(time.perf_counter() - started, 3),
+            error=f"{type(ex).__name__}: {ex}",
+        )
+
+    return report
+
+
+def run_batch(
+    jobs: list,
+    settings: dict,
+    output_dir: Union[str, Path],
+    workers: int,
+    cache_dir: Union[str, None] = None,
+) -> Iterator[dict]:
+    """
+    Run the jobs in a bounded process pool, skipping finished outputs.
+
+    :param jobs: Jobs from read_jobs.
+    :param settings: SlackCutter keyword arguments, "trained_model_name" is required.
+    :param output_dir: Directory for the clips.
+    :param workers: Pool processes.
+    :param cache_dir: AnalysisCache directory shared by the pool, None - no caching.
+    :return: Iterator of report lines in completion order.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    pending = []
+    for job in jobs:
+        output_dest = output_dir / job["output_name"]
+        if output_dest.is_file():
+            yield {
+                "source": job["source"],
+                "output": output_dest.as_posix(),
+                "status": "skipped",
+            }
+        else:
+            pending.append(job)
+
+    if not pending:
+        return
+
+    model_names = sorted(
+        {
+            job["settings"].get("trained_model_name", settings["trained_model_name"])
+            for job in pending
+        },
+    )
+    with ProcessPoolExecutor(
+        max_workers=max(1, min(workers, len(pending))),
+        initializer=init_worker,
+        initargs=(config.trained_models_folder, model_names),
+    ) as pool:
+        futures = [
+            pool.submit(run_job, job, settings, output_dir.as_posix(), cache_dir)
+            for job in pending
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main() -> None:
+    """Parse arguments, run the batch and write the report."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("sources", type=Path, help="directory or manifest of sources")
+    parser.add_argument(
+        "--settings",
+        type=Path,
+        required=True,
+        help="JSON file with SlackCutter arguments, trained_model_name is required",
+    )
+    parser.add_argument("--output-dir", type=Path, default=Path(config.output_folder))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--report", type=Path, default=None, help="JSON lines report")
+    parser.add_argument("--cache-dir", default=None, help="shared analysis cache")
+    parser.add_argument(
+        "--models-folder",
+        default=config.trained_models_folder,
+        help="directory with the trained models",
+    )
+    args = parser.parse_args()
+
+    config.trained_models_folder = args.models_folder
+    settings = json.loads(args.settings.read_text(encoding="utf-8"))
+    jobs = read_jobs(args.sources)
+    report_dest = args.report or args.output_dir / "batch_report.jsonl"
+
+    started = time.perf_counter()
+    counts = {"done": 0, "skipped": 0, "failed": 0}
+    source_seconds = 0.0
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    with open(report_dest, "a", encoding="utf-8") as report:
+        for line in run_batch(
+            jobs,
+            settings,
+            args.output_dir,
+            args.workers,
+            args.cache_dir,
+        ):
+            report.write(json.dumps(line, ensure_ascii=False) + "\n")
+            report.flush()
+
+            counts[line["status"]] += 1
+            source_seconds += line.get("source_seconds", 0)
+            print(
+                f"{line['status']:<8} {line.get('wall_time', 0):>8.2f}s "
+                f"{line['source']}" + (f"  {line['error']}" if "error" in line else ""),
+            )
+
+    wall_time = time.perf_counter() - started
+    print(
+        f"{len(jobs)} sources: {counts['done']} done, {counts['skipped']} skipped, "
+        f"{counts['failed']} failed in {wall_time:.1f}s, "
+        f"{source_seconds / max(wall_time, 1e-9):.1f} source seconds per second",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Synthetic benchmarks of the slackcutter analysis stages."""
@@ -0,0 +1,97 @@
+"""
+Recall of nearest-neighbour scene pairing against all scene combinations.
+
+Run with ``python -m slackcutter.benchmarks.pairing video.mp4 --model model.joblib``.
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from slackcutter.core import SlackCutter
+from slackcutter.workspace import Workspace
+
+
+def plan_source(
+    source: Path,
+    model: str,
+    max_seconds: int,
+    neighbours: int,
+) -> tuple:
+    """
+    Plan a clip of the source with the given pairing.
+
+    :param source: Video file.
+    :param model: Trained model name (ex: RanFor_Action Sports.joblib).
+    :param max_seconds: Clip's length in seconds (ex: 30).
+    :param neighbours: pairing_neighbours, 0 - every scene combination.
+    :return: (clip segments, scored pairs, seconds).
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        slack = SlackCutter(
+            source.as_posix(),
+            model,
+            max_seconds_length=max_seconds,
+            workspace=Workspace(
+                temp_dir=Path(temp_dir, "slack"),
+                output_dir=Path(temp_dir, "output"),
+            ),
+            pairing_neighbours=neighbours,
+        )
+
+        started = time.perf_counter()
+        clip_plan = slack.plan()
+        seconds = time.perf_counter() - started
+
+    pairs = sum(
+        stage.counts.get("pairs", 0)
+        for stage in slack.profile.stages
+        if stage.name == "predict"
+    )
+    segments = set(zip(clip_plan["start_sec"], clip_plan["end_sec"]))
+
+    return segments, pairs, seconds
+
+
+def main() -> None:
+    """Compare clip segments of every pairing with all combinations."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("sources", nargs="+", type=Path, help="sample videos")
+    parser.add_argument("--model", required=True, help="trained model name")
+    parser.add_argument("--max-seconds", type=int, default=30)
+    parser.add_argument(
+        "--neighbours",
+        type=int,
+        nargs="+",
+        default=[8, 16, 32, 64],
+        help="pairing_neighbours values",
+    )
+    args = parser.parse_args()
+
+    print(f"{'source':<24} {'neighbours':>10} {'pairs':>10} {'recall':>7} {'s':>7}")
+    for source in args.sources:
+        exhaustive, pairs, seconds = plan_source(
+            source,
+            args.model,
+            args.max_seconds,
+            0,
+        )
+        print(f"{source.name:<24} {'all':>10} {pairs:>10} {1:>7.3f} {seconds:>7.2f}")
+
+        for neighbours in args.neighbours:
+            segments, pairs, seconds = plan_source(
+                source,
+                args.model,
+                args.max_seconds,
+                neighbours,
+            )
+            # доля сегментов клипа из всех сочетаний, которые нашлись и здесь
+            recall = len(segments & exhaustive) / max(len(exhaustive), 1)
+            print(
+                f"{source.name:<24} {neighbours:>10} {pairs:>10} "
+                f"{recall:>7.3f} {seconds:>7.2f}",
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark of Jobs.rank_modelled_scenes on synthetic candidate pairs.
+
+Run with ``python -m slackcutter.benchmarks.ranking``.
+"""
+import argparse
+import time
+
+import numpy as np
+from slackcutter.jobs import Jobs
+from slackcutter.scenes import PairIndex, SceneTable
+
+
+def synthetic_pairs(pair_quantity: int, seed: int = 0) -> tuple:
+    """
+    Build a pair frame and probabilities of about pair_quantity pairs.
+
+    :param pair_quantity: Wanted number of candidate pairs (ex: 10 ** 6).
+    :param seed: Random seed.
+    :return: (pairs_for_deltas_df, propaility).
+    """
+    rng = np.random.default_rng(seed)
+
+    # PairIndex дает (S - 1) * (S - 2) / 2 пар
+    scene_quantity = int(np.ceil(np.sqrt(2 * pair_quantity))) + 2
+    lengths = rng.integers(1, 5, scene_quantity)
+    end = np.cumsum(lengths)
+    start = end - lengths
+    median_hits = rng.integers(0, 2, int(end[-1]) + 1)
+
+    scenes = SceneTable.from_ranges(
+        np.zeros((len(median_hits), 1, 3), dtype=np.uint8),
+        median_hits,
+        start,
+        end,
+    )
+    pairs_for_deltas_df = PairIndex(scene_quantity).to_frame(scenes)
+
+    return pairs_for_deltas_df, rng.random(len(pairs_for_deltas_df))
+
+
+def main() -> None:
+    """Time the ranking for every requested pair quantity."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--pairs",
+        type=int,
+        nargs="+",
+        default=[10**4, 10**5, 10**6],
+        help="candidate pair quantities",
+    )
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'pairs':>10} {'passed':>10} {'chosen':>8} {'best, s':>9}")
+    for pair_quantity in args.pairs:
+        pairs_for_deltas_df, propaility = synthetic_pairs(pair_quantity)
+
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            target_df = Jobs.rank_modelled_scenes(
+                pairs_for_deltas_df,
+                propaility,
+                args.threshold,
+            )
+            timings.append(time.perf_counter() - started)
+
+        print(
+            f"{len(pairs_for_deltas_df):>10} "
+            f"{int((propaility > args.threshold).sum()):>10} "
+            f"{len(target_df):>8} {min(timings):>9.3f}",
+        )
+
+
+if __name__ == "__main__":
+    main()
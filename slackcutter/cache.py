@@ -0,0 +1,151 @@
+"""Content-addressed on-disk cache of SlackCutter analysis stages."""
+import hashlib
+import json
+import os
+import pickle  # noqa: S403
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Union
+
+import joblib
+from slackcutter import config
+
+# bump when the layout of any cached stage result changes
+CACHE_VERSION = 3
+
+
+class AnalysisCache:
+    """
+    Cache of per-stage analysis results keyed by source content and stage parameters.
+
+    Every stage key is a hash of the stage name, the parameters the stage
+    depends on and the key of the upstream stage, so changing a setting only
+    invalidates the stages downstream of it. Entries are evicted in least
+    recently used order once the cache outgrows max_bytes.
+    """
+
+    __suffix = ".joblib"
+
+    def __init__(
+        self,
+        root: Union[str, Path],
+        max_bytes: int = config.analysis_cache_max_bytes,
+    ):
+        """
+        Constructor of the cache.
+
+        :param root: Cache directory, may be shared by several processes (ex: temp/cache).
+        :param max_bytes: Disk budget of the cache in bytes (ex: 2 * 1024 ** 3).
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def file_hash(path: Union[str, Path]) -> str:
+        """
+        Return md5 of the file content.
+
+        :param path: File path.
+        :return: md5 hex digest.
+        """
+        digest = hashlib.md5()  # noqa: S324
+        with open(path, "rb") as fp:
+            for chunk in iter(lambda: fp.read(1024 * 1024), b""):
+                digest.update(chunk)
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def key(stage: str, **params: Any) -> str:
+        """
+        Return cache key of the stage.
+
+        :param stage: Stage name (ex: "pairs").
+        :param params: Everything the stage result depends on, including upstream key.
+        :return: Hex digest.
+        """
+        payload = json.dumps(
+            {"stage": stage, "version": CACHE_VERSION, "params": params},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Any:
+        """
+        Return cached value or None on a miss.
+
+        :param key: Key from AnalysisCache.key.
+        :return: Cached value or None.
+        """
+        path = self.__path(key)
+        try:
+            value = joblib.load(path)
+            os.utime(path)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            # missing, evicted by a concurrent job or partially written
+            return None
+
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Store value under the key and evict old entries if over budget.
+
+        :param key: Key from AnalysisCache.key.
+        :param value: Picklable value (arrays, data frames, lists).
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        # write to a temp file first, so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        os.close(fd)
+        try:
+            joblib.dump(value, temp_path)
+            os.replace(temp_path, self.__path(key))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self.evict()
+
+    def fetch(self, key: str, compute: Callable[[], Any]) -> tuple[Any, bool]:
+        """
+        Return cached value, computing and storing it on a miss.
+
+        :param key: Key from AnalysisCache.key.
+        :param compute: Function producing the value.
+        :return: Value and True if it came from the cache.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, True
+
+        value = compute()
+        self.put(key, value)
+        return value, False
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the cache fits max_bytes."""
+
+        entries = []
+        for path in self.root.glob(f"*{self.__suffix}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+
+    def __path(self, key: str) -> Path:
+        return self.root / f"{key}{self.__suffix}"
@@ -8,8 +8,65 @@ temp_images_folder = "images"
 txt_list_name = "vid_names.txt"
 temp_video = "test_video_6_720p.mp4"
 temp_audio = "sample_low.mp3"
-temp_map_json = "target.json"
+checkpoint_stages = False
 
 extractImages_need_save = False
 extractImages_output_choice = False
 extractImages_pixel_quantity = 6
+extractImages_sample_rate = 1
+extractImages_frame_height = 720
+
+# "pipe" - один проход ffmpeg в память, "files" - временные видео и mp3 в temp
+analysis_input = "pipe"
+analysis_audio_rate = 8000
+
+trained_models_cache_size = 4
+trained_models_mmap_mode = "r"
+# брать .npz из python -m slackcutter.forest вместо .joblib, если он не старше модели:
+# без sklearn в воркере и вдвое меньше памяти, но большие батчи numpy считает медленнее
+trained_models_compiled = False
+
+# "concat" - один запуск ffmpeg по исходнику, "segments" - нарезка в save и склейка,
+# "smart" - точные резы: копия между ключевыми кадрами, перекодирование краев GOP
+render_mode = "concat"
+smart_cut_crf = 18
+smart_cut_preset = "veryfast"
+# звук smart клипа перекодируется по точным границам сегментов
+smart_cut_audio_codec = "aac"
+
+# печать прогресса пайплайна в stdout
+verbose = False
+
+analysis_cache_max_bytes = 2 * 1024**3
+
+# потоковый анализ длинных исходников: pcm декодируется окнами по streaming_window_seconds
+# и сразу сжимается в статистику по секундам, пары сцен считаются блоками не больше
+# streaming_memory_limit байт; лимит ограничивает только пары - строки кадров и аудио
+# статистика (около 50 байт на секунду исходника) хранятся целиком, потому что
+# перцентили ударов считаются по всему исходнику до нарезки сцен
+analysis_streaming = False
+streaming_window_seconds = 60
+streaming_memory_limit = 256 * 1024**2
+
+# параллельное декодирование кадров шардами по времени, 1 - один проход;
+# шард не короче analysis_shard_min_seconds, декодирование с запасом analysis_shard_margin секунд
+analysis_shards = 1
+analysis_shard_min_seconds = 30
+analysis_shard_margin = 2
+
+# пары сцен: 0 - все сочетания, N - только N ближайших по kd-дереву
+# поздних сцен для каждой сцены (последний кадр сцены с первым кадром партнера)
+pairing_neighbours = 0
+
+# "full" - анализ всего исходника, "coarse" - сначала только аудио удары по окнам
+# coarse_window_seconds, затем полный анализ лучших окон суммарно на coarse_coverage
+# длин клипа, с запасом coarse_margin_seconds с каждой стороны;
+# "audio" - только аудио: сцены по ударам без кадров и модели (лекции, подкасты, трибуны)
+analysis_mode = "full"
+coarse_window_seconds = 10
+coarse_coverage = 8
+coarse_margin_seconds = 5
+
+# общий ffprobe: результаты по хэшу содержимого, ключевые кадры только с начала видео
+media_probe_cache_size = 256
+media_probe_keyframe_seconds = 30
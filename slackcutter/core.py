@@ -1,14 +1,20 @@
-import datetime
-import json
+import itertools
 import os
 import subprocess
 from pathlib import Path
-from shutil import rmtree
-from typing import Union
+from typing import Any, Callable, Iterable, Union
 
+import numpy as np
 import pandas as pd
 from slackcutter import config
+from slackcutter.cache import AnalysisCache
 from slackcutter.jobs import Jobs
+from slackcutter.probe import MediaInfo, media_probe
+from slackcutter.profiler import PipelineProfile
+from slackcutter.registry import model_registry
+from slackcutter.scenes import PairIndex, SceneTable
+from slackcutter.streaming import PairStream, iter_scene_bounds
+from slackcutter.workspace import Workspace
 
 
 class SlackCutter:
@@ -29,6 +35,15 @@ class SlackCutter:
         audio_threshold: list = [25, 75],
         median_hit_modificator: float = 1.5,
         crop_interval: list = [1, 5],
+        workspace: Union[Workspace, None] = None,
+        cache: Union[AnalysisCache, None] = None,
+        source_hash: Union[str, None] = None,
+        streaming: Union[bool, None] = None,
+        analysis_shards: Union[int, None] = None,
+        pairing_neighbours: Union[int, None] = None,
+        analysis_mode: Union[str, None] = None,
+        start: Union[int, None] = None,
+        end: Union[int, None] = None,
     ):
         """
         Constructor to handle user input.
@@ -39,19 +54,38 @@ class SlackCutter:
         :param max_seconds_length: Clip's lenght in seconds (ex: 150).
         :param model_threshold: Magic. (ex: 0.2)
         :param sound_check: Clip's sound presence. True - with sound, False - without (ex: True).
-        :param noice_threshold: Magic. (ex: [10, 90])
+        :param noice_threshold: Magic, not used by the analysis. (ex: [10, 90])
         :param audio_threshold: Magic. (ex: [25, 75])
         :param median_hit_modificator: Magic. (ex: 1.5)
         :param crop_interval: Magic. (ex: [1, 5])
+        :param workspace: Job's own directories. Concurrent jobs need different workspaces.
+                          None - directories from config.temp_folder and config.output_folder.
+        :param cache: Analysis cache to reuse stage results between runs. None - no caching.
+        :param source_hash: Content hash of the source (ex: md5 from the S3 key).
+                            None - md5 of the source file, computed only when cache is used.
+        :param streaming: Analysis for long sources with scene pairs scored in blocks bounded by
+                          config.streaming_memory_limit. None - config.analysis_streaming.
+        :param analysis_shards: Parallel ffmpeg decoders splitting the source timeline (ex: 16).
+                                None - config.analysis_shards.
+        :param pairing_neighbours: Most similar later scenes each scene is paired with, 0 - every
+                                   later scene (ex: 32). None - config.pairing_neighbours.
+        :param analysis_mode: "full", "coarse" - audio pass over the whole source, then full
+                              analysis of the best regions only, or "audio" - scenes ranked by
+                              audio hits alone, no video is decoded. None - config.analysis_mode.
+        :param start: Second of the source the analysis starts at (ex: 720). None - the beginning.
+        :param end: Second of the source the analysis ends at (ex: 1200). None - the end.
         """
-        self.__output_dir = Path(config.output_folder)
-        self.__map_dest = Path(config.temp_folder, config.map_folder)
-        self.__temp_media_dest = Path(config.temp_folder, config.temp_media_folder)
-        self.__temp_images_dest = Path(config.temp_folder, config.temp_images_folder)
+        self.workspace = workspace if workspace is not None else Workspace.from_config()
+        self.__output_dir = self.workspace.output_dir
+        self.__map_dest = self.workspace.map_dir
+        self.__temp_media_dest = self.workspace.media_dir
+        self.__temp_images_dest = self.workspace.images_dir
 
+        self.__source_hash = source_hash
         self.source_dest = source_name  # type: ignore
         self.output_name = output_name  # type: ignore
         self.trained_model = trained_model_name  # type: ignore
+        self.analysis_window = [start, end]  # type: ignore
         self.max_clip_seconds_lenght = max_seconds_length
         self.model_threshold = model_threshold
         self.sound_check = sound_check
@@ -60,21 +94,29 @@ class SlackCutter:
         self.median_hit_modificator = median_hit_modificator
         self.crop_interval = crop_interval
 
-    def recreate_folders(self) -> None:
-        """Creates main used folders by application and deletes existing."""
-
-        temp_dir = Path(config.temp_folder)
+        self.cache = cache
+        self.streaming = config.analysis_streaming if streaming is None else streaming
+        self.analysis_shards = (
+            config.analysis_shards if analysis_shards is None else analysis_shards
+        )
+        self.pairing_neighbours = (
+            config.pairing_neighbours
+            if pairing_neighbours is None
+            else pairing_neighbours
+        )
+        self.analysis_mode = (
+            config.analysis_mode if analysis_mode is None else analysis_mode
+        )
 
-        if temp_dir.is_dir():
-            rmtree(temp_dir)
+        self.profile = PipelineProfile()
+        self.clip_plan: Union[pd.DataFrame, None] = None
+        self.__secs_crop_list: Union[list, None] = None
+        self.__keyframes: Union[np.ndarray, None] = None
 
-        if self.__output_dir.is_dir():
-            rmtree(self.__output_dir)
+    def recreate_folders(self) -> None:
+        """Creates main used folders by application and deletes existing."""
 
-        self.__output_dir.mkdir(parents=True, exist_ok=True)
-        self.__map_dest.mkdir(parents=True, exist_ok=True)
-        self.__temp_media_dest.mkdir(parents=True, exist_ok=True)
-        self.__temp_images_dest.mkdir(parents=True, exist_ok=True)
+        self.workspace.recreate()
 
     def generate_temp_media(self) -> None:
         """Generates application's temp media."""
@@ -89,7 +131,15 @@ class SlackCutter:
             pass
 
         subprocess.run(
-            ["ffmpeg", "-i", self.source_dest, "-vf", "scale=6:720", temp_video_dest],
+            [
+                "ffmpeg",
+                *Jobs.input_window(self.analysis_window),
+                "-i",
+                self.source_dest,
+                "-vf",
+                "scale=6:720",
+                temp_video_dest,
+            ],
         )
         subprocess.run(
             [
@@ -109,133 +159,747 @@ class SlackCutter:
         )
 
     def make_clip(self) -> None:
-        """Makes clip with user settings and outputs it in output folder."""
+        """
+        Makes clip with user settings and outputs it in output folder.
 
-        self.recreate_folders()
-        self.generate_temp_media()
+        Per-stage timings and item counts are collected in self.profile.
+        """
+
+        self.plan()
+        self.render()
 
-        frame_pixels = self.__generate_frame_pixels()  # noqa: F841
-        sound_seconds_dict = self.__generate_frame_audio_samples()  # noqa: F841
-        fin_deltas_df = self.__generate_fin_deltas_df()
+    def plan(self) -> pd.DataFrame:
+        """
+        Chooses clip segments with user settings without rendering them.
+
+        The plan is kept for render, per-stage timings and item counts are
+        collected in self.profile.
+
+        :return: Data frame with start_sec, end_sec, pair, propaility and score
+                 of every clip segment, in clip order.
+        """
+
+        self.profile = PipelineProfile()
+        self.recreate_folders()
 
-        frames_map = Jobs.scenes_split_on_median(
-            fin_deltas_df,
-            self.__median_hit_modificator,
+        if self.analysis_mode == "audio":
+            return self.__plan_audio()
+
+        pair_stream = None
+        if self.analysis_mode == "coarse":
+            pairs_for_deltas_df, propaility_list = self.__analyse_coarse()
+        elif self.streaming:
+            pair_stream = self.__analyse_streaming()
+        else:
+            pairs_for_deltas_df, propaility_list = self.__analyse()
+
+        with self.profile.stage("rank") as stage:
+            if pair_stream is not None:
+                target_df = pair_stream.rank()
+                pair_stream.cleanup()
+            else:
+                target_df = Jobs.rank_modelled_scenes(
+                    pairs_for_deltas_df,
+                    propaility_list,
+                    self.__model_threshold,
+                )
+            target_df = self.__to_source_time(target_df)
+            self.__secs_crop_list = Jobs.prepare_secs_crop_list(target_df)
+            self.clip_plan = Jobs.clip_plan(target_df, self.max_clip_seconds_lenght)
+            stage.count(
+                pairs=len(target_df),
+                segments=len(self.__secs_crop_list),
+                planned=len(self.clip_plan),
+            )
+
+        self.__checkpoint(
+            "target",
+            **{column: target_df[column].to_numpy() for column in target_df},
         )
-        print("длина frames_map:", len(frames_map))
 
-        df_cropframes = Jobs.scene_mapping(frames_map, *self.crop_interval)
-        print("длина df_cropframes:", len(df_cropframes))
+        return self.clip_plan
+
+    def sweep(
+        self,
+        model_thresholds: Union[Iterable[Union[int, float]], None] = None,
+        median_hit_modificators: Union[Iterable[Union[int, float]], None] = None,
+        crop_intervals: Union[Iterable[list], None] = None,
+    ) -> list[tuple[dict, pd.DataFrame]]:
+        """
+        Plans the clip for every combination of the given settings.
+
+        Frames, audio and deltas are analysed once. Scene splits, pair
+        features and model probabilities are computed once per
+        median_hit_modificator and crop_interval combination, and all
+        model_thresholds are ranked from one sort of those pairs. Full and
+        coarse analysis modes are supported; audio mode and streaming are not.
+
+        :param model_thresholds: Thresholds to try (ex: [0.2, 0.3]). None - current model_threshold.
+        :param median_hit_modificators: Modificators to try (ex: [1.2, 1.5]).
+                                        None - current median_hit_modificator.
+        :param crop_intervals: Crop intervals to try (ex: [[1, 5], [2, 6]]). None - current crop_interval.
+        :return: (settings, plan) for every combination, plans as returned by plan.
+        """
+
+        if self.analysis_mode == "audio":
+            raise Exception(
+                "sweep needs pair probabilities, audio analysis mode has none.",
+            )
+        if self.streaming:
+            raise Exception("sweep keeps every pair in memory, turn streaming off.")
 
-        fin_pairs_df = Jobs.create_all_single_scenes(df_cropframes, fin_deltas_df)
-        pairs_for_deltas_df = Jobs.create_all_scenes_combinations(fin_pairs_df)
-        pairs_for_deltas_df = Jobs.create_frame_deltas_pairs(
-            pairs_for_deltas_df,
-            self.max_frame_quantity,
-            self.delta_type,
+        settings = {
+            "model_threshold": self.model_threshold,
+            "median_hit_modificator": self.median_hit_modificator,
+            "crop_interval": self.crop_interval,
+        }
+
+        self.profile = PipelineProfile()
+        self.recreate_folders()
+
+        plans = []
+        results: dict = {}
+        try:
+            # сеттер проверяет каждый порог до анализа
+            model_thresholds = list(model_thresholds or [self.model_threshold])
+            for model_threshold in model_thresholds:
+                self.model_threshold = model_threshold
+
+            for median_hit_modificator, crop_interval in itertools.product(
+                median_hit_modificators or [self.median_hit_modificator],
+                crop_intervals or [self.crop_interval],
+            ):
+                self.median_hit_modificator = median_hit_modificator
+                self.crop_interval = crop_interval
+
+                # медиа и дельты общие для всей сетки, пары - свои у каждой комбинации
+                results.pop("pairs", None)
+                if self.analysis_mode == "coarse":
+                    pairs_for_deltas_df, propaility_list = self.__analyse_coarse(
+                        results,
+                    )
+                else:
+                    pairs_for_deltas_df, propaility_list = self.__analyse(results)
+
+                with self.profile.stage("rank") as stage:
+                    target_dfs = Jobs.rank_modelled_scenes_grid(
+                        pairs_for_deltas_df,
+                        propaility_list,
+                        model_thresholds,
+                    )
+                    for model_threshold, target_df in zip(model_thresholds, target_dfs):
+                        plans.append(
+                            (
+                                {
+                                    "model_threshold": model_threshold,
+                                    "median_hit_modificator": self.median_hit_modificator,
+                                    "crop_interval": self.crop_interval,
+                                },
+                                Jobs.clip_plan(
+                                    self.__to_source_time(target_df),
+                                    self.max_clip_seconds_lenght,
+                                ),
+                            ),
+                        )
+                    stage.count(
+                        pairs=len(pairs_for_deltas_df),
+                        thresholds=len(model_thresholds),
+                    )
+        finally:
+            for name, value in settings.items():
+                setattr(self, name, value)
+
+        Jobs.log(self.profile.to_json(indent=2))
+        return plans
+
+    def render(self) -> None:
+        """Renders the clip of the last plan and outputs it in output folder."""
+
+        if self.__secs_crop_list is None:
+            raise Exception("No clip plan to render, call plan() first.")
+        if not self.__secs_crop_list:
+            raise Exception("No scenes in the analysed range, nothing to render.")
+
+        secs_crop_list = self.__secs_crop_list
+        keyframes = self.__keyframe_index() if config.render_mode == "smart" else None
+
+        with self.profile.stage("render") as stage:
+            if config.render_mode == "segments":
+                fin_names = Jobs.crop_vid(
+                    secs_crop_list,
+                    self.source_dest,
+                    self.__output_dir,
+                    self.sound_check,
+                    self.max_clip_seconds_lenght,
+                )
+
+                input_list_dest = Path(self.__output_dir, config.txt_list_name)
+                Jobs.connect_vids_and_delete(
+                    input_list_dest,
+                    self.__output_dest,
+                    self.sound_check,
+                    fin_names,
+                )
+                stage.count(segments=len(fin_names))
+            elif config.render_mode == "smart":
+                segments, parts = Jobs.render_clip_smart(
+                    secs_crop_list,
+                    self.source_dest,
+                    self.__output_dest,
+                    self.sound_check,
+                    self.max_clip_seconds_lenght,
+                    keyframes,
+                    self.__temp_media_dest,
+                )
+                stage.count(
+                    segments=len(segments),
+                    copied_parts=sum(part[3] for part in parts),
+                    encoded_seconds=round(
+                        sum(part[1] - part[0] for part in parts if not part[3]),
+                        3,
+                    ),
+                )
+            else:
+                segments = Jobs.render_clip(
+                    secs_crop_list,
+                    self.source_dest,
+                    self.__output_dest,
+                    self.sound_check,
+                    self.max_clip_seconds_lenght,
+                )
+                stage.count(segments=len(segments))
+
+        Jobs.log(self.profile.to_json(indent=2))
+
+    def __analyse(
+        self,
+        results: Union[dict, None] = None,
+    ) -> tuple[pd.DataFrame, np.ndarray]:
+        # стадии анализа до вероятностей модели; с кэшем каждая стадия
+        # берется из него по ключу своих параметров и ключа предыдущей стадии,
+        # так что при смене настройки пересчитываются только стадии ниже нее;
+        # results - уже посчитанные стадии, sweep передает их между комбинациями
+        keys = self.__stage_keys() if self.cache is not None else {}
+        results = {} if results is None else results
+
+        def media() -> tuple:
+            if "media" not in results:
+                results["media"] = self.__cached(
+                    "media",
+                    keys.get("media"),
+                    self.__analyse_media,
+                )
+            return results["media"]
+
+        def deltas() -> pd.DataFrame:
+            if "deltas" not in results:
+                results["deltas"] = self.__cached(
+                    "deltas",
+                    keys.get("deltas"),
+                    lambda: self.__build_deltas(*media()),
+                )
+            return results["deltas"]
+
+        def pairs() -> tuple:
+            if "pairs" not in results:
+                results["pairs"] = self.__cached(
+                    "pairs",
+                    keys.get("pairs"),
+                    lambda: self.__build_pairs(deltas()),
+                )
+            return results["pairs"]
+
+        propaility_list = self.__cached(
+            "probabilities",
+            keys.get("probabilities"),
+            lambda: self.__predict(*pairs()[1:]),
         )
-        pairs_for_deltas_df = Jobs.add_median_hit_statistics(pairs_for_deltas_df)
-        comparison_df, dict_data_new = Jobs.calculate_rgb_frame_deltas(
-            pairs_for_deltas_df,
-            self.max_frame_quantity,
-            self.delta_type,
+
+        return pairs()[0], propaility_list
+
+    def __plan_audio(self) -> pd.DataFrame:
+        # только аудио поток: сцены по ударам и их доли вместо пикселей и модели,
+        # видео не декодируется вовсе, нарезка та же
+        audio_stats = self.__audio_stats()
+
+        with self.profile.stage("rank") as stage:
+            scenes_df = Jobs.rank_audio_scenes(
+                audio_stats,
+                *self.audio_threshold,
+                self.__median_hit_modificator,
+                *self.crop_interval,
+            )
+            if self.analysis_window is not None:
+                scenes_df[["start_sec", "end_sec"]] += self.analysis_window[0]
+
+            self.__secs_crop_list = (
+                scenes_df[["start_sec", "end_sec"]].to_numpy().tolist()
+            )
+            self.clip_plan = Jobs.audio_clip_plan(
+                scenes_df,
+                self.max_clip_seconds_lenght,
+            )
+            stage.count(
+                scenes=len(scenes_df),
+                planned=len(self.clip_plan),
+            )
+
+        return self.clip_plan
+
+    def __audio_stats(self) -> np.ndarray:
+        # аудио статистика всего исходника (или окна), общая для audio и coarse режимов
+        key = (
+            AnalysisCache.key(
+                "audio",
+                source=self.source_hash,
+                audio_rate=config.analysis_audio_rate,
+                window=self.analysis_window,
+            )
+            if self.cache is not None
+            else None
         )
-        list_data_new, dict_razmetka = Jobs.markup_frame_pixels(
-            dict_data_new,
-            self.max_frame_quantity,
+
+        def decode_audio() -> np.ndarray:
+            with self.profile.stage("audio") as stage:
+                audio_stats = Jobs.decode_audio_stats(
+                    self.source_dest,
+                    config.analysis_audio_rate,
+                    config.streaming_window_seconds,
+                    self.analysis_window,
+                )
+                stage.count(seconds=len(audio_stats))
+
+            return audio_stats
+
+        return self.__cached("audio", key, decode_audio)
+
+    def __analyse_coarse(
+        self,
+        results: Union[dict, None] = None,
+    ) -> tuple[pd.DataFrame, np.ndarray]:
+        # грубый проход: аудио всего исходника и выбор регионов по ударам,
+        # точный проход: кадры только внутри регионов; удары и границы сцен
+        # считаются по всему исходнику, как в полном анализе, и в пары идут
+        # сцены полного анализа, целиком лежащие в регионах;
+        # results - уже посчитанные стадии, как у __analyse
+        results = {} if results is None else results
+        if "media" not in results:
+            results["media"] = self.__coarse_media()
+        frame_pixels, decoded, median_hits = results["media"]
+
+        if "pairs" not in results:
+            with self.profile.stage("scene_split") as stage:
+                scenes = SceneTable.from_bounds(
+                    frame_pixels,
+                    median_hits,
+                    iter_scene_bounds(median_hits, self.__median_hit_modificator),
+                    *self.crop_interval,
+                )
+                stage.count(seconds=len(median_hits), source_scenes=len(scenes))
+                scenes = scenes.within(decoded)
+                stage.count(scenes=len(scenes))
+
+            results["pairs"] = self.__pair_scenes(scenes)
+        pairs_for_deltas_df, features = results["pairs"]
+
+        return pairs_for_deltas_df, self.__predict(features)
+
+    def __coarse_media(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # кадры на всю длину исходника (нули вне регионов), флаги декодированных
+        # секунд и удары по медиане с перцентилями всего исходника
+        audio_stats = self.__audio_stats()
+        seconds = len(audio_stats)
+
+        with self.profile.stage("coarse") as stage:
+            median_hits = Jobs.audio_hit_flags(audio_stats, *self.audio_threshold)[:, 0]
+            regions = Jobs.coarse_regions(
+                median_hits,
+                config.coarse_window_seconds,
+                config.coarse_coverage * self.max_clip_seconds_lenght,
+                config.coarse_margin_seconds,
+            )
+            stage.count(
+                seconds=seconds,
+                regions=len(regions),
+                region_seconds=sum(end - start for start, end in regions),
+            )
+
+        key = (
+            AnalysisCache.key(
+                "coarse_frames",
+                source=self.source_hash,
+                window=self.analysis_window,
+                regions=regions,
+                sample_rate=config.extractImages_sample_rate,
+                pixel_quantity=config.extractImages_pixel_quantity,
+                frame_height=config.extractImages_frame_height,
+            )
+            if self.cache is not None
+            else None
         )
-        propaility_list = Jobs.predict_and_make_dataset(
-            self.trained_model,
-            dict_razmetka,
-            self.max_frame_quantity,
-            comparison_df,
+        frame_rows, source_seconds = self.__cached(
+            "coarse_frames",
+            key,
+            lambda: self.__decode_coarse_frames(regions, seconds),
         )
 
-        path_map = Path(self.__map_dest, config.temp_map_json)
-        target_df = Jobs.rank_modelled_scenes(
-            pairs_for_deltas_df,
-            propaility_list,
-            self.__model_threshold,
+        frame_pixels = np.zeros(
+            (seconds, config.extractImages_pixel_quantity, 3),
+            dtype=np.uint8,
         )
-        target_df.to_json(path_map, orient="records", lines=True)
-
-        target_df = pd.read_json(path_map, orient="records", lines=True)
-        secs_crop_list = Jobs.prepare_secs_crop_list(target_df)
-        fin_names = Jobs.crop_vid(
-            secs_crop_list,
-            self.source_dest,
-            self.__output_dir,
-            self.sound_check,
-            self.max_clip_seconds_lenght,
+        frame_pixels[source_seconds] = frame_rows
+        decoded = np.zeros(seconds, dtype=bool)
+        decoded[source_seconds] = True
+
+        return frame_pixels, decoded, median_hits
+
+    def __decode_coarse_frames(
+        self,
+        regions: list,
+        seconds: int,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # кадры регионов подряд и секунды исходника (от начала окна) каждого кадра
+        with self.profile.stage("frames") as stage:
+            offset = self.analysis_window[0] if self.analysis_window else 0
+            frame_regions = Jobs.decode_frames_regions(
+                self.source_dest,
+                [[start + offset, end + offset] for start, end in regions],
+                self.analysis_shards,
+            )
+
+            region_seconds = [
+                np.arange(start, min(start + len(frames), seconds))
+                for (start, _), frames in zip(regions, frame_regions)
+            ]
+            frame_rows = np.concatenate(
+                [
+                    frames[: len(second)]
+                    for frames, second in zip(frame_regions, region_seconds)
+                ]
+                or [
+                    np.empty(
+                        (0, config.extractImages_pixel_quantity, 3),
+                        dtype=np.uint8,
+                    ),
+                ],
+            )
+            source_seconds = np.concatenate(
+                region_seconds or [np.empty(0, dtype=np.int64)],
+            )
+            stage.count(frames=len(frame_rows), regions=len(regions))
+
+        return frame_rows, source_seconds
+
+    def __analyse_streaming(self) -> PairStream:
+        # длинные исходники: окна декодирования, компактные сводки сцен
+        # и пары блоками под config.streaming_memory_limit, в кэш идут только медиа;
+        # строки кадров и аудио статистика всего исходника в памяти (десятки байт
+        # на секунду), перцентилям ударов нужен весь исходник
+        media_key = self.__stage_keys()["media"] if self.cache is not None else None
+        frame_pixels, audio_stats = self.__cached(
+            "media",
+            media_key,
+            self.__stream_analysis_media,
         )
 
-        input_list_dest = Path(self.__output_dir, config.txt_list_name)
-        Jobs.connect_vids_and_delete(
-            input_list_dest,
-            self.__output_dest,
-            self.sound_check,
-            fin_names,
+        with self.profile.stage("scene_split") as stage:
+            seconds = min(len(frame_pixels), len(audio_stats))
+            median_hits = Jobs.audio_hit_flags(audio_stats, *self.audio_threshold)
+            median_hits = median_hits[:seconds, 0]
+
+            scenes = SceneTable.from_bounds(
+                frame_pixels[:seconds],
+                median_hits,
+                iter_scene_bounds(median_hits, self.__median_hit_modificator),
+                *self.crop_interval,
+            )
+            stage.count(seconds=seconds, scenes=len(scenes))
+
+        with self.profile.stage("predict") as stage:
+            pair_stream = PairStream(
+                scenes,
+                self.__map_dest,
+                pairs=self.__pair_index(scenes) if self.pairing_neighbours else None,
+            )
+            pair_stream.score(
+                model_registry.get(self.trained_model),
+                self.__model_threshold,
+                self.max_frame_quantity,
+                self.delta_type,
+            )
+            stage.count(
+                pairs=pair_stream.pairs,
+                passed=pair_stream.passed,
+                blocks=pair_stream.blocks,
+            )
+
+        return pair_stream
+
+    def __stage_keys(self) -> dict[str, str]:
+        media_key = AnalysisCache.key(
+            "media",
+            source=self.source_hash,
+            # потоковое декодирование дает те же медиа, что и "pipe"
+            analysis_input="pipe" if self.streaming else config.analysis_input,
+            sample_rate=config.extractImages_sample_rate,
+            pixel_quantity=config.extractImages_pixel_quantity,
+            frame_height=config.extractImages_frame_height,
+            audio_rate=config.analysis_audio_rate,
+            window=self.analysis_window,
+        )
+        deltas_key = AnalysisCache.key(
+            "deltas",
+            media=media_key,
+            audio_threshold=self.audio_threshold,
+        )
+        pairs_key = AnalysisCache.key(
+            "pairs",
+            deltas=deltas_key,
+            median_hit_modificator=self.median_hit_modificator,
+            crop_interval=self.crop_interval,
+            max_frame_quantity=self.max_frame_quantity,
+            delta_type=self.delta_type,
+            pairing_neighbours=self.pairing_neighbours,
+        )
+        model_path = model_registry.resolve(self.trained_model)
+        probabilities_key = AnalysisCache.key(
+            "probabilities",
+            pairs=pairs_key,
+            model=model_path.as_posix(),
+            model_mtime=model_path.stat().st_mtime_ns,
         )
 
-    def __generate_frame_pixels(self) -> dict:
-        # job 1
+        return {
+            "media": media_key,
+            "deltas": deltas_key,
+            "pairs": pairs_key,
+            "probabilities": probabilities_key,
+        }
+
+    def __to_source_time(self, target_df: pd.DataFrame) -> pd.DataFrame:
+        # секунды анализа считаются от начала окна, нарезке нужны секунды исходника
+        if self.analysis_window is None:
+            return target_df
+
+        target_df = target_df.copy()
+        for column in (
+            "first_frame_timestamp_0",
+            "last_frame_timestamp_0",
+            "first_frame_timestamp_1",
+            "last_frame_timestamp_1",
+        ):
+            target_df[column] += self.analysis_window[0]
+
+        return target_df
+
+    def __keyframe_index(self) -> np.ndarray:
+        # индекс ключевых кадров исходника для точной нарезки, один раз на исходник:
+        # в памяти для всех рендеров этого объекта и в кэше анализа между запусками
+        if self.__keyframes is None:
+            with self.profile.stage("keyframes") as stage:
+                key = (
+                    AnalysisCache.key("keyframes", source=self.source_hash)
+                    if self.cache is not None
+                    else None
+                )
+                self.__keyframes = self.__cached(
+                    "keyframes",
+                    key,
+                    lambda: Jobs.probe_keyframes(self.source_dest),
+                )
+                stage.count(keyframes=len(self.__keyframes))
+
+        return self.__keyframes
+
+    def __cached(
+        self,
+        name: str,
+        key: Union[str, None],
+        compute: Callable[[], Any],
+    ) -> Any:
+        if self.cache is None or key is None:
+            return compute()
 
-        begin_time = datetime.datetime.now()
+        with self.profile.stage(f"cache:{name}") as stage:
+            value = self.cache.get(key)
+            stage.count(hit=value is not None)
 
-        path_to_video = Path(self.__temp_media_dest, config.temp_video)
-        path_to_images = self.__temp_images_dest
-        frame_pixels = Jobs.extractImages(path_to_video, path_to_images)
+        if value is None:
+            value = compute()
+            self.cache.put(key, value)
 
-        print("длина frame_pixels:", len(frame_pixels))
+        return value
 
-        print(datetime.datetime.now() - begin_time)
+    def __analyse_media(self) -> tuple[np.ndarray, np.ndarray]:
+        # кадры (секунды, пиксели, 3) и аудио статистика (секунды, 4)
+        if self.analysis_shards > 1 and config.analysis_input == "pipe":
+            return self.__shard_analysis_media()
 
-        # первый слой - номер кадра, второй слой - номер пикселя
-        with open(self.__map_dest.joinpath("frame_pixels.json").as_posix(), "w") as fp:
-            json.dump(frame_pixels, fp)
+        if config.analysis_input == "pipe":
+            return self.__decode_analysis_media()
 
-        return frame_pixels
+        return self.__generate_temp_analysis_media()
 
-    def __generate_frame_audio_samples(self) -> dict:
-        # job 3
+    def __build_deltas(
+        self,
+        frame_pixels: np.ndarray,
+        audio_stats: np.ndarray,
+    ) -> pd.DataFrame:
+        with self.profile.stage("deltas") as stage:
+            sound_seconds = np.hstack(
+                (audio_stats, Jobs.audio_hit_flags(audio_stats, *self.audio_threshold)),
+            )
+            self.__checkpoint(
+                "frame_media",
+                frame_pixels=frame_pixels,
+                sound_seconds=sound_seconds,
+            )
+
+            fin_deltas_df = Jobs.pixel_delta_analizer_job7(frame_pixels, sound_seconds)
+            stage.count(
+                seconds=len(fin_deltas_df),
+                median_hits=fin_deltas_df["удар_по_медиане"].sum(),
+            )
 
-        path_to_audio = Path(self.__temp_media_dest, config.temp_audio)
-        sound_seconds_dict = Jobs.audio_info_extractor_job7(
-            path_to_audio, *self.audio_threshold
-        )
+        return fin_deltas_df
 
-        print("длина sound_seconds_dict:", len(sound_seconds_dict))
+    def __build_pairs(self, fin_deltas_df: pd.DataFrame) -> tuple:
+        with self.profile.stage("scene_split") as stage:
+            frames_map = Jobs.scenes_split_on_median(
+                fin_deltas_df,
+                self.__median_hit_modificator,
+            )
+            df_cropframes = Jobs.scene_mapping(frames_map, *self.crop_interval)
+            scenes = SceneTable.from_cropframes(df_cropframes, fin_deltas_df)
+            stage.count(boundaries=len(frames_map), scenes=len(scenes))
+
+        return self.__pair_scenes(scenes)
+
+    def __pair_scenes(self, scenes: SceneTable) -> tuple:
+        # пары сцен и признаки модели для них
+        with self.profile.stage("pairs") as stage:
+            pairs = self.__pair_index(scenes)
+            pairs_for_deltas_df = pairs.to_frame(scenes)
+            stage.count(scenes=len(scenes), pairs=len(pairs))
+
+        with self.profile.stage("features") as stage:
+            features = pairs.features(
+                scenes,
+                self.max_frame_quantity,
+                self.delta_type,
+            )
+            stage.count(pairs=len(features), columns=features.shape[1])
+
+        return pairs_for_deltas_df, features
+
+    def __pair_index(self, scenes: SceneTable) -> PairIndex:
+        # все сочетания сцен или только ближайшие кандидаты
+        if self.pairing_neighbours:
+            return PairIndex.nearest(
+                scenes,
+                self.pairing_neighbours,
+                self.max_frame_quantity,
+            )
+
+        return PairIndex(len(scenes))
+
+    def __predict(self, features: np.ndarray) -> np.ndarray:
+        with self.profile.stage("predict") as stage:
+            propaility_list = Jobs.predict_pairs(self.trained_model, features)
+            stage.count(pairs=len(propaility_list))
+
+        return propaility_list
+
+    def __generate_temp_analysis_media(self) -> tuple[np.ndarray, np.ndarray]:
+        # job 1 + job 3 через временные видео и mp3 в temp
+
+        with self.profile.stage("frames") as stage:
+            self.generate_temp_media()
+
+            path_to_video = Path(self.__temp_media_dest, config.temp_video)
+            path_to_images = self.__temp_images_dest
+            frame_pixels = Jobs.sample_frames(path_to_video, pathOut=path_to_images)
+            stage.count(frames=len(frame_pixels))
+
+        with self.profile.stage("audio") as stage:
+            path_to_audio = Path(self.__temp_media_dest, config.temp_audio)
+            sound_seconds_dict = Jobs.audio_info_extractor_job7(
+                path_to_audio, *self.audio_threshold
+            )
+            audio_stats = np.array(list(sound_seconds_dict.values()), dtype=np.int64)
+            audio_stats = audio_stats.reshape(-1, 6)[:, :4]
+            stage.count(seconds=len(audio_stats))
 
-        with open(
-            self.__map_dest.joinpath("frame_audio_samples.json").as_posix(),
-            "w",
-        ) as fp:
-            json.dump(sound_seconds_dict, fp)
+        os.remove(Path(self.__temp_media_dest, config.temp_video))
+        os.remove(Path(self.__temp_media_dest, config.temp_audio))
 
-        return sound_seconds_dict
+        return frame_pixels, audio_stats
 
-    def __generate_fin_deltas_df(self) -> pd.DataFrame:
-        # job 4
+    def __stream_analysis_media(self) -> tuple[np.ndarray, np.ndarray]:
+        # job 1 + job 3 окнами, в памяти только пиксели и аудио статистика
+        if self.analysis_shards > 1:
+            return self.__shard_analysis_media()
 
-        fin_deltas_df = Jobs.pixel_delta_analizer_job7(
-            self.max_frame_quantity, self.delta_type, *self.noice_threshold
-        )
+        with self.profile.stage("frames") as stage:
+            frame_windows = []
+            audio_windows = []
+            for frame_window, audio_window in Jobs.iter_analysis_media(
+                self.source_dest,
+                config.streaming_window_seconds,
+                window=self.analysis_window,
+            ):
+                frame_windows.append(frame_window)
+                audio_windows.append(audio_window)
+
+            frame_pixels = np.concatenate(frame_windows)
+            audio_stats = np.concatenate(audio_windows)
+            stage.count(
+                frames=len(frame_pixels),
+                seconds=len(audio_stats),
+                windows=len(frame_windows),
+            )
+
+        return frame_pixels, audio_stats
+
+    def __shard_analysis_media(self) -> tuple[np.ndarray, np.ndarray]:
+        # job 1 + job 3: кадры шардами по времени в параллельных ffmpeg
+
+        with self.profile.stage("frames") as stage:
+            frame_pixels, audio_stats = Jobs.decode_analysis_media_sharded(
+                self.source_dest,
+                self.analysis_shards,
+                window=self.analysis_window,
+            )
+            stage.count(
+                frames=len(frame_pixels),
+                seconds=len(audio_stats),
+                shards=self.analysis_shards,
+            )
+
+        return frame_pixels, audio_stats
+
+    def __decode_analysis_media(self) -> tuple[np.ndarray, np.ndarray]:
+        # job 1 + job 3 за одно декодирование исходника
+
+        with self.profile.stage("frames") as stage:
+            frame_pixels, pcm = Jobs.decode_analysis_media(
+                self.source_dest,
+                window=self.analysis_window,
+            )
+            stage.count(frames=len(frame_pixels), audio_samples=len(pcm))
 
-        # system job
-        vid_json_path = Path(self.__map_dest, f"{self.source_dest.name}.json")
-        with open(vid_json_path, "w") as fp:
-            json.dump(fin_deltas_df.to_json(), fp)
+        with self.profile.stage("audio") as stage:
+            audio_stats = Jobs.audio_seconds_stats(pcm, config.analysis_audio_rate)
+            stage.count(seconds=len(audio_stats))
 
-        os.remove(Path(self.__temp_media_dest, config.temp_video))
-        os.remove(Path(self.__temp_media_dest, config.temp_audio))
+        return frame_pixels, audio_stats
 
-        print("длина fin_deltas_df:", len(fin_deltas_df))
-        print(
-            "распределение ударов по медиане: ",
-            dict(fin_deltas_df["удар_по_медиане"].value_counts()),
-        )
+    def __checkpoint(self, name: str, **arrays: np.ndarray) -> None:
+        # бинарный дамп промежуточных данных для отладки, по умолчанию выключен
+        if not config.checkpoint_stages:
+            return
 
-        return fin_deltas_df
+        np.savez(self.__map_dest.joinpath(f"{name}.npz").as_posix(), **arrays)
 
     @property
     def source_dest(self) -> Path:
@@ -249,6 +913,21 @@ class SlackCutter:
         if not self.__source_dest.is_file():
             raise Exception(f"No such file: {self.__source_dest}")
 
+    @property
+    def source_hash(self) -> str:
+        """Return content hash of the source video file."""
+
+        if self.__source_hash is None:
+            self.__source_hash = AnalysisCache.file_hash(self.source_dest)
+
+        return self.__source_hash
+
+    @property
+    def media_info(self) -> MediaInfo:
+        """Return probed properties of the source video file."""
+
+        return media_probe.probe(self.source_dest, content_hash=self.__source_hash)
+
     @property
     def trained_model(self) -> Path:
         """Return your trained model path."""
@@ -274,32 +953,47 @@ class SlackCutter:
     @max_clip_seconds_lenght.setter
     def max_clip_seconds_lenght(self, max_seconds_length: int) -> None:
         """
-        Sets clip's lenght in seconds. Also checks if desired length not exceeds source file length.
+        Sets clip's lenght in seconds. Also checks if desired length not exceeds source file (or analysis window) length.
 
         :param max_seconds_length: Clip's lenght in seconds.
         """
 
-        result = subprocess.run(
-            [
-                "ffprobe",
-                "-v",
-                "error",
-                "-show_entries",
-                "format=duration",
-                "-of",
-                "default=noprint_wrappers=1:nokey=1",
-                self.source_dest,
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-        )
-        try:
-            if max_seconds_length < int(float(result.stdout)):
-                self.__max_seconds = max_seconds_length
-            else:
-                raise Exception("Desired output length exceeds video limits.")
-        except ValueError:
-            raise Exception(result.stdout.decode("utf-8"))
+        if self.analysis_window is not None:
+            limit = self.analysis_window[1] - self.analysis_window[0]
+        else:
+            limit = int(self.media_info.duration)
+
+        if max_seconds_length < limit:
+            self.__max_seconds = max_seconds_length
+        else:
+            raise Exception("Desired output length exceeds video limits.")
+
+    @property
+    def analysis_window(self) -> Union[tuple[int, int], None]:
+        """Return analysed [start, end) seconds of the source, None - the whole source."""
+
+        return self.__analysis_window
+
+    @analysis_window.setter
+    def analysis_window(self, bounds: list) -> None:
+        """
+        Sets the part of the source that is decoded and analysed.
+
+        :param bounds: [start, end] in source seconds, None for either end - the source's end.
+        """
+
+        start, end = bounds
+        if start is None and end is None:
+            self.__analysis_window = None
+            return
+
+        duration = int(self.media_info.duration)
+        start = 0 if start is None else int(start)
+        end = duration if end is None else min(int(end), duration)
+        if not 0 <= start < end:
+            raise Exception("Analysis window is empty or outside the video.")
+
+        self.__analysis_window = (start, end)
 
     @property
     def output_name(self) -> Path:
@@ -392,6 +1086,32 @@ class SlackCutter:
             raise Exception("median_hit_modificator must be either int or float.")
         self.__median_hit_modificator = value
 
+    @property
+    def pairing_neighbours(self) -> int:
+        """Return most similar later scenes each scene is paired with, 0 - every later scene."""
+
+        return self.__pairing_neighbours
+
+    @pairing_neighbours.setter
+    def pairing_neighbours(self, value: int) -> None:
+        if not isinstance(value, int) or value < 0:
+            raise Exception("pairing_neighbours must be a non-negative int.")
+        self.__pairing_neighbours = value
+
+    @property
+    def analysis_mode(self) -> str:
+        """Return analysis mode: "full", "coarse" or "audio"."""
+
+        return self.__analysis_mode
+
+    @analysis_mode.setter
+    def analysis_mode(self, value: str) -> None:
+        if value not in ("full", "coarse", "audio"):
+            raise Exception(
+                f'analysis_mode must be "full", "coarse" or "audio", not {value!r}.',
+            )
+        self.__analysis_mode = value
+
     @property
     def max_frame_quantity(self) -> int:
         return self.__max_frame_quantity
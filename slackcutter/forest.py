@@ -0,0 +1,283 @@
+"""
+Flat NumPy copy of a fitted sklearn random forest.
+
+Export the models in trained_models/ with ``python -m slackcutter.forest``.
+"""
+import argparse
+from pathlib import Path
+from typing import Any, Union
+
+import numpy as np
+from slackcutter import config
+
+# строк на один проход по деревьям, на каждом шаге живут индексы rows * trees узлов
+PREDICT_BLOCK_ROWS = 2048
+
+
+class CompiledForest:
+    """
+    Every tree of a forest packed into shared node arrays.
+
+    Nodes of all trees are stored one after another, roots holds the node of
+    every tree root and a leaf points to itself as both children. Every row
+    walks all trees at once with NumPy indexing, one level per step. Leaf
+    values are class probabilities, averaged over trees the way sklearn
+    predict_proba does.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        classes: np.ndarray,
+        max_depth: int,
+        feature_quantity: int,
+    ):
+        """
+        Constructor of the forest.
+
+        :param feature: Feature compared in every node, int32.
+        :param threshold: Split threshold of every node, float64.
+        :param left: Node taken when the feature <= threshold, int32.
+        :param right: Node taken otherwise, int32.
+        :param value: Array (nodes, classes) of leaf class probabilities.
+        :param roots: Root node of every tree, int32.
+        :param classes: Class labels in predict_proba column order.
+        :param max_depth: Deepest leaf over all trees.
+        :param feature_quantity: Model input width.
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(feature_quantity)
+
+        self.__children = np.stack((left, right), axis=1).ravel()
+        self.__leaf = left == np.arange(len(left))
+
+    @classmethod
+    def from_sklearn(cls, model: Any) -> "CompiledForest":
+        """
+        Pack a fitted RandomForestClassifier (or any forest of decision trees).
+
+        :param model: Fitted sklearn forest classifier.
+        :return: CompiledForest.
+        """
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise Exception("Only single output forests can be compiled")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left == -1
+
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            lefts.append(np.where(leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(leaf, nodes, tree.children_right) + offset)
+
+            # в новых sklearn value уже доли, в старых - веса, нормировка верна для обоих
+            value = tree.value[:, 0, :].astype(np.float64)
+            values.append(value / value.sum(axis=1, keepdims=True))
+
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.int32),
+            right=np.concatenate(rights).astype(np.int32),
+            value=np.concatenate(values),
+            roots=np.array(roots, dtype=np.int32),
+            classes=np.asarray(model.classes_),
+            max_depth=max_depth,
+            feature_quantity=model.n_features_in_,
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "CompiledForest":
+        """
+        Load a forest saved with CompiledForest.save.
+
+        :param path: Path to the .npz file.
+        :return: CompiledForest.
+        """
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(
+                feature=arrays["feature"],
+                threshold=arrays["threshold"],
+                left=arrays["left"],
+                right=arrays["right"],
+                value=arrays["value"],
+                roots=arrays["roots"],
+                classes=arrays["classes"],
+                max_depth=int(arrays["max_depth"]),
+                feature_quantity=int(arrays["feature_quantity"]),
+            )
+
+    def save(self, path: Union[str, Path]) -> None:
+        """
+        Save the node arrays to an .npz file.
+
+        :param path: Path to the .npz file.
+        """
+        np.savez(
+            path,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            value=self.value,
+            roots=self.roots,
+            classes=self.classes_,
+            max_depth=self.max_depth,
+            feature_quantity=self.n_features_in_,
+        )
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """
+        Return class probabilities, as sklearn predict_proba.
+
+        :param features: Array (rows, feature_quantity).
+        :return: float64 array (rows, classes).
+        """
+        # sklearn сравнивает float32 признаки с float64 порогами
+        features = np.asarray(features, dtype=np.float32)
+        if features.ndim != 2 or features.shape[1] != self.n_features_in_:
+            raise Exception(
+                f"Expected {self.n_features_in_} features, got shape {features.shape}",
+            )
+
+        proba = np.empty((len(features), len(self.classes_)), dtype=np.float64)
+        for begin in range(0, len(features), PREDICT_BLOCK_ROWS):
+            block = features[begin : begin + PREDICT_BLOCK_ROWS]
+            leaves = self.__walk(block)
+            proba[begin : begin + len(block)] = (
+                self.value[leaves]
+                .reshape(
+                    len(block),
+                    len(self.roots),
+                    -1,
+                )
+                .mean(axis=1)
+            )
+
+        return proba
+
+    def __walk(self, block: np.ndarray) -> np.ndarray:
+        # узлы всех пар (строка, дерево) шагают на уровень вниз за раз,
+        # дошедшие до листа убираются, чтобы не гонять их до max_depth
+        rows, trees = len(block), len(self.roots)
+        columns = np.ascontiguousarray(block.T).ravel()
+        offsets = self.feature * rows
+
+        nodes = np.tile(self.roots, rows)
+        row = np.repeat(np.arange(rows, dtype=np.int32), trees)
+        position = np.arange(rows * trees)
+        leaves = np.empty(rows * trees, dtype=np.int32)
+
+        while len(nodes):
+            goes_right = columns[offsets[nodes] + row] > self.threshold[nodes]
+            nodes = self.__children[2 * nodes + goes_right]
+
+            done = self.__leaf[nodes]
+            leaves[position[done]] = nodes[done]
+            nodes, row, position = nodes[~done], row[~done], position[~done]
+
+        return leaves
+
+    @property
+    def nbytes(self) -> int:
+        """Return memory taken by the node arrays."""
+
+        return sum(
+            array.nbytes
+            for array in (
+                self.feature,
+                self.threshold,
+                self.left,
+                self.right,
+                self.value,
+                self.roots,
+            )
+        )
+
+
+def compiled_path(model_path: Union[str, Path]) -> Path:
+    """
+    Return where the compiled copy of a .joblib model is kept.
+
+    :param model_path: Path to the .joblib model file.
+    :return: Path to the .npz file next to it.
+    """
+    return Path(model_path).with_suffix(".npz")
+
+
+def compile_model(
+    model_path: Union[str, Path],
+    check_rows: int = 10000,
+    tolerance: float = 1e-9,
+) -> CompiledForest:
+    """
+    Export a .joblib forest next to itself and check it against sklearn.
+
+    :param model_path: Path to the .joblib model file.
+    :param check_rows: Random rows both models predict for the check.
+    :param tolerance: Largest allowed probability difference.
+    :return: CompiledForest.
+    """
+    import joblib
+
+    model = joblib.load(model_path)
+    forest = CompiledForest.from_sklearn(model)
+
+    # признаки - разности пикселей, от -255 до 255
+    rng = np.random.default_rng(0)
+    check = rng.uniform(-255, 255, (check_rows, forest.n_features_in_))
+    check = np.round(check * 3) / 3
+    difference = np.abs(forest.predict_proba(check) - model.predict_proba(check)).max()
+    if difference > tolerance:
+        raise Exception(f"{model_path}: compiled forest differs by {difference}")
+
+    forest.save(compiled_path(model_path))
+    return forest
+
+
+def main() -> None:
+    """Compile every .joblib model of the trained models folder."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "models",
+        nargs="*",
+        type=Path,
+        help="model files, every .joblib in trained_models by default",
+    )
+    args = parser.parse_args()
+
+    model_paths = args.models or sorted(
+        Path(config.trained_models_folder).glob("*.joblib"),
+    )
+    for model_path in model_paths:
+        forest = compile_model(model_path)
+        print(
+            f"{model_path} -> {compiled_path(model_path)}: "
+            f"{len(forest.roots)} trees, {len(forest.feature)} nodes, "
+            f"{forest.nbytes / 1024**2:.1f} MiB",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,222 +1,666 @@
 import datetime
-import json
+import math
 import os
-import statistics
+import queue
 import subprocess
-from itertools import combinations
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Union
+from typing import Iterable, Iterator, Union
 
 import cv2
-import joblib
 import numpy as np
 import pandas as pd
 from pydub import AudioSegment
 from slackcutter import config
+from slackcutter.probe import media_probe
+from slackcutter.ranking import choose_scene_pairs_grid, scene_keys, target_frame
+from slackcutter.registry import model_registry
+from slackcutter.streaming import iter_scene_bounds
 
 
 class Jobs:
     @staticmethod
-    def extractImages(pathIn: Path, pathOut: Path) -> dict:
-        # возвращает dict rgb-раскладку пикселей с подписью фрейма
-        pathIn_str = str(pathIn)
-        pathOut_str = str(pathOut)
-
-        count = 0
+    def log(*values: object) -> None:
+        # отладочный вывод прогресса, включается config.verbose
+        if config.verbose is True:
+            print(*values)
 
-        vidcap = cv2.VideoCapture(pathIn_str)
+    @staticmethod
+    def sample_frames(
+        pathIn: Path,
+        sample_rate: Union[int, float, None] = None,
+        pixel_quantity: Union[int, None] = None,
+        pathOut: Union[Path, None] = None,
+    ) -> np.ndarray:
+        # один последовательный проход декодера без seek на каждую секунду
+        # возвращает массив (секунды, пиксели, 3) в порядке r, g, b
+        sample_rate = sample_rate or config.extractImages_sample_rate
+        pixel_quantity = pixel_quantity or config.extractImages_pixel_quantity
+
+        vidcap = cv2.VideoCapture(str(pathIn))
+        if not vidcap.isOpened():
+            raise Exception(f"Can't open video: {pathIn}")
+
+        try:
+            fps = vidcap.get(cv2.CAP_PROP_FPS)
+            if fps <= 0:
+                raise Exception(f"Can't detect frame rate: {pathIn}")
+
+            frames_per_sample = fps / sample_rate
+            frame_count = int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT))
+            capacity = max(int(frame_count / frames_per_sample) + 1, 1)
+            samples = np.empty((capacity, pixel_quantity, 3), dtype=np.uint8)
+
+            count = 0
+            frame_index = 0
+            next_sample_index = 0
+
+            # grab() только демуксит и декодирует, retrieve() конвертирует кадр
+            # и вызывается лишь для кадров, попавших в выборку
+            while vidcap.grab():
+                if frame_index >= next_sample_index:
+                    success, image = vidcap.retrieve()
+                    if not success:
+                        # битый кадр - берем следующий для той же секунды
+                        frame_index += 1
+                        continue
+
+                    if config.extractImages_need_save is True and pathOut is not None:
+                        cv2.imwrite(
+                            Path(pathOut, f"frame{count}.jpg").as_posix(),
+                            image,
+                        )
 
-        # нужно пережать само видео в 240р, не кадры
+                    # при частоте выборки выше fps один кадр покрывает несколько секунд
+                    while frame_index >= next_sample_index:
+                        if count == len(samples):
+                            samples = np.concatenate((samples, np.empty_like(samples)))
+                        samples[count] = image[0, :pixel_quantity, ::-1]
+                        count += 1
+                        next_sample_index = round(count * frames_per_sample)
 
-        success, image = vidcap.read()
-        full_dict = {}
+                    if config.extractImages_output_choice is True:
+                        print("Read a new frame: ", count)
 
-        success = True
-        while success:
-            try:
-                vidcap.set(cv2.CAP_PROP_POS_MSEC, (count * 1000))  # added this line
-                success, image = vidcap.read()
-                if config.extractImages_output_choice is True:
-                    print("Read a new frame: ", success)
-                # image = cv2.resize(image,(pixel_quantity,1),fx=0,fy=0, interpolation = cv2.INTER_CUBIC)
-
-                if config.extractImages_need_save is True:
-                    cv2.imwrite(
-                        pathOut_str + "\\frame%d.jpg" % count,
-                        image,
-                    )  # save frame as JPEG file
-
-                # https://habr.com/ru/post/519454/ анализ цветов пикселей
-                if config.extractImages_output_choice is True:
-                    print(
-                        "Высота:" + str(image.shape[0]),
-                        "Ширина:" + str(image.shape[1]),
-                    )
+                frame_index += 1
+        finally:
+            vidcap.release()
 
-                # (b, g, r) = image[719, 1279] # пиксель в точке 0,0
-                # автоматически в json
+        return samples[:count]
 
-                # temp_dict = {}
-                temp_list = []
-                for i in range(0, config.extractImages_pixel_quantity):
-                    (b, g, r) = image[0, i]
+    @staticmethod
+    def probe_duration(pathIn: Path) -> float:
+        # длительность исходника в секундах по контейнеру, один ffprobe на файл
+        return media_probe.probe(pathIn).duration
 
-                    if config.extractImages_output_choice is True:
-                        print("Красный: {}, Зелёный: {}, Синий: {}".format(r, g, b))
+    @staticmethod
+    def input_window(window: Union[tuple, None]) -> list:
+        # аргументы ffmpeg перед -i: поиск по входу к началу окна [start, end) и его длина,
+        # время на выходе считается от начала окна; None - весь исходник
+        if window is None:
+            return []
 
-                    # temp_dict[i] = [int(r), int(g), int(b)]
-                    temp_list.append([int(r), int(g), int(b)])
+        start, end = window
+        return ["-ss", str(start), "-t", str(end - start)]
 
-                full_dict[count] = temp_list
+    @staticmethod
+    def analysis_video_filter(
+        sample_rate: Union[int, float],
+        pixel_quantity: int,
+        start_time: Union[int, None] = None,
+    ) -> str:
+        # кадр раз в 1 / sample_rate секунд, от него верхняя строка в pixel_quantity пикселей;
+        # start_time привязывает сетку fps к началу входа, а не к первому кадру
+        fps = f"fps={sample_rate}"
+        if start_time is not None:
+            fps = f"fps=fps={sample_rate}:start_time={start_time}"
+
+        return ",".join(
+            [
+                fps,
+                f"scale={pixel_quantity}:{config.extractImages_frame_height}",
+                f"crop={pixel_quantity}:1:0:0",
+            ],
+        )
 
-                count += 1  # every 1 second
+    @staticmethod
+    def start_analysis_decoder(
+        pathIn: Path,
+        sample_rate: int,
+        pixel_quantity: int,
+        audio_rate: int,
+        window: Union[tuple, None] = None,
+    ) -> tuple[subprocess.Popen, int]:
+        # одно декодирование исходника вместо двух перекодирований в temp:
+        # верхняя строка уменьшенного кадра (rgb24) идет в stdout,
+        # моно s16le pcm - в отдельный пайп, его дескриптор возвращается;
+        # с окном сетка fps привязана к его началу, как у шардов
+        video_filter = Jobs.analysis_video_filter(
+            sample_rate,
+            pixel_quantity,
+            start_time=0 if window is not None else None,
+        )
 
-            except Exception as e:
-                print(e)
+        audio_read, audio_write = os.pipe()
+        try:
+            process = subprocess.Popen(
+                [
+                    "ffmpeg",
+                    "-v",
+                    "error",
+                    "-nostdin",
+                    *Jobs.input_window(window),
+                    "-i",
+                    str(pathIn),
+                    "-map",
+                    "0:v:0",
+                    "-vf",
+                    video_filter,
+                    "-f",
+                    "rawvideo",
+                    "-pix_fmt",
+                    "rgb24",
+                    "pipe:1",
+                    "-map",
+                    "0:a:0",
+                    "-ac",
+                    "1",
+                    "-ar",
+                    str(audio_rate),
+                    "-f",
+                    "s16le",
+                    f"pipe:{audio_write}",
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                pass_fds=(audio_write,),
+            )
+        except Exception:
+            os.close(audio_read)
+            raise
+        finally:
+            os.close(audio_write)
 
-        return full_dict
+        return process, audio_read
 
     @staticmethod
-    def audio_info_extractor_job7(
-        path: Path,
-        low_percentage_audio: int,
-        high_percentage_audio: int,
-    ) -> dict:
-        # This will open and read the audio file with pydub.  Replace the file path with
-        # your own file.
-        begin_time = datetime.datetime.now()
-
-        audio_file = AudioSegment.from_file(path)
+    def decode_analysis_media(
+        pathIn: Path,
+        sample_rate: Union[int, float, None] = None,
+        pixel_quantity: Union[int, None] = None,
+        audio_rate: Union[int, None] = None,
+        window: Union[tuple, None] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # весь исходник (или окно) за раз: кадры (секунды, пиксели, 3) и pcm целиком
+        sample_rate = sample_rate or config.extractImages_sample_rate
+        pixel_quantity = pixel_quantity or config.extractImages_pixel_quantity
+        audio_rate = audio_rate or config.analysis_audio_rate
+
+        process, audio_read = Jobs.start_analysis_decoder(
+            pathIn,
+            sample_rate,
+            pixel_quantity,
+            audio_rate,
+            window,
+        )
 
-        # Set up a list for us to dump PCM samples into, and create a 'data' variable
-        # so we don't need to type audio_file._data again
-        data = audio_file._data
-        pcm16_signed_integers = []
-
-        # This loop decodes the bytestring into PCM samples.
-        # The bytestring is a stream of little-endian encoded signed integers.
-        # This basically just cuts each two-byte sample out of the bytestring, converts
-        # it to an integer, and appends it to the list of samples.
-        for sample_index in range(len(data) // 2):
-            sample = int.from_bytes(
-                data[sample_index * 2 : sample_index * 2 + 2],
-                "little",
-                signed=True,
+        audio_chunks: list = []
+        with os.fdopen(audio_read, "rb") as audio_pipe:
+            reader = threading.Thread(
+                target=lambda: audio_chunks.append(audio_pipe.read()),
             )
-            pcm16_signed_integers.append(sample)
+            reader.start()
+            video_bytes, errors = process.communicate()
+            reader.join()
 
-        print(len(pcm16_signed_integers) / audio_file.duration_seconds)
-        step = int(len(pcm16_signed_integers) / audio_file.duration_seconds)
-        chunks = [
-            pcm16_signed_integers[x : x + step]
-            for x in range(0, len(pcm16_signed_integers), step)
+        if process.returncode != 0:
+            raise Exception(errors.decode("utf-8"))
+
+        row_size = pixel_quantity * 3
+        frame_pixels = np.frombuffer(
+            video_bytes[: len(video_bytes) // row_size * row_size],
+            dtype=np.uint8,
+        ).reshape(-1, pixel_quantity, 3)
+
+        audio_bytes = audio_chunks[0]
+        pcm = np.frombuffer(audio_bytes[: len(audio_bytes) // 2 * 2], dtype="<i2")
+
+        return frame_pixels, pcm
+
+    @staticmethod
+    def iter_analysis_media(
+        pathIn: Path,
+        window_seconds: int,
+        sample_rate: Union[int, float, None] = None,
+        pixel_quantity: Union[int, None] = None,
+        audio_rate: Union[int, None] = None,
+        window: Union[tuple, None] = None,
+    ) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        # тот же проход ffmpeg, но окнами по window_seconds секунд:
+        # отдает (кадры окна, аудио статистика окна), pcm целиком не хранится
+        sample_rate = sample_rate or config.extractImages_sample_rate
+        pixel_quantity = pixel_quantity or config.extractImages_pixel_quantity
+        audio_rate = audio_rate or config.analysis_audio_rate
+
+        process, audio_read = Jobs.start_analysis_decoder(
+            pathIn,
+            sample_rate,
+            pixel_quantity,
+            audio_rate,
+            window,
+        )
+        audio_pipe = os.fdopen(audio_read, "rb")
+
+        row_size = pixel_quantity * 3
+        frames_queue: queue.Queue = queue.Queue()
+        audio_queue: queue.Queue = queue.Queue()
+        errors: list = []
+
+        # оба пайпа вычитываются своими потоками и сразу сжимаются,
+        # в очередях лежат только компактные окна, так что ffmpeg не блокируется
+        def read_frames() -> None:
+            window_size = int(window_seconds * sample_rate) * row_size
+            while True:
+                chunk = process.stdout.read(window_size)  # type: ignore
+                chunk = chunk[: len(chunk) // row_size * row_size]
+                if not chunk:
+                    break
+                frames_queue.put(
+                    np.frombuffer(chunk, dtype=np.uint8).reshape(-1, pixel_quantity, 3),
+                )
+            frames_queue.put(None)
+
+        def read_audio() -> None:
+            window_size = window_seconds * audio_rate * 2
+            while True:
+                chunk = audio_pipe.read(window_size)
+                chunk = chunk[: len(chunk) // 2 * 2]
+                if not chunk:
+                    break
+                pcm = np.frombuffer(chunk, dtype="<i2")
+                audio_queue.put(Jobs.audio_seconds_stats(pcm, audio_rate))
+            audio_queue.put(None)
+
+        readers = [
+            threading.Thread(target=read_frames),
+            threading.Thread(target=read_audio),
+            threading.Thread(target=lambda: errors.append(process.stderr.read())),  # type: ignore
         ]
+        for reader in readers:
+            reader.start()
+
+        empty_frames = np.empty((0, pixel_quantity, 3), dtype=np.uint8)
+        empty_audio = np.empty((0, 4), dtype=np.int64)
+
+        try:
+            frames_window = frames_queue.get()
+            audio_window = audio_queue.get()
+            while frames_window is not None or audio_window is not None:
+                yield (
+                    empty_frames if frames_window is None else frames_window,
+                    empty_audio if audio_window is None else audio_window,
+                )
 
-        print(datetime.datetime.now() - begin_time)
+                if frames_window is not None:
+                    frames_window = frames_queue.get()
+                if audio_window is not None:
+                    audio_window = audio_queue.get()
+        finally:
+            # генератор могли бросить на середине
+            if process.poll() is None:
+                process.kill()
+            for reader in readers:
+                reader.join()
+            process.wait()
+            audio_pipe.close()
+
+        if process.returncode != 0:
+            raise Exception(errors[0].decode("utf-8"))
 
-        sound_seconds_dict = {}
+    @staticmethod
+    def decode_frames_shard(
+        pathIn: Path,
+        start: int,
+        end: Union[int, None],
+        sample_rate: int,
+        pixel_quantity: int,
+    ) -> np.ndarray:
+        # кадры секунд [start, end) одного шарда, end=None - до конца исходника;
+        # декодирование начинается за config.analysis_shard_margin секунд до start,
+        # чтобы опорный кадр и сетка fps совпали с последовательным проходом
+        seek = max(0, start - config.analysis_shard_margin)
+
+        command = ["ffmpeg", "-v", "error", "-nostdin"]
+        if seek:
+            command += ["-ss", str(seek)]
+        if end is not None:
+            command += ["-to", str(end + config.analysis_shard_margin)]
+        command += [
+            "-i",
+            str(pathIn),
+            "-map",
+            "0:v:0",
+            "-vf",
+            Jobs.analysis_video_filter(
+                sample_rate,
+                pixel_quantity,
+                start_time=0 if seek else None,
+            ),
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "pipe:1",
+        ]
 
-        for i in range(0, len(chunks)):
-            temp_list = []
-            temp_list.append(int(sum(chunks[i]) / len(chunks[i])))
-            temp_list.append(int(statistics.median(chunks[i])))
-            temp_list.append(min(chunks[i]))
-            temp_list.append(max(chunks[i]))
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise Exception(result.stderr.decode("utf-8"))
 
-            # порядок: среднее, медиана, мин, макс
-            sound_seconds_dict[i] = temp_list
+        row_size = pixel_quantity * 3
+        frame_pixels = np.frombuffer(
+            result.stdout[: len(result.stdout) // row_size * row_size],
+            dtype=np.uint8,
+        ).reshape(-1, pixel_quantity, 3)
 
-        sound_df = pd.DataFrame.from_dict(sound_seconds_dict)
-        sound_df
+        skip = (start - seek) * sample_rate
+        if end is None:
+            return frame_pixels[skip:]
 
-        # внедрение поиска ударов по секундам
+        return frame_pixels[skip : skip + (end - start) * sample_rate]
 
-        a_median = np.array(list(sound_df.T[1]))
-        p_25_median = np.percentile(a_median, low_percentage_audio)  # 25
-        p_75_median = np.percentile(a_median, high_percentage_audio)  # 75
+    @staticmethod
+    def decode_audio_stats(
+        pathIn: Path,
+        audio_rate: int,
+        window_seconds: int,
+        window: Union[tuple, None] = None,
+    ) -> np.ndarray:
+        # аудио статистика (секунды, 4) всего исходника или окна, pcm читается окнами
+        process = subprocess.Popen(
+            [
+                "ffmpeg",
+                "-v",
+                "error",
+                "-nostdin",
+                *Jobs.input_window(window),
+                "-i",
+                str(pathIn),
+                "-map",
+                "0:a:0",
+                "-ac",
+                "1",
+                "-ar",
+                str(audio_rate),
+                "-f",
+                "s16le",
+                "pipe:1",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
 
-        a_max = np.array(list(sound_df.T[3]))
-        p_25_max = np.percentile(a_max, low_percentage_audio)  # noqa: F841
-        p_75_max = np.percentile(
-            a_max,
-            high_percentage_audio,
-        )  # можно динамично искать лучший перцентиль ай гесс
+        errors: list = []
+        reader = threading.Thread(target=lambda: errors.append(process.stderr.read()))  # type: ignore
+        reader.start()
+
+        stats = [np.empty((0, 4), dtype=np.int64)]
+        while True:
+            chunk = process.stdout.read(window_seconds * audio_rate * 2)  # type: ignore
+            chunk = chunk[: len(chunk) // 2 * 2]
+            if not chunk:
+                break
+            stats.append(
+                Jobs.audio_seconds_stats(np.frombuffer(chunk, dtype="<i2"), audio_rate),
+            )
 
-        for i in sound_seconds_dict:
-            if (
-                sound_seconds_dict[i][1] > 0 and sound_seconds_dict[i][1] > p_75_median
-            ) or (
-                sound_seconds_dict[i][1] < 0 and sound_seconds_dict[i][1] > p_25_median
-            ):
-                sound_seconds_dict[i].append(1)
-            else:
-                sound_seconds_dict[i].append(0)
+        reader.join()
+        if process.wait() != 0:
+            raise Exception(errors[0].decode("utf-8"))
+
+        return np.concatenate(stats)
 
-            if sound_seconds_dict[i][3] > p_75_max:
-                sound_seconds_dict[i].append(1)
+    @staticmethod
+    def decode_analysis_media_sharded(
+        pathIn: Path,
+        shards: int,
+        sample_rate: Union[int, None] = None,
+        pixel_quantity: Union[int, None] = None,
+        audio_rate: Union[int, None] = None,
+        window: Union[tuple, None] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # кадры декодируются шардами по времени параллельно, каждый своим ffmpeg,
+        # аудио (дешевое, но чувствительное к точке старта ресемплера) - одним
+        # проходом рядом с ними; результат совпадает с decode_analysis_media
+        sample_rate = sample_rate or config.extractImages_sample_rate
+        pixel_quantity = pixel_quantity or config.extractImages_pixel_quantity
+        audio_rate = audio_rate or config.analysis_audio_rate
+
+        # с окном шарды делят только его, границы шардов - в секундах исходника
+        if window is None:
+            offset, seconds, last_end = 0, math.ceil(Jobs.probe_duration(pathIn)), None
+        else:
+            offset, seconds, last_end = window[0], window[1] - window[0], window[1]
+        shards = max(1, min(shards, seconds // config.analysis_shard_min_seconds))
+        bounds = [offset + seconds * shard // shards for shard in range(shards)]
+        ends: list = bounds[1:] + [last_end]
+
+        # пул только ждет пайпы, вся работа идет в процессах ffmpeg
+        with ThreadPoolExecutor(max_workers=shards + 1) as pool:
+            audio_stats = pool.submit(
+                Jobs.decode_audio_stats,
+                pathIn,
+                audio_rate,
+                config.streaming_window_seconds,
+                window,
+            )
+            frame_shards = [
+                pool.submit(
+                    Jobs.decode_frames_shard,
+                    pathIn,
+                    start,
+                    end,
+                    sample_rate,
+                    pixel_quantity,
+                )
+                for start, end in zip(bounds, ends)
+            ]
+
+            frame_pixels = np.concatenate([shard.result() for shard in frame_shards])
+
+            return frame_pixels, audio_stats.result()
+
+    @staticmethod
+    def extractImages(pathIn: Path, pathOut: Path) -> dict:
+        # возвращает dict rgb-раскладку пикселей с подписью фрейма
+        frame_pixels = Jobs.sample_frames(pathIn, pathOut=pathOut)
+
+        return {count: pixels.tolist() for count, pixels in enumerate(frame_pixels)}
+
+    @staticmethod
+    def coarse_regions(
+        median_hits: np.ndarray,
+        window_seconds: int,
+        keep_seconds: int,
+        margin_seconds: int,
+    ) -> list:
+        # окна по window_seconds с самой большой долей ударов по медиане, пока их
+        # суммарная длина меньше keep_seconds; окна расширяются на margin_seconds
+        # и сливаются, формат как у кроплиста [[0, 40], [95, 130]]
+        seconds = len(median_hits)
+        starts = np.arange(0, seconds, window_seconds)
+        density = np.add.reduceat(median_hits, starts) / np.diff(
+            np.append(starts, seconds),
+        )
+
+        kept_starts = []
+        kept_seconds = 0
+        for start in starts[np.argsort(-density, kind="stable")]:
+            if kept_seconds >= keep_seconds:
+                break
+            kept_starts.append(int(start))
+            kept_seconds += min(window_seconds, seconds - start)
+
+        regions: list = []
+        for start in sorted(kept_starts):
+            region_start = max(0, start - margin_seconds)
+            region_end = min(seconds, start + window_seconds + margin_seconds)
+            if regions and region_start <= regions[-1][1]:
+                regions[-1][1] = max(regions[-1][1], region_end)
             else:
-                sound_seconds_dict[i].append(0)
+                regions.append([region_start, region_end])
 
-        return sound_seconds_dict
+        return regions
 
     @staticmethod
-    def pixel_delta_analizer_job7(
-        max_frame_quantity: int,
-        delta_type: str,
-        low_percentage: int,
-        high_percentage: int,
-    ) -> pd.DataFrame:
-        # Opening JSON file
-        map_dest = Path(config.temp_folder, config.map_folder)
+    def decode_frames_regions(
+        pathIn: Path,
+        regions: list,
+        workers: int,
+        sample_rate: Union[int, None] = None,
+        pixel_quantity: Union[int, None] = None,
+    ) -> list:
+        # кадры только внутри регионов [start, end), каждый регион своим ffmpeg
+        sample_rate = sample_rate or config.extractImages_sample_rate
+        pixel_quantity = pixel_quantity or config.extractImages_pixel_quantity
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            return list(
+                pool.map(
+                    lambda region: Jobs.decode_frames_shard(
+                        pathIn,
+                        region[0],
+                        region[1],
+                        sample_rate,
+                        pixel_quantity,
+                    ),
+                    regions,
+                ),
+            )
 
-        with open(map_dest.joinpath("frame_pixels.json").as_posix()) as json_file:
-            data = json.load(json_file)
+    @staticmethod
+    def audio_seconds_stats(pcm: np.ndarray, step: int) -> np.ndarray:
+        # порядок: среднее, медиана, мин, макс по окнам в step сэмплов
+        # последнее неполное окно считается отдельно, как и раньше
+        full_windows = len(pcm) // step
+        windows = [pcm[: full_windows * step].reshape(full_windows, step)]
+        if len(pcm) % step:
+            windows.append(pcm[full_windows * step :].reshape(1, -1))
+
+        stats = []
+        for window in windows:
+            if not window.size:
+                continue
+            # сумма в int64 точна, деление и отсечение дробной части как у int(sum / len)
+            mean = np.trunc(window.sum(axis=1, dtype=np.int64) / window.shape[1])
+            median = np.trunc(np.median(window, axis=1))
+            stats.append(
+                np.column_stack(
+                    (mean, median, window.min(axis=1), window.max(axis=1)),
+                ).astype(np.int64),
+            )
 
-        deltas_df = pd.DataFrame.from_dict(data)
+        if not stats:
+            return np.empty((0, 4), dtype=np.int64)
 
-        with open(
-            map_dest.joinpath("frame_audio_samples.json").as_posix(),
-        ) as json_file:
-            data_audio = json.load(json_file)
+        return np.concatenate(stats)
 
-        # data_audio = sound_seconds_dict
+    @staticmethod
+    def audio_hit_flags(
+        stats: np.ndarray,
+        low_percentage_audio: int,
+        high_percentage_audio: int,
+    ) -> np.ndarray:
+        # внедрение поиска ударов по секундам: удар_по_медиане, удар_по_максу
+        median = stats[:, 1]
+        p_25_median = np.percentile(median, low_percentage_audio)  # 25
+        p_75_median = np.percentile(median, high_percentage_audio)  # 75
 
-        audio_df = pd.DataFrame.from_dict(data_audio)
+        maximum = stats[:, 3]
+        p_75_max = np.percentile(
+            maximum,
+            high_percentage_audio,
+        )  # можно динамично искать лучший перцентиль ай гесс
 
-        # audio_df = audio_df.drop(columns=["0"])
+        median_hit = ((median > 0) & (median > p_75_median)) | (
+            (median < 0) & (median > p_25_median)
+        )
+        max_hit = maximum > p_75_max
 
-        fin_deltas_df = deltas_df.append(audio_df)
+        return np.column_stack((median_hit, max_hit)).astype(np.int64)
 
-        fin_deltas_df = fin_deltas_df.reset_index()
-        del fin_deltas_df["index"]
-        fin_deltas_df = fin_deltas_df.T
+    @staticmethod
+    def audio_features(
+        pcm: np.ndarray,
+        step: int,
+        low_percentage_audio: int,
+        high_percentage_audio: int,
+    ) -> np.ndarray:
+        # массив (секунды, 6): среднее, медиана, мин, макс, удар_по_медиане, удар_по_максу
+        stats = Jobs.audio_seconds_stats(pcm, step)
+        hits = Jobs.audio_hit_flags(stats, low_percentage_audio, high_percentage_audio)
 
-        fin_deltas_df = fin_deltas_df.rename(
-            columns={
-                6: "среднее_аудио",
-                7: "медиана",
-                8: "мин",
-                9: "макс",
-                10: "удар_по_медиане",
-                11: "удар_по_максу",
-            },
+        return np.hstack((stats, hits))
+
+    @staticmethod
+    def audio_info_extractor_job7(
+        path: Path,
+        low_percentage_audio: int,
+        high_percentage_audio: int,
+    ) -> dict:
+        # This will open and read the audio file with pydub.  Replace the file path with
+        # your own file.
+        begin_time = datetime.datetime.now()
+
+        audio_file = AudioSegment.from_file(path)
+
+        # The bytestring is a stream of little-endian encoded signed integers,
+        # frombuffer views it as int16 samples without copying.
+        data = audio_file._data
+        pcm16_signed_integers = np.frombuffer(data[: len(data) // 2 * 2], dtype="<i2")
+
+        Jobs.log(len(pcm16_signed_integers) / audio_file.duration_seconds)
+        step = int(len(pcm16_signed_integers) / audio_file.duration_seconds)
+
+        sound_seconds = Jobs.audio_features(
+            pcm16_signed_integers,
+            step,
+            low_percentage_audio,
+            high_percentage_audio,
         )
-        fin_deltas_df
 
-        frame_delta_restrictions = {}
+        Jobs.log(datetime.datetime.now() - begin_time)
 
-        for i in range(0, 6):
-            a_0 = np.array(list(fin_deltas_df[i]))
-            p_25_0 = np.percentile(a_0, low_percentage)
-            p_75_0 = np.percentile(a_0, high_percentage)
-            # print(p_25_0, p_75_0)
-            frame_delta_restrictions[i] = [p_25_0, p_75_0]
+        # порядок: среднее, медиана, мин, макс, удар_по_медиане, удар_по_максу
+        return dict(enumerate(sound_seconds.tolist()))
 
-        frame_delta_restrictions
+    @staticmethod
+    def pixel_delta_analizer_job7(
+        frame_pixels: np.ndarray,
+        sound_seconds: np.ndarray,
+    ) -> pd.DataFrame:
+        # frame_pixels: (секунды, пиксели, 3), sound_seconds: (секунды, 6)
+        # лишние секунды одного из потоков отбрасываются, чтобы не было NaN в кадрах
+        seconds = min(len(frame_pixels), len(sound_seconds))
+
+        fin_deltas_df = pd.DataFrame(
+            {
+                pixel: frame_pixels[:seconds, pixel].tolist()
+                for pixel in range(frame_pixels.shape[1])
+            },
+        )
 
-        # подсчет по дельте ргб
-        change_frame_list = []  # type: ignore # noqa: F841
-        # по колву пикселей надо смотреть
+        audio_columns = [
+            "среднее_аудио",
+            "медиана",
+            "мин",
+            "макс",
+            "удар_по_медиане",
+            "удар_по_максу",
+        ]
+        for column, values in zip(audio_columns, sound_seconds[:seconds].T):
+            fin_deltas_df[column] = values
 
         return fin_deltas_df
 
@@ -270,7 +714,7 @@ class Jobs:
         df_cropframes = df_cropframes.rename(columns={0: "end_sec", 1: "len_sec"})
         df_cropframes["start_sec"] = df_cropframes["end_sec"] - df_cropframes["len_sec"]
 
-        print("стартовая длина df_cropframes:", len(df_cropframes))
+        Jobs.log("стартовая длина df_cropframes:", len(df_cropframes))
 
         # старт_сек равны индексам
         df_cropframes = df_cropframes.loc[
@@ -289,479 +733,503 @@ class Jobs:
         return df_cropframes
 
     @staticmethod
-    def create_all_single_scenes(
-        df_cropframes: pd.DataFrame,
-        fin_deltas_df: pd.DataFrame,
-    ) -> pd.DataFrame:
-        # создание полного набора единичных сцен
-
-        fin_pairs_df = pd.DataFrame()
-
-        list_full_info = []
-        list_first_frame_rgb = []
-        list_last_frame_rgb = []
-        list_first_frame_timestamp = []
-        list_last_frame_timestamp = []
-        list_len_sec = []
-
-        for ind in range(0, len(df_cropframes)):
-
-            len_sec = df_cropframes["len_sec"][ind]
-            list_len_sec.append(len_sec)
-
-            curr_start = df_cropframes["start_sec"][ind]
-            curr_end = df_cropframes["end_sec"][ind]
-
-            frame_1_rgb = []  # type: ignore # noqa: F841
-            frame_m1_rgb = []  # type: ignore # noqa: F841
-            list_mean_audio = []  # type: ignore # noqa: F841
-            list_median = []  # type: ignore # noqa: F841
-            list_min = []  # type: ignore # noqa: F841
-            list_max = []  # type: ignore # noqa: F841
-            list_median_hit = []  # type: ignore # noqa: F841
-            list_max_hit = []  # type: ignore # noqa: F841
-
-            tmp_crop_df = fin_deltas_df[curr_start : curr_end + 1].reset_index()
-
-            tmp_crop_df[-1 : len(tmp_crop_df)]
-
-            full_info = tmp_crop_df.to_dict("index")
-            first_frame_rgb = tmp_crop_df.values.tolist()[0][1:7]
-            last_frame_rgb = tmp_crop_df.values.tolist()[-1][1:7]
-            first_frame_timestamp = tmp_crop_df.values.tolist()[0][0]
-            last_frame_timestamp = tmp_crop_df.values.tolist()[-1][0]
-
-            list_full_info.append(full_info)
-            list_first_frame_rgb.append(first_frame_rgb)
-            list_last_frame_rgb.append(last_frame_rgb)
-            list_first_frame_timestamp.append(first_frame_timestamp)
-            list_last_frame_timestamp.append(last_frame_timestamp)
-
-        fin_pairs_df["full_info"] = list_full_info
-        fin_pairs_df["first_frame_rgb"] = list_first_frame_rgb
-        fin_pairs_df["last_frame_rgb"] = list_last_frame_rgb
-        fin_pairs_df["first_frame_timestamp"] = list_first_frame_timestamp
-        fin_pairs_df["last_frame_timestamp"] = list_last_frame_timestamp
-        fin_pairs_df["len_sec"] = list_len_sec
-
-        return fin_pairs_df
-
-    @staticmethod
-    def create_all_scenes_combinations(fin_pairs_df: pd.DataFrame) -> pd.DataFrame:
-        # создание всех комбинаций пар сцен
-        # так был получен датасет с основной инфой по парам, теперь нужно их все перекомбинировать и найти дельны
-
-        L = range(0, len(fin_pairs_df) - 1)
-        all_combinations_list = [list(comb) for comb in combinations(L, 2)]
-
-        print("длина all_combinations_list:", len(all_combinations_list))
-
-        # ужасный подход, потом во время поддержки кода надо будет оптимизировать
-
-        pairs_for_deltas_df = pd.DataFrame()
-
-        for_pairs_dict: dict = {
-            "full_info_0": [],
-            "first_frame_rgb_0": [],
-            "last_frame_rgb_0": [],
-            "first_frame_timestamp_0": [],
-            "last_frame_timestamp_0": [],
-            "len_sec_0": [],
-            "full_info_1": [],
-            "first_frame_rgb_1": [],
-            "last_frame_rgb_1": [],
-            "first_frame_timestamp_1": [],
-            "last_frame_timestamp_1": [],
-            "len_sec_1": [],
-        }
-
-        for_names_list = [
-            "full_info",
-            "first_frame_rgb",
-            "last_frame_rgb",
-            "first_frame_timestamp",
-            "last_frame_timestamp",
-            "len_sec",
-        ]
-
-        # тут оч жесткая алгоритмическая сложность накрутилась, потом пофиксить
-        for comb_id in all_combinations_list:
-            first_id = comb_id[0]  # first
-            second_id = comb_id[1]  # second
-
-            for pair_name_id in for_pairs_dict:
-                for targat_name in for_names_list:
-                    if targat_name in pair_name_id:
-                        if "_0" in pair_name_id:
-                            for_pairs_dict[pair_name_id].append(
-                                fin_pairs_df[targat_name][first_id],
-                            )
-                        elif "_1" in pair_name_id:
-                            for_pairs_dict[pair_name_id].append(
-                                fin_pairs_df[targat_name][second_id],
-                            )
-                        else:
-                            print("wtf")
-
-        for fin_names in for_pairs_dict:
-            pairs_for_deltas_df[fin_names] = for_pairs_dict[fin_names]
-
-        # и вот до сюда оптимизировать
-
-        return pairs_for_deltas_df
-
-    @staticmethod
-    def get_frame_deltas_lists(
-        data: pd.Series,
-        prev: pd.Series,
-        max_frame_quantity: int,
-        pairs_for_deltas_df: pd.DataFrame,
-        delta_type: str,
-    ) -> list:
-
-        temp_list = []  # type: ignore # noqa: F841
-
-        full_frame_deltas = []
-
-        for pair_index in range(0, len(pairs_for_deltas_df)):
-            big_temp_list = []
-
-            for frame_id in range(0, max_frame_quantity):
-                temp = []
-
-                for rgb_index in range(0, 3):  # итерации по ргб
-                    temp.append(
-                        data[pair_index][frame_id][rgb_index]
-                        - prev[pair_index][frame_id][rgb_index],
-                    )
-
-                if delta_type == "full":
-                    big_temp_list.append(temp)
-                elif delta_type == "mean":
-                    big_temp_list.append(sum(temp) / 3)  # type: ignore
-                else:
-                    assert delta_type == "mean" or delta_type == "full", "wtf"
+    def predict_pairs(trained_model: Path, features: np.ndarray) -> np.ndarray:
+        # вероятность класса 1 для каждой пары, признаки от SceneTable.pair_features
+        rfc = model_registry.get(trained_model)
 
-            full_frame_deltas.append(big_temp_list)
-
-        return full_frame_deltas
+        Jobs.log("длина predict_df: ", len(features))
+        # окно короче одной сцены не дает пар, sklearn на пустых признаках падает
+        if not len(features):
+            return np.empty(0)
+        return rfc.predict_proba(features)[:, 1]
 
     @staticmethod
-    def create_frame_deltas_pairs(
+    def rank_modelled_scenes(
         pairs_for_deltas_df: pd.DataFrame,
-        max_frame_quantity: int,
-        delta_type: str,
+        propaility_list: np.ndarray,
+        model_threshold: Union[int, float],
     ) -> pd.DataFrame:
-        # создание пар для дельт кадров
-
-        data = pairs_for_deltas_df["last_frame_rgb_0"]
-        prev = pairs_for_deltas_df["first_frame_rgb_1"]
-
-        full_frame_deltas = Jobs.get_frame_deltas_lists(
-            data,
-            prev,
-            max_frame_quantity,
+        # ранжирование смоделированных сцен
+        return Jobs.rank_modelled_scenes_grid(
             pairs_for_deltas_df,
-            delta_type,
-        )
-
-        pairs_for_deltas_df["pair_deltas"] = full_frame_deltas
-
-        all_med_hits = []
-        column_name = "full_info_0"
+            propaility_list,
+            [model_threshold],
+        )[0]
 
-        for frame_index in range(0, len(pairs_for_deltas_df)):
-            med_hits = []
-
-            for fr_row in pairs_for_deltas_df[column_name][frame_index]:
-                med_hits.append(
-                    pairs_for_deltas_df[column_name][frame_index][fr_row][
-                        "удар_по_медиане"
-                    ],
-                )
-
-            mean_med_hits = sum(med_hits) / len(med_hits)
+    @staticmethod
+    def rank_modelled_scenes_grid(
+        pairs_for_deltas_df: pd.DataFrame,
+        propaility_list: np.ndarray,
+        model_thresholds: Iterable[Union[int, float]],
+    ) -> list[pd.DataFrame]:
+        # ранжирование для каждого порога модели: одна сортировка пар и проход по
+        # группам scene_0, вместо фильтра .loc и sort_values на каждую сцену;
+        # порог только отсекает уже отсортированные пары
+        propaility = np.asarray(propaility_list, dtype=np.float64)
+        model_thresholds = list(model_thresholds)
+
+        Jobs.log(len(pairs_for_deltas_df))
+        columns = {
+            column: pairs_for_deltas_df[column].to_numpy()
+            for column in [
+                "first_frame_timestamp_0",
+                "last_frame_timestamp_0",
+                "first_frame_timestamp_1",
+                "last_frame_timestamp_1",
+                "median_mean_hits_mean_0_1",
+            ]
+        }
 
-            all_med_hits.append(mean_med_hits)
+        # целые id сцен вместо строк "first_last"
+        groups = pd.factorize(
+            scene_keys(
+                columns["first_frame_timestamp_0"],
+                columns["last_frame_timestamp_0"],
+            ),
+        )[0]
+        levels = columns["median_mean_hits_mean_0_1"]
+
+        chosen_grid = choose_scene_pairs_grid(
+            groups,
+            scene_keys(
+                columns["first_frame_timestamp_1"],
+                columns["last_frame_timestamp_1"],
+            ),
+            columns["first_frame_timestamp_1"],
+            columns["last_frame_timestamp_0"] - columns["first_frame_timestamp_1"],
+            levels,
+            propaility,
+            model_thresholds,
+        )
 
-        pairs_for_deltas_df["median_mean_hits_0"] = all_med_hits
+        target_dfs = []
+        for model_threshold, chosen in zip(model_thresholds, chosen_grid):
+            Jobs.log(int((propaility > model_threshold).sum()))
+            target_dfs.append(
+                target_frame(
+                    columns["first_frame_timestamp_0"][chosen],
+                    columns["last_frame_timestamp_0"][chosen],
+                    columns["first_frame_timestamp_1"][chosen],
+                    columns["last_frame_timestamp_1"][chosen],
+                    propaility[chosen],
+                    levels[chosen],
+                ),
+            )
 
-        return pairs_for_deltas_df
+        return target_dfs
 
     @staticmethod
-    def add_median_hit_statistics(pairs_for_deltas_df: pd.DataFrame) -> pd.DataFrame:
-        # добавление статистики хитов по медиане
-        all_med_hits = []
-        column_name = "full_info_1"
+    def prepare_secs_crop_list(target_df: pd.DataFrame) -> list:
+        # разметка по формату
+        fin_list = []
+        for i in range(0, len(target_df)):
+            temp_list = []
+            temp_list.append(target_df["first_frame_timestamp_0"][i])
+            temp_list.append(target_df["last_frame_timestamp_0"][i])
 
-        # алгоритмическая сложность
-        for frame_index in range(0, len(pairs_for_deltas_df)):
-            med_hits = []
+            fin_list.append(temp_list)
 
-            for fr_row in pairs_for_deltas_df[column_name][frame_index]:
-                med_hits.append(
-                    pairs_for_deltas_df[column_name][frame_index][fr_row][
-                        "удар_по_медиане"
-                    ],
-                )
+            temp_list = []
+            temp_list.append(target_df["first_frame_timestamp_1"][i])
+            temp_list.append(target_df["last_frame_timestamp_1"][i])
 
-            mean_med_hits = sum(med_hits) / len(med_hits)
+            fin_list.append(temp_list)
 
-            all_med_hits.append(mean_med_hits)
+        return fin_list
 
-        pairs_for_deltas_df["median_mean_hits_1"] = all_med_hits
+    @staticmethod
+    def budget_crop_list(secs_crop_list: list, max_seconds: int) -> list:
+        # берем сегменты по порядку, пока набранная длина меньше max_seconds
+        budgeted = []
+        tempor_seconds = 0
+        for i in secs_crop_list:
+            if tempor_seconds >= max_seconds:
+                break
 
-        pairs_for_deltas_df["median_mean_hits_mean_0_1"] = (
-            pairs_for_deltas_df["median_mean_hits_0"]
-            + pairs_for_deltas_df["median_mean_hits_1"]
-        ) / 2
+            budgeted.append(i)
+            tempor_seconds += i[1] - i[0]  # добавили
 
-        return pairs_for_deltas_df
+        return budgeted
 
     @staticmethod
-    def calculate_rgb_frame_deltas(
-        pairs_for_deltas_df: pd.DataFrame,
-        max_frame_quantity: int,
-        delta_type: str,
-    ) -> tuple[pd.DataFrame, dict]:
-        # подсчет дельт по ргб для кадров
-
-        comparison_df = pairs_for_deltas_df[["last_frame_rgb_0", "first_frame_rgb_1"]]
-        print("длина comparison_df:", len(comparison_df))
-
-        dict_data_new = {}
-        count = 0
-        data = comparison_df["first_frame_rgb_1"]
-        prev = comparison_df["last_frame_rgb_0"]
-
-        # алгоритмическая сложность
-        for i in range(0, len(comparison_df["last_frame_rgb_0"])):
-            big_temp_list = []
-            for frame_id in range(0, max_frame_quantity):  # итерации по кадрам
-
-                temp = []
-                for rgb_index in range(0, 3):  # итерации по ргб
-                    temp.append(
-                        data[i][frame_id][rgb_index] - prev[i][frame_id][rgb_index],
-                    )
+    def clip_plan(target_df: pd.DataFrame, max_seconds: int) -> pd.DataFrame:
+        # сегменты, которые войдут в клип, в порядке склейки,
+        # с вероятностью модели и уровнем хитов их пары из target_df
+        segments = Jobs.budget_crop_list(
+            Jobs.prepare_secs_crop_list(target_df),
+            max_seconds,
+        )
+        pair = np.arange(len(segments)) // 2
+
+        return pd.DataFrame(
+            {
+                "start_sec": np.array([i[0] for i in segments], dtype=np.int64),
+                "end_sec": np.array([i[1] for i in segments], dtype=np.int64),
+                "pair": pair,
+                "propaility": target_df["propaility"].to_numpy()[pair],
+                "score": target_df["median_mean_hits_mean_0_1"].to_numpy()[pair],
+            },
+        )
 
-                if delta_type == "full":
-                    big_temp_list.append(temp)
-                elif delta_type == "mean":
-                    big_temp_list.append(sum(temp) / 3)  # type: ignore
-                else:
-                    assert delta_type == "mean" or delta_type == "full", "wtf"
+    @staticmethod
+    def rank_audio_scenes(
+        audio_stats: np.ndarray,
+        low_percentage_audio: int,
+        high_percentage_audio: int,
+        median_hit_modificator: Union[int, float],
+        min_crop_interval: int,
+        max_crop_interval: int,
+    ) -> pd.DataFrame:
+        # сцены только по звуку: границы по удар_по_медиане, как у scenes_split_on_median,
+        # длины фильтруются как в scene_mapping; вместо модели сцену оценивают доли секунд
+        # с ударами: propaility - доля удар_по_максу, score - доля удар_по_медиане
+        hits = Jobs.audio_hit_flags(
+            audio_stats,
+            low_percentage_audio,
+            high_percentage_audio,
+        )
 
-                dict_data_new[i] = big_temp_list
+        end = np.fromiter(
+            iter_scene_bounds(hits[:, 0], median_hit_modificator),
+            dtype=np.int64,
+        )
+        start = np.concatenate(([0], end[:-1])) if len(end) else end
+        length = end - start
+        kept = (length >= min_crop_interval) & (length < max_crop_interval)
+        start, end = start[kept], end[kept]
+
+        # доли по кумулятивным суммам, без цикла по сценам
+        cumulative = np.vstack(
+            (np.zeros((1, 2), dtype=np.int64), np.cumsum(hits, axis=0)),
+        )
+        seconds = np.maximum(end - start, 1)[:, None]
+        shares = (cumulative[end] - cumulative[start]) / seconds
+
+        # лучшие первыми, при равенстве - более ранние
+        order = np.lexsort((start, -shares.sum(axis=1)))
+        return pd.DataFrame(
+            {
+                "start_sec": start[order],
+                "end_sec": end[order],
+                "propaility": shares[order, 1],
+                "score": shares[order, 0],
+            },
+        )
 
-            count += 1
+    @staticmethod
+    def audio_clip_plan(scenes_df: pd.DataFrame, max_seconds: int) -> pd.DataFrame:
+        # план клипа из сцен rank_audio_scenes в формате clip_plan, пара - сама сцена
+        segments = Jobs.budget_crop_list(
+            scenes_df[["start_sec", "end_sec"]].to_numpy().tolist(),
+            max_seconds,
+        )
 
-        return comparison_df, dict_data_new
+        return pd.DataFrame(
+            {
+                "start_sec": np.array([i[0] for i in segments], dtype=np.int64),
+                "end_sec": np.array([i[1] for i in segments], dtype=np.int64),
+                "pair": np.arange(len(segments)),
+                "propaility": scenes_df["propaility"].to_numpy()[: len(segments)],
+                "score": scenes_df["score"].to_numpy()[: len(segments)],
+            },
+        )
 
     @staticmethod
-    def markup_frame_pixels(
-        dict_data_new: dict,
-        max_frame_quantity: int,
-    ) -> tuple[list, dict]:
-        # быстрый скрипт разметки, юзаем счетчик, итерируемся по списку, счетчик также
-        # юзаем по маршрутизации по словарю в зависимости от локального индекса в списке
-        list_data_new: list = []
-        dict_razmetka: dict = {}
+    def source_concat_list(vid_path: Path, segments: list) -> str:
+        # ffconcat список сегментов [start, end) исходника для concat demuxer,
+        # границы в секундах с долями, как у частей точной нарезки
+        source = Path(vid_path).resolve().as_posix().replace("'", "'\\''")
+
+        return "ffconcat version 1.0\n" + "".join(
+            f"file 'file:{source}'\ninpoint {float(start):.6f}\noutpoint {float(end):.6f}\n"
+            for start, end in segments
+        )
 
-        for i in range(0, max_frame_quantity):
-            dict_razmetka[i] = []
+    @staticmethod
+    def render_clip(
+        secs_crop_list: list,
+        vid_path: Path,
+        output_dest: Path,
+        sound_check: bool,
+        max_seconds: int,
+    ) -> list:
+        # один запуск ffmpeg вместо нарезки и склейки: concat demuxer с inpoint/outpoint
+        # по исходнику, список сегментов передается через stdin, промежуточных файлов нет;
+        # индекс mp4 в начале (faststart), так что клип пробуется из пайпа без temp файла
+        segments = Jobs.budget_crop_list(secs_crop_list, max_seconds)
+        if not segments:
+            raise Exception("No scenes selected for the clip.")
 
-        for step in dict_data_new:
-            z = 0
-            for i in dict_data_new[step]:
-                dict_razmetka[z].append(i)
-                z += 1
+        concat_list = Jobs.source_concat_list(vid_path, segments)
 
-            list_data_new.append(dict_data_new[step])
+        result = subprocess.run(
+            [
+                "ffmpeg",
+                "-y",
+                "-v",
+                "error",
+                "-f",
+                "concat",
+                "-safe",
+                "0",
+                "-protocol_whitelist",
+                "file,pipe",
+                "-i",
+                "pipe:0",
+                "-c",
+                "copy",
+                *([] if sound_check is True else ["-an"]),
+                "-movflags",
+                "+faststart",
+                output_dest,
+            ],
+            input=concat_list.encode("utf-8"),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        if result.returncode != 0:
+            raise Exception(result.stderr.decode("utf-8"))
 
-        return list_data_new, dict_razmetka
+        return segments
 
     @staticmethod
-    def predict_and_make_dataset(
-        trained_model: Path,
-        dict_razmetka: dict,
-        max_frame_quantity: int,
-        comparison_df: pd.DataFrame,
-    ) -> list:
-
-        rfc = joblib.load(trained_model)
-
-        for i in dict_razmetka:
-            comparison_df[i] = dict_razmetka[i]
+    def probe_keyframes(pathIn: Path) -> np.ndarray:
+        # индекс ключевых кадров первого видео потока по флагам пакетов, без декодирования:
+        # массив (ключевые кадры, 2) - pts и dts в секундах, по возрастанию pts
+        result = subprocess.run(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-select_streams",
+                "v:0",
+                "-show_entries",
+                "packet=pts_time,dts_time,flags",
+                "-of",
+                "csv=p=0",
+                str(pathIn),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        if result.returncode != 0:
+            raise Exception(result.stderr.decode("utf-8"))
 
-        predict_df = comparison_df[list(range(0, max_frame_quantity))]
+        keyframes = []
+        for line in result.stdout.decode("utf-8").splitlines():
+            pts_time, dts_time, flags = (line.split(",") + ["", ""])[:3]
+            if not flags.startswith("K") or pts_time in ("", "N/A"):
+                continue
 
-        propaility_list = []
-        print("длина predict_df: ", len(predict_df))
-        for i in rfc.predict_proba(predict_df):
-            propaility_list.append(i[1])
+            # без dts (потоки без b-кадров в некоторых контейнерах) dts равен pts
+            dts_time = pts_time if dts_time in ("", "N/A") else dts_time
+            keyframes.append((float(pts_time), float(dts_time)))
 
-        return propaility_list
+        keyframes_array = np.array(keyframes, dtype=np.float64).reshape(-1, 2)
+        return keyframes_array[np.argsort(keyframes_array[:, 0], kind="stable")]
 
     @staticmethod
-    def rank_modelled_scenes(
-        pairs_for_deltas_df: pd.DataFrame,
-        propaility_list: list,
-        model_threshold: Union[int, float],
-    ) -> pd.DataFrame:
-        # ранжирование смоделированных сцен
+    def smart_cut_parts(
+        start: float,
+        end: float,
+        keyframes: np.ndarray,
+    ) -> list[tuple[float, float, float, bool]]:
+        # сегмент [start, end) делится на копируемую середину от первого до последнего
+        # ключевого кадра внутри него и перекодируемые неполные GOP по краям;
+        # части (начало, конец, dts конца, копия), dts конца нужен копии - ffmpeg
+        # обрезает копируемые пакеты по dts, а у ключевого кадра он раньше pts
+        inside = keyframes[(keyframes[:, 0] >= start) & (keyframes[:, 0] <= end)]
+        if len(inside) < 2:
+            return [(start, end, end, False)]
+
+        (first, _), (last, last_dts) = inside[0], inside[-1]
+        parts = []
+        if first > start:
+            parts.append((start, first, first, False))
+        parts.append((first, last, last_dts, True))
+        if last < end:
+            parts.append((last, end, end, False))
+
+        return parts
 
-        pairs_for_deltas_df["propaility"] = propaility_list
+    @staticmethod
+    def render_smart_part(
+        vid_path: Path,
+        part: tuple[float, float, float, bool],
+        part_dest: Path,
+        encoder: str,
+        pix_fmt: Union[str, None],
+    ) -> None:
+        # часть без звука в mpegts: у перекодированных и скопированных частей свои
+        # sps/pps, в mpegts они идут в потоке, так что склейка копией их не путает
+        start, end, end_dts, copy = part
+        if copy:
+            # начало - ровно ключевой кадр, так что поиск по входу копирует с него
+            codec_args = ["-t", f"{end_dts - start:.6f}", "-c:v", "copy"]
+        else:
+            codec_args = [
+                "-t",
+                f"{end - start:.6f}",
+                "-c:v",
+                encoder,
+                "-preset",
+                config.smart_cut_preset,
+                "-crf",
+                str(config.smart_cut_crf),
+                *(["-pix_fmt", pix_fmt] if pix_fmt else []),
+            ]
 
-        pairs_for_deltas_df["scene_id_0"] = (
-            pairs_for_deltas_df["first_frame_timestamp_0"]
-            + "_"
-            + pairs_for_deltas_df["last_frame_timestamp_0"]
-        )
-        pairs_for_deltas_df["scene_id_1"] = (
-            pairs_for_deltas_df["first_frame_timestamp_1"]
-            + "_"
-            + pairs_for_deltas_df["last_frame_timestamp_1"]
+        result = subprocess.run(
+            [
+                "ffmpeg",
+                "-y",
+                "-v",
+                "error",
+                "-nostdin",
+                "-ss",
+                f"{start:.6f}",
+                "-i",
+                str(vid_path),
+                "-map",
+                "0:v:0",
+                *codec_args,
+                "-an",
+                "-f",
+                "mpegts",
+                str(part_dest),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
         )
+        if result.returncode != 0:
+            raise Exception(result.stderr.decode("utf-8"))
 
-        pairs_for_deltas_df["scene_id_0"].unique
+    @staticmethod
+    def render_clip_smart(
+        secs_crop_list: list,
+        vid_path: Path,
+        output_dest: Path,
+        sound_check: bool,
+        max_seconds: int,
+        keyframes: np.ndarray,
+        work_dir: Path,
+    ) -> tuple[list, list]:
+        # точные резы почти со скоростью копии: видео между ключевыми кадрами копируется,
+        # перекодируются только неполные GOP на краях сегментов, части рендерятся
+        # параллельно и склеиваются копией; звук перекодируется по тем же границам
+        segments = Jobs.budget_crop_list(secs_crop_list, max_seconds)
+        if not segments:
+            raise Exception("No scenes selected for the clip.")
+
+        media_info = media_probe.probe(vid_path)
+        encoder = {"h264": "libx264", "hevc": "libx265"}.get(media_info.video_codec)
+        if encoder is None:
+            Jobs.log(
+                f"smart cut: no encoder for {media_info.video_codec}, falling back to concat",
+            )
+            segments = Jobs.render_clip(
+                secs_crop_list,
+                vid_path,
+                output_dest,
+                sound_check,
+                max_seconds,
+            )
+            return segments, []
 
-        print(len(pairs_for_deltas_df))
-        pairs_for_deltas_df = pairs_for_deltas_df.loc[
-            pairs_for_deltas_df["propaility"] > model_threshold
+        parts = [
+            part
+            for start, end in segments
+            for part in Jobs.smart_cut_parts(float(start), float(end), keyframes)
         ]
-        print(len(pairs_for_deltas_df))
-
-        # код выборки сцены
-
-        # !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
-        # ult_temp_df.loc[~ult_temp_df.isin({'scene_id_1': no_repeats_list})['scene_id_1']]
-        # вот эту кононструкцию выписать и в рамочку
-
-        df_chosen_scenes = pd.DataFrame()
-        testlist = []  # type: ignore # noqa: F841
-
-        no_repeats_list: list = []
-
-        # надо доп проверку списком чтобы не было при выборе уже использованных вторых кадров
-        # вот тут основное ранжирование
-        scene_id = "scene_id_0"
-        for scene_index in list(pairs_for_deltas_df[scene_id].unique()):
-
-            temp_df = pairs_for_deltas_df.loc[
-                pairs_for_deltas_df[scene_id] == scene_index
-            ].sort_values(by=["median_mean_hits_mean_0_1"], ascending=False)
-            temp_df = temp_df.reset_index()
-            temp_df["first_frame_timestamp_1"] = temp_df[
-                "first_frame_timestamp_1"
-            ].astype(int)
-            temp_df["last_frame_timestamp_1"] = temp_df[
-                "last_frame_timestamp_1"
-            ].astype(int)
-            temp_df["first_frame_timestamp_0"] = temp_df[
-                "first_frame_timestamp_0"
-            ].astype(int)
-            temp_df["last_frame_timestamp_0"] = temp_df[
-                "last_frame_timestamp_0"
-            ].astype(int)
-            temp_df["timestamp_check"] = (
-                temp_df["last_frame_timestamp_0"] - temp_df["first_frame_timestamp_1"]
-            )
+        part_dests = [Path(work_dir, f"part_{i}.ts") for i in range(len(parts))]
+
+        try:
+            with ThreadPoolExecutor(
+                max_workers=min(len(parts), os.cpu_count() or 1),
+            ) as pool:
+                list(
+                    pool.map(
+                        lambda i: Jobs.render_smart_part(
+                            vid_path,
+                            parts[i],
+                            part_dests[i],
+                            encoder,
+                            media_info.pix_fmt,
+                        ),
+                        range(len(parts)),
+                    ),
+                )
 
-            # проверка но репитс
-            ult_temp_df = (
-                temp_df.loc[
-                    (
-                        temp_df["median_mean_hits_mean_0_1"]
-                        == temp_df["median_mean_hits_mean_0_1"][0]
+            parts_list_dest = Path(work_dir, "parts.ffconcat")
+            with open(parts_list_dest, "w") as fp:
+                fp.write("ffconcat version 1.0\n")
+                for part_dest in part_dests:
+                    fp.write(f"file '{part_dest.resolve().as_posix()}'\n")
+
+            if sound_check is True and media_info.audio_codec is not None:
+                # звук перекодируется по тем же границам, что у видео частей: копия
+                # по inpoint начинается с ключевого кадра видео перед ним и звук
+                # выходит длиннее видео; точный поиск по входу на каждый сегмент
+                audio_inputs = [
+                    arg
+                    for start, end in segments
+                    for arg in (
+                        "-ss",
+                        f"{float(start):.6f}",
+                        "-t",
+                        f"{float(end - start):.6f}",
+                        "-i",
+                        str(vid_path),
                     )
-                    & (temp_df["timestamp_check"] != -1)
                 ]
-                .sort_values(by=["first_frame_timestamp_1"], ascending=True)
-                .reset_index(drop=True)
-            )
-
-            # самая глючная часть
-            ult_temp_df = ult_temp_df.loc[
-                ult_temp_df['scene_id_1'].apply(lambda x: x not in no_repeats_list)
-                ].reset_index(drop = True)[0:1]
-            df_chosen_scenes = df_chosen_scenes.append(ult_temp_df)
-            try:
-                no_repeats_list.append(
-                    ult_temp_df['scene_id_1'][0]
+                audio_streams = "".join(
+                    f"[{i + 1}:a:0]" for i in range(len(segments))
                 )
-            except:  # noqa: E722
-                pass
-
-            # алгоритмическая сложность
-            if len(ult_temp_df) == 0:
-                schet_temp = 1
-                stopper = 0
-                while stopper == 0:
-                    try:
-                        ult_temp_df = (
-                            temp_df.loc[
-                                (
-                                    temp_df["median_mean_hits_mean_0_1"]
-                                    == temp_df["median_mean_hits_mean_0_1"][schet_temp]
-                                )
-                                & (temp_df["timestamp_check"] != -1)
-                            ]
-                            .sort_values(by=["first_frame_timestamp_1"], ascending=True)
-                            .reset_index(drop=True)
-                        )
-                        ult_temp_df = ult_temp_df.loc[
-                                ult_temp_df['scene_id_1'].apply(lambda x: x not in no_repeats_list)
-                            ].reset_index(drop = True)[0:1]
-                        df_chosen_scenes = df_chosen_scenes.append(ult_temp_df)
-                        no_repeats_list.append(
-                            ult_temp_df['scene_id_1'][0]
-                        )
-                        if len(ult_temp_df) != 0:
-                            stopper += 1
-                    except:  # noqa: E722
-                        if schet_temp > len(
-                            pairs_for_deltas_df["median_mean_hits_mean_0_1"].unique(),
-                        ):
-                            stopper += 1
-
-                        schet_temp += 1
-
-            no_repeats_list = list(set(no_repeats_list))
-
-        del df_chosen_scenes["index"]
-        df_chosen_scenes = df_chosen_scenes.reset_index()
-        del df_chosen_scenes["index"]
-
-        target_df = df_chosen_scenes.sort_values(by=["propaility"], ascending=False)[
-            [
-                "last_frame_timestamp_0",
-                "first_frame_timestamp_0",
-                "last_frame_timestamp_1",
-                "first_frame_timestamp_1",
-            ]
-        ].reset_index(drop=True)
-
-        return target_df
-
-    @staticmethod
-    def prepare_secs_crop_list(target_df: pd.DataFrame) -> list:
-        # разметка по формату
-        fin_list = []
-        for i in range(0, len(target_df)):
-            temp_list = []
-            temp_list.append(target_df["first_frame_timestamp_0"][i])
-            temp_list.append(target_df["last_frame_timestamp_0"][i])
-
-            fin_list.append(temp_list)
-
-            temp_list = []
-            temp_list.append(target_df["first_frame_timestamp_1"][i])
-            temp_list.append(target_df["last_frame_timestamp_1"][i])
+                audio_args = [
+                    *audio_inputs,
+                    "-filter_complex",
+                    f"{audio_streams}concat=n={len(segments)}:v=0:a=1[a]",
+                    "-map",
+                    "0:v:0",
+                    "-map",
+                    "[a]",
+                    "-c:a",
+                    config.smart_cut_audio_codec,
+                ]
+            else:
+                audio_args = ["-map", "0:v:0"]
 
-            fin_list.append(temp_list)
+            result = subprocess.run(
+                [
+                    "ffmpeg",
+                    "-y",
+                    "-v",
+                    "error",
+                    "-nostdin",
+                    "-f",
+                    "concat",
+                    "-safe",
+                    "0",
+                    "-i",
+                    str(parts_list_dest),
+                    *audio_args,
+                    "-c:v",
+                    "copy",
+                    "-movflags",
+                    "+faststart",
+                    output_dest,
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+            if result.returncode != 0:
+                raise Exception(result.stderr.decode("utf-8"))
+        finally:
+            for part_dest in part_dests + [Path(work_dir, "parts.ffconcat")]:
+                if part_dest.exists():
+                    os.remove(part_dest)
 
-        return fin_list
+        return segments, parts
 
     @staticmethod
     def crop_vid(
@@ -773,59 +1241,54 @@ class Jobs:
     ) -> list:
         # режет видео, кладет в папку, кладет в папку дблокнот, возвращает список названий видео
         # формат кроплиста [[0,1],[9,11]]
-        max_seconds = max_seconds  # 120 secs for example
         vid_names = []
         z = 0
-        tempor_seconds = 0
-        for i in secs_crop_list:
-            if tempor_seconds < max_seconds:
-                start_sec_str = str(datetime.timedelta(seconds=int(i[0])))
-                end_sec_str = str(datetime.timedelta(seconds=int(i[1])))
-
-                output_path = Path(path_save, f"output_{z}_{vid_path.name}")
-                if sound_check is True:
-                    subprocess.run(
-                        [
-                            "ffmpeg",
-                            "-ss",
-                            start_sec_str,
-                            "-to",
-                            end_sec_str,
-                            "-i",
-                            vid_path,
-                            "-c",
-                            "copy",
-                            output_path,
-                        ],
-                    )
-                else:
-                    subprocess.run(
-                        [
-                            "ffmpeg",
-                            "-ss",
-                            start_sec_str,
-                            "-to",
-                            end_sec_str,
-                            "-i",
-                            vid_path,
-                            "-c",
-                            "copy",
-                            "-an",
-                            output_path,
-                        ],
-                    )
-
-                vid_names.append(Path(f"output_{str(z)}_{vid_path.name}"))
-                z += 1
+        for i in Jobs.budget_crop_list(secs_crop_list, max_seconds):
+            start_sec_str = str(datetime.timedelta(seconds=int(i[0])))
+            end_sec_str = str(datetime.timedelta(seconds=int(i[1])))
+
+            output_path = Path(path_save, f"output_{z}_{vid_path.name}")
+            if sound_check is True:
+                subprocess.run(
+                    [
+                        "ffmpeg",
+                        "-ss",
+                        start_sec_str,
+                        "-to",
+                        end_sec_str,
+                        "-i",
+                        vid_path,
+                        "-c",
+                        "copy",
+                        output_path,
+                    ],
+                )
+            else:
+                subprocess.run(
+                    [
+                        "ffmpeg",
+                        "-ss",
+                        start_sec_str,
+                        "-to",
+                        end_sec_str,
+                        "-i",
+                        vid_path,
+                        "-c",
+                        "copy",
+                        "-an",
+                        output_path,
+                    ],
+                )
 
-            tempor_seconds += i[1] - i[0]  # добавили
+            vid_names.append(Path(f"output_{str(z)}_{vid_path.name}"))
+            z += 1
 
         # пишем названия видео в блокнот и сейвим
         path_to_txt = Path(path_save, config.txt_list_name)
         with open(path_to_txt, "w") as fp:
             for item in vid_names:
                 fp.write("file '%s'\n" % item)
-            print("Done")
+            Jobs.log("Done")
 
         return vid_names
 
@@ -876,4 +1339,4 @@ class Jobs:
         for file in file_names:
             os.remove(Path(output_dest.parent, file))
 
-        print("connecting done")
+        Jobs.log("connecting done")
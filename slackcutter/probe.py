@@ -0,0 +1,323 @@
+"""Process-wide media probe service shared by SlackCutter and the web API."""
+import hashlib
+import json
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Union
+
+import numpy as np
+from slackcutter import config
+
+
+def parse_duration(value: Union[str, None]) -> Union[float, None]:
+    """
+    Return seconds of an ffprobe duration.
+
+    :param value: Seconds (ex: "12.5") or matroska tag time (ex: "00:00:12.500000000").
+    :return: Seconds or None if the value is missing.
+    """
+    if value in (None, "", "N/A"):
+        return None
+
+    if ":" in value:  # type: ignore
+        hours, minutes, seconds = value.split(":")  # type: ignore
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    return float(value)  # type: ignore
+
+
+class MediaInfo:
+    """
+    Container, stream and keyframe properties of a media file from one ffprobe call.
+
+    Keyframes are read from the first config.media_probe_keyframe_seconds of
+    the video stream only, enough for the keyframe interval without reading
+    the whole file. The complete keyframe index for smart cut is
+    Jobs.probe_keyframes.
+    """
+
+    def __init__(self, probe: dict):
+        """
+        Constructor of the media info.
+
+        :param probe: ffprobe JSON output with "format", "streams" and "packets".
+        """
+        self.format: dict = probe.get("format", {})
+        self.streams: list = probe.get("streams", [])
+        self.video: Union[dict, None] = next(
+            (stream for stream in self.streams if stream.get("codec_type") == "video"),
+            None,
+        )
+        self.audio: Union[dict, None] = next(
+            (stream for stream in self.streams if stream.get("codec_type") == "audio"),
+            None,
+        )
+
+        video_index = self.video["index"] if self.video is not None else None
+        self.keyframes = np.array(
+            sorted(
+                float(packet["pts_time"])
+                for packet in probe.get("packets", [])
+                if packet.get("stream_index") == video_index
+                and packet.get("flags", "").startswith("K")
+                and packet.get("pts_time") not in (None, "N/A")
+            ),
+            dtype=np.float64,
+        )
+
+    @property
+    def duration(self) -> float:
+        """Return duration in seconds, the container's or the longest stream's."""
+
+        duration = parse_duration(self.format.get("duration"))
+        if duration is not None:
+            return duration
+
+        durations = [
+            parse_duration(
+                stream.get("duration") or stream.get("tags", {}).get("DURATION"),
+            )
+            for stream in self.streams
+        ]
+        durations = [value for value in durations if value is not None]
+        if not durations:
+            raise Exception("Can't detect media duration")
+
+        return max(durations)  # type: ignore
+
+    @property
+    def video_duration(self) -> float:
+        """Return duration of the video stream in seconds, the container's if unknown."""
+
+        if self.video is not None:
+            duration = parse_duration(
+                self.video.get("duration")
+                or self.video.get("tags", {}).get("DURATION"),
+            )
+            if duration is not None:
+                return duration
+
+        return self.duration
+
+    @property
+    def width(self) -> Union[int, None]:
+        """Return frame width of the video stream."""
+
+        return self.video.get("width") if self.video is not None else None
+
+    @property
+    def height(self) -> Union[int, None]:
+        """Return frame height of the video stream."""
+
+        return self.video.get("height") if self.video is not None else None
+
+    @property
+    def video_codec(self) -> Union[str, None]:
+        """Return codec name of the video stream (ex: "h264")."""
+
+        return self.video.get("codec_name") if self.video is not None else None
+
+    @property
+    def pix_fmt(self) -> Union[str, None]:
+        """Return pixel format of the video stream (ex: "yuv420p")."""
+
+        return self.video.get("pix_fmt") if self.video is not None else None
+
+    @property
+    def frame_rate(self) -> Union[float, None]:
+        """Return average frame rate of the video stream."""
+
+        if self.video is None:
+            return None
+
+        for rate in (self.video.get("avg_frame_rate"), self.video.get("r_frame_rate")):
+            numerator, _, denominator = (rate or "0/0").partition("/")
+            if float(denominator or 1) and float(numerator):
+                return float(numerator) / float(denominator or 1)
+
+        return None
+
+    @property
+    def audio_codec(self) -> Union[str, None]:
+        """Return codec name of the audio stream (ex: "aac")."""
+
+        return self.audio.get("codec_name") if self.audio is not None else None
+
+    @property
+    def sample_rate(self) -> Union[int, None]:
+        """Return sample rate of the audio stream."""
+
+        if self.audio is None or self.audio.get("sample_rate") is None:
+            return None
+
+        return int(self.audio["sample_rate"])
+
+    @property
+    def channels(self) -> Union[int, None]:
+        """Return channel count of the audio stream."""
+
+        return self.audio.get("channels") if self.audio is not None else None
+
+    @property
+    def keyframe_interval(self) -> Union[float, None]:
+        """Return median seconds between keyframes, None for less than two keyframes."""
+
+        if len(self.keyframes) < 2:
+            return None
+
+        return float(np.median(np.diff(self.keyframes)))
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the properties as a JSON-ready dict."""
+
+        return {
+            "duration": self.duration,
+            "format_name": self.format.get("format_name"),
+            "width": self.width,
+            "height": self.height,
+            "video_codec": self.video_codec,
+            "pix_fmt": self.pix_fmt,
+            "frame_rate": self.frame_rate,
+            "audio_codec": self.audio_codec,
+            "sample_rate": self.sample_rate,
+            "channels": self.channels,
+            "keyframe_interval": self.keyframe_interval,
+        }
+
+
+class MediaProbe:
+    """Bounded LRU cache of MediaInfo keyed by media content hash."""
+
+    def __init__(
+        self,
+        max_entries: int = config.media_probe_cache_size,
+        keyframe_seconds: int = config.media_probe_keyframe_seconds,
+    ):
+        """
+        Constructor of the probe service.
+
+        :param max_entries: How many probe results are kept (ex: 256).
+        :param keyframe_seconds: Head of the video stream scanned for keyframes (ex: 30).
+        """
+        self.max_entries = max_entries
+        self.keyframe_seconds = keyframe_seconds
+        self.__results: OrderedDict = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def key(
+        source: Union[str, Path, bytes],
+        content_hash: Union[str, None] = None,
+    ) -> str:
+        """
+        Return memo key of the media.
+
+        :param source: Media file path or media bytes.
+        :param content_hash: Known content hash (ex: md5 from the S3 key).
+        :return: content_hash, md5 of the bytes, or path, size and mtime of the file.
+        """
+        if content_hash is not None:
+            return content_hash
+
+        if isinstance(source, bytes):
+            return hashlib.md5(source).hexdigest()  # noqa: S324
+
+        # хэш содержимого файла стоит полного чтения, его заменяет stat
+        path = Path(source).resolve()
+        stat = path.stat()
+        return f"{path.as_posix()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def probe(
+        self,
+        source: Union[str, Path, bytes],
+        content_hash: Union[str, None] = None,
+    ) -> MediaInfo:
+        """
+        Return properties of the media, running ffprobe only on the first request.
+
+        Bytes are piped into ffprobe. An mp4 with the index at the end can't
+        be read from a pipe, such bytes are probed from a temporary file.
+
+        :param source: Media file path or media bytes.
+        :param content_hash: Known content hash (ex: md5 from the S3 key).
+        :return: MediaInfo.
+        """
+        key = self.key(source, content_hash)
+
+        with self.__lock:
+            if key in self.__results:
+                self.__results.move_to_end(key)
+                return self.__results[key]
+
+        if isinstance(source, bytes):
+            info = self.__run("pipe:0", source)
+            if info is None:
+                with tempfile.NamedTemporaryFile(suffix=".media") as fp:
+                    fp.write(source)
+                    fp.flush()
+                    info = self.__run(fp.name)
+        else:
+            info = self.__run(Path(source).as_posix())
+
+        if info is None:
+            raise Exception(f"Can't probe media: {key}")
+
+        with self.__lock:
+            self.__results[key] = info
+            while len(self.__results) > self.max_entries:
+                self.__results.popitem(last=False)
+
+        return info
+
+    def clear(self) -> None:
+        """Drop every probe result."""
+
+        with self.__lock:
+            self.__results.clear()
+
+    def __len__(self) -> int:
+        return len(self.__results)
+
+    def __run(
+        self,
+        target: str,
+        body: Union[bytes, None] = None,
+    ) -> Union[MediaInfo, None]:
+        # формат, потоки и пакеты начала файла одним вызовом ffprobe
+        result = subprocess.run(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-show_entries",
+                "format=format_name,duration,size,bit_rate:stream:"
+                "packet=stream_index,pts_time,dts_time,flags",
+                "-read_intervals",
+                f"%+{self.keyframe_seconds}",
+                "-of",
+                "json",
+                target,
+            ],
+            input=body,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        if result.returncode != 0:
+            return None
+
+        probe = json.loads(result.stdout.decode("utf-8") or "{}")
+        if not probe.get("streams"):
+            return None
+
+        # из пайпа mp4 с индексом в конце читаются потоки, но не пакеты
+        info = MediaInfo(probe)
+        if body is not None and info.video is not None and not len(info.keyframes):
+            return None
+
+        return info
+
+
+media_probe = MediaProbe()
@@ -0,0 +1,133 @@
+"""Per-stage profiling of the slackcutter pipeline."""
+import json
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore
+
+
+def _peak_rss() -> int:
+    """Return peak resident set size of the process in bytes."""
+
+    if resource is None:
+        return 0
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _children_cpu_time() -> float:
+    """Return CPU time of finished child processes (ffmpeg) in seconds."""
+
+    if resource is None:
+        return 0.0
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class StageProfile:
+    """Wall time, CPU time, peak RSS growth and item counts of one stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.children_cpu_time = 0.0
+        self.peak_rss_delta = 0
+        self.counts: dict[str, int] = {}
+
+    def count(self, **counts: int) -> None:
+        """
+        Record item counts of the stage (ex: frames=600, scenes=40).
+
+        :param counts: Counter names with their values.
+        """
+        self.counts.update({name: int(value) for name, value in counts.items()})
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return stage profile as a JSON-serializable dict."""
+
+        return {
+            "name": self.name,
+            "wall_time": round(self.wall_time, 6),
+            "cpu_time": round(self.cpu_time, 6),
+            "children_cpu_time": round(self.children_cpu_time, 6),
+            "peak_rss_delta": self.peak_rss_delta,
+            "counts": self.counts,
+        }
+
+
+class PipelineProfile:
+    """Ordered collection of stage profiles of one SlackCutter run."""
+
+    def __init__(self) -> None:
+        self.stages: list[StageProfile] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageProfile]:
+        """
+        Profile the wrapped block as a pipeline stage.
+
+        CPU time is measured for the calling thread, so concurrent jobs in
+        other threads don't leak into it. Children CPU time and peak RSS are
+        process-wide counters and are shared by concurrent jobs.
+
+        :param name: Stage name (ex: "frames").
+        :yield: StageProfile to record item counts into.
+        """
+        stage = StageProfile(name)
+
+        rss_before = _peak_rss()
+        children_cpu_before = _children_cpu_time()
+        cpu_before = time.thread_time()
+        wall_before = time.perf_counter()
+
+        try:
+            yield stage
+        finally:
+            stage.wall_time = time.perf_counter() - wall_before
+            stage.cpu_time = time.thread_time() - cpu_before
+            stage.children_cpu_time = _children_cpu_time() - children_cpu_before
+            stage.peak_rss_delta = _peak_rss() - rss_before
+            self.stages.append(stage)
+
+    def __getitem__(self, name: str) -> StageProfile:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    @property
+    def wall_time(self) -> float:
+        """Return summed wall time of all stages."""
+
+        return sum(stage.wall_time for stage in self.stages)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return pipeline profile as a JSON-serializable dict."""
+
+        return {
+            "stages": [stage.to_dict() for stage in self.stages],
+            "wall_time": round(self.wall_time, 6),
+            "cpu_time": round(sum(stage.cpu_time for stage in self.stages), 6),
+            "children_cpu_time": round(
+                sum(stage.children_cpu_time for stage in self.stages),
+                6,
+            ),
+        }
+
+    def to_json(self, **kwargs: Any) -> str:
+        """
+        Return pipeline profile as JSON string.
+
+        :param kwargs: Keyword arguments for json.dumps (ex: indent=2).
+        :return: JSON string.
+        """
+        return json.dumps(self.to_dict(), **kwargs)
@@ -0,0 +1,216 @@
+"""Scene pair ranking shared by the in-memory and streaming pipelines."""
+from typing import Iterable, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+
+def scene_keys(
+    first_timestamp: np.ndarray,
+    last_timestamp: np.ndarray,
+) -> np.ndarray:
+    """
+    Return integer scene ids, replacing the "first_last" timestamp strings.
+
+    :param first_timestamp: First second of every scene.
+    :param last_timestamp: Last second of every scene.
+    :return: int64 array, equal for scenes with equal bounds.
+    """
+    return (np.asarray(first_timestamp, dtype=np.int64) << 32) | np.asarray(
+        last_timestamp,
+        dtype=np.int64,
+    )
+
+
+def choose_scene_pairs(
+    groups: np.ndarray,
+    second_keys: np.ndarray,
+    second_start: np.ndarray,
+    timestamp_check: np.ndarray,
+    levels: np.ndarray,
+    hit_levels: int,
+    used: set,
+) -> np.ndarray:
+    """
+    Choose at most one scene_1 for every scene_0 group, in group order.
+
+    Reproduces the selection of the original rank_modelled_scenes: a group
+    takes its highest median_mean_hits_mean_0_1 level that still has an
+    unused scene_1 with timestamp_check != -1, the earliest such scene_1 on
+    that level. Levels are only tried down to the value at position
+    hit_levels + 1 of the group's descending order, where the old fallback
+    loop stopped.
+
+    :param groups: Scene_0 group of every pair, ascending groups are ranked first.
+    :param second_keys: Scene_1 id of every pair from scene_keys.
+    :param second_start: First second of every scene_1.
+    :param timestamp_check: last_frame_timestamp_0 - first_frame_timestamp_1.
+    :param levels: median_mean_hits_mean_0_1 of every pair.
+    :param hit_levels: Number of unique levels among all pairs over the threshold.
+    :param used: Scene_1 ids already chosen, updated in place.
+    :return: Indexes of the chosen pairs.
+    """
+    order = np.lexsort((second_start, -levels, groups))
+    if not len(order):
+        return order
+
+    starts = np.flatnonzero(np.diff(groups[order])) + 1
+    chosen = _walk_groups(
+        zip(
+            np.concatenate(([0], starts)).tolist(),
+            np.append(starts, len(order)).tolist(),
+        ),
+        range(len(order)),
+        levels[order].tolist(),
+        (timestamp_check != -1)[order].tolist(),
+        second_keys[order].tolist(),
+        hit_levels,
+        used,
+    )
+
+    return order[np.array(chosen, dtype=np.int64)]
+
+
+def choose_scene_pairs_grid(
+    groups: np.ndarray,
+    second_keys: np.ndarray,
+    second_start: np.ndarray,
+    timestamp_check: np.ndarray,
+    levels: np.ndarray,
+    propaility: np.ndarray,
+    model_thresholds: Iterable[Union[int, float]],
+) -> list[np.ndarray]:
+    """
+    Choose scene pairs for every model threshold from one sort of all pairs.
+
+    For every threshold gives what choose_scene_pairs gives for the pairs with
+    propaility over it, groups ranked by their first such pair and hit_levels
+    counted among those pairs. A threshold only masks the sorted pairs and
+    reorders whole groups, nothing is sorted again.
+
+    :param groups: Scene_0 id of every pair.
+    :param second_keys: Scene_1 id of every pair from scene_keys.
+    :param second_start: First second of every scene_1.
+    :param timestamp_check: last_frame_timestamp_0 - first_frame_timestamp_1.
+    :param levels: median_mean_hits_mean_0_1 of every pair.
+    :param propaility: Model probability of every pair.
+    :param model_thresholds: Thresholds to choose for (ex: [0.2, 0.3]).
+    :return: Indexes of the chosen pairs for every threshold.
+    """
+    order = np.lexsort((second_start, -levels, groups))
+    groups_sorted = groups[order]
+    propaility_sorted = propaility[order]
+    levels_sorted = levels[order].tolist()
+    valid_sorted = (timestamp_check != -1)[order].tolist()
+    keys_sorted = second_keys[order].tolist()
+
+    # уровень ударов есть среди прошедших пар, пока его лучшая пара выше порога
+    unique_levels, level_ids = np.unique(levels, return_inverse=True)
+    level_best = np.full(len(unique_levels), -np.inf)
+    np.maximum.at(level_best, level_ids, propaility)
+    level_best.sort()
+
+    chosen = []
+    for model_threshold in model_thresholds:
+        positions = np.flatnonzero(propaility_sorted > model_threshold)
+        if not len(positions):
+            chosen.append(np.empty(0, dtype=np.int64))
+            continue
+
+        starts = np.flatnonzero(np.diff(groups_sorted[positions])) + 1
+        begins = np.concatenate(([0], starts))
+        ends = np.append(starts, len(positions))
+        # группы в порядке их первой прошедшей пары, как factorize при одном пороге
+        ranked = np.argsort(
+            np.minimum.reduceat(order[positions], begins),
+            kind="stable",
+        )
+
+        picked = _walk_groups(
+            zip(begins[ranked].tolist(), ends[ranked].tolist()),
+            positions.tolist(),
+            levels_sorted,
+            valid_sorted,
+            keys_sorted,
+            len(level_best)
+            - int(np.searchsorted(level_best, model_threshold, side="right")),
+            set(),
+        )
+        chosen.append(order[np.array(picked, dtype=np.int64)])
+
+    return chosen
+
+
+def _walk_groups(
+    blocks: Iterable[tuple[int, int]],
+    positions: Sequence[int],
+    levels_sorted: list,
+    valid_sorted: list,
+    keys_sorted: list,
+    hit_levels: int,
+    used: set,
+) -> list[int]:
+    # blocks - границы групп в positions в порядке ранжирования, positions -
+    # номера строк в отсортированных списках; строки группы уже отсортированы,
+    # так что первая подходящая - лучшая
+    chosen = []
+    for begin, end in blocks:
+        cutoff = levels_sorted[positions[begin + min(hit_levels + 1, end - begin - 1)]]
+
+        for index in range(begin, end):
+            position = positions[index]
+            if levels_sorted[position] < cutoff:
+                break
+
+            if valid_sorted[position] and keys_sorted[position] not in used:
+                used.add(keys_sorted[position])
+                chosen.append(position)
+                break
+
+    return chosen
+
+
+def target_frame(
+    first_frame_timestamp_0: np.ndarray,
+    last_frame_timestamp_0: np.ndarray,
+    first_frame_timestamp_1: np.ndarray,
+    last_frame_timestamp_1: np.ndarray,
+    propaility: Union[np.ndarray, list],
+    median_mean_hits_mean_0_1: Union[np.ndarray, list],
+) -> pd.DataFrame:
+    """
+    Return chosen pairs in the target_df layout, best probability first.
+
+    Besides the scene timestamps, the frame keeps the model probability and
+    the median hit level of every pair for the clip plan.
+
+    :param first_frame_timestamp_0: Scene_0 first seconds in group order.
+    :param last_frame_timestamp_0: Scene_0 last seconds.
+    :param first_frame_timestamp_1: Scene_1 first seconds.
+    :param last_frame_timestamp_1: Scene_1 last seconds.
+    :param propaility: Model probabilities of the pairs.
+    :param median_mean_hits_mean_0_1: Median hit levels of the pairs.
+    :return: target_df.
+    """
+    timestamps = {
+        "last_frame_timestamp_0": last_frame_timestamp_0,
+        "first_frame_timestamp_0": first_frame_timestamp_0,
+        "last_frame_timestamp_1": last_frame_timestamp_1,
+        "first_frame_timestamp_1": first_frame_timestamp_1,
+    }
+    df_chosen_scenes = pd.DataFrame(
+        {
+            column: np.asarray(values, dtype=np.int64)
+            for column, values in timestamps.items()
+        },
+    )
+    df_chosen_scenes["propaility"] = np.asarray(propaility, dtype=np.float64)
+    df_chosen_scenes["median_mean_hits_mean_0_1"] = np.asarray(
+        median_mean_hits_mean_0_1,
+        dtype=np.float64,
+    )
+
+    return df_chosen_scenes.sort_values(
+        by=["propaility"],
+        ascending=False,
+    ).reset_index(drop=True)
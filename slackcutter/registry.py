@@ -0,0 +1,117 @@
+"""Process-wide registry of loaded trained models."""
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterable, Union
+
+import joblib
+from slackcutter import config
+from slackcutter.forest import CompiledForest, compiled_path
+
+
+class ModelRegistry:
+    """Bounded LRU cache of trained models keyed by model file path and mtime."""
+
+    def __init__(
+        self,
+        max_models: int = config.trained_models_cache_size,
+        mmap_mode: Union[str, None] = config.trained_models_mmap_mode,
+        compiled: bool = config.trained_models_compiled,
+    ):
+        """
+        Constructor of the registry.
+
+        :param max_models: How many models are kept loaded at once (ex: 4).
+        :param mmap_mode: joblib mmap_mode for model arrays, None to read them in memory (ex: "r").
+        :param compiled: Load the CompiledForest .npz next to a model when it is up to date.
+        """
+        self.max_models = max_models
+        self.mmap_mode = mmap_mode
+        self.compiled = compiled
+        self.__models: OrderedDict = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, model_path: Union[str, Path]) -> Any:
+        """
+        Return loaded model, loading it on the first request.
+
+        Models are memory-mapped, so their tree arrays live in the page cache
+        and are shared by every worker process that loads the same file.
+        A changed file (new mtime) is loaded again and replaces the stale entry.
+        With compiled on, a copy from python -m slackcutter.forest is preferred and
+        sklearn is not imported by the worker at all.
+
+        :param model_path: Path to the .joblib model file.
+        :return: Loaded model.
+        """
+        path = self.resolve(model_path)
+        key = (path.as_posix(), path.stat().st_mtime_ns)
+
+        with self.__lock:
+            if key in self.__models:
+                self.__models.move_to_end(key)
+                return self.__models[key]
+
+            if path.suffix == ".npz":
+                model = CompiledForest.load(path)
+            else:
+                model = joblib.load(path, mmap_mode=self.mmap_mode)
+
+            for stale_key in [k for k in self.__models if k[0] == key[0]]:
+                del self.__models[stale_key]
+
+            self.__models[key] = model
+            while len(self.__models) > self.max_models:
+                self.__models.popitem(last=False)
+
+        return model
+
+    def resolve(self, model_path: Union[str, Path]) -> Path:
+        """
+        Return the file get loads for the model.
+
+        :param model_path: Path to the .joblib model file.
+        :return: Compiled .npz path if it is not older than the model, else the model path.
+        """
+        path = Path(model_path).resolve()
+        compiled = compiled_path(path)
+
+        if (
+            self.compiled
+            and compiled.is_file()
+            and compiled.stat().st_mtime_ns >= path.stat().st_mtime_ns
+        ):
+            return compiled
+
+        return path
+
+    def preload(self, model_paths: Iterable[Union[str, Path]]) -> dict[str, Exception]:
+        """
+        Load models ahead of the first clip job.
+
+        A model that can't be loaded (missing file, pickle of another sklearn)
+        doesn't stop the others, get tries it again on first use.
+
+        :param model_paths: Paths to the .joblib model files.
+        :return: Error of every model that failed to load, by model path.
+        """
+        failed = {}
+        for model_path in model_paths:
+            try:
+                self.get(model_path)
+            except Exception as ex:
+                failed[Path(model_path).as_posix()] = ex
+
+        return failed
+
+    def clear(self) -> None:
+        """Drop every loaded model."""
+
+        with self.__lock:
+            self.__models.clear()
+
+    def __len__(self) -> int:
+        return len(self.__models)
+
+
+model_registry = ModelRegistry()
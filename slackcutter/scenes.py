@@ -0,0 +1,330 @@
+"""Struct-of-arrays scene table and pair index used for scene pairing."""
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+
+class SceneTable:
+    """
+    One row per scene kept by scene_mapping, every column a NumPy array.
+
+    A scene covers source seconds start..end inclusive, the same rows
+    fin_deltas_df[start : end + 1] the original single scenes were cut from.
+    """
+
+    def __init__(
+        self,
+        start: np.ndarray,
+        end: np.ndarray,
+        first_rgb: np.ndarray,
+        last_rgb: np.ndarray,
+        median_hits: np.ndarray,
+    ):
+        """
+        Constructor of the table.
+
+        :param start: First second of every scene.
+        :param end: Last second of every scene, inclusive.
+        :param first_rgb: Array (scenes, pixels, 3) of the first frames.
+        :param last_rgb: Array (scenes, pixels, 3) of the last frames.
+        :param median_hits: Mean "удар_по_медиане" over every scene's seconds.
+        """
+        self.start = start
+        self.end = end
+        self.first_rgb = first_rgb
+        self.last_rgb = last_rgb
+        self.median_hits = median_hits
+
+    @classmethod
+    def from_ranges(
+        cls,
+        frame_pixels: np.ndarray,
+        median_hits: np.ndarray,
+        start: np.ndarray,
+        end: np.ndarray,
+    ) -> "SceneTable":
+        """
+        Build the table from scene boundaries.
+
+        :param frame_pixels: Array (seconds, pixels, 3).
+        :param median_hits: Per-second "удар_по_медиане" flags of the same length.
+        :param start: First second of every scene.
+        :param end: Last second of every scene, inclusive.
+        :return: SceneTable.
+        """
+        start = np.asarray(start, dtype=np.int64)
+        end = np.asarray(end, dtype=np.int64)
+        hits_sum = np.concatenate(([0], np.cumsum(median_hits, dtype=np.int64)))
+
+        return cls(
+            start=start,
+            end=end,
+            first_rgb=frame_pixels[start],
+            last_rgb=frame_pixels[end],
+            median_hits=(hits_sum[end + 1] - hits_sum[start]) / (end - start + 1),
+        )
+
+    @classmethod
+    def from_bounds(
+        cls,
+        frame_pixels: np.ndarray,
+        median_hits: np.ndarray,
+        bounds: Iterable[int],
+        min_crop_interval: int,
+        max_crop_interval: int,
+    ) -> "SceneTable":
+        """
+        Build the table from scenes_split_on_median boundaries, as scene_mapping filters them.
+
+        :param frame_pixels: Array (seconds, pixels, 3).
+        :param median_hits: Per-second median hit flags of the same length.
+        :param bounds: Scene boundaries, starting with 0.
+        :param min_crop_interval: Shortest kept scene in seconds (ex: 1).
+        :param max_crop_interval: Scenes this long or longer are dropped (ex: 5).
+        :return: SceneTable.
+        """
+        end = np.fromiter(bounds, dtype=np.int64)
+        start = np.concatenate(([0], end[:-1])) if len(end) else end
+        length = end - start
+
+        kept = (length >= min_crop_interval) & (length < max_crop_interval)
+
+        return cls.from_ranges(frame_pixels, median_hits, start[kept], end[kept])
+
+    @classmethod
+    def from_cropframes(
+        cls,
+        df_cropframes: pd.DataFrame,
+        fin_deltas_df: pd.DataFrame,
+    ) -> "SceneTable":
+        """
+        Build the table from Jobs.scene_mapping and Jobs.pixel_delta_analizer_job7 frames.
+
+        :param df_cropframes: Scenes with start_sec and end_sec columns.
+        :param fin_deltas_df: Per-second pixel lists and audio columns.
+        :return: SceneTable.
+        """
+        pixel_columns = [column for column in fin_deltas_df if isinstance(column, int)]
+        frame_pixels = np.array(
+            fin_deltas_df[pixel_columns].to_numpy().tolist(),
+            dtype=np.uint8,
+        ).reshape(len(fin_deltas_df), len(pixel_columns), 3)
+
+        return cls.from_ranges(
+            frame_pixels,
+            fin_deltas_df["удар_по_медиане"].to_numpy(),
+            df_cropframes["start_sec"].to_numpy(),
+            df_cropframes["end_sec"].to_numpy(),
+        )
+
+    def within(self, decoded: np.ndarray) -> "SceneTable":
+        """
+        Keep scenes whose every second has a decoded frame.
+
+        :param decoded: Per-second flags of the frame_pixels the table was built from.
+        :return: SceneTable.
+        """
+        decoded_sum = np.concatenate(([0], np.cumsum(decoded, dtype=np.int64)))
+        kept = (
+            decoded_sum[self.end + 1] - decoded_sum[self.start]
+            == self.end - self.start + 1
+        )
+
+        return SceneTable(
+            start=self.start[kept],
+            end=self.end[kept],
+            first_rgb=self.first_rgb[kept],
+            last_rgb=self.last_rgb[kept],
+            median_hits=self.median_hits[kept],
+        )
+
+    def __len__(self) -> int:
+        """Return number of scenes."""
+
+        return len(self.start)
+
+    def frame_deltas(
+        self,
+        first: np.ndarray,
+        second: np.ndarray,
+        max_frame_quantity: int,
+    ) -> np.ndarray:
+        """
+        Return first frame of scene_1 minus last frame of scene_0 for every pair.
+
+        :param first: Scene_0 indexes.
+        :param second: Scene_1 indexes.
+        :param max_frame_quantity: Pixels per frame fed to the model (ex: 6).
+        :return: int16 array (pairs, max_frame_quantity, 3).
+        """
+        # разность uint8 пикселей помещается в int16, сумма по ргб тоже
+        return self.first_rgb[second, :max_frame_quantity].astype(
+            np.int16,
+        ) - self.last_rgb[first, :max_frame_quantity].astype(np.int16)
+
+    def pair_features(
+        self,
+        first: np.ndarray,
+        second: np.ndarray,
+        max_frame_quantity: int,
+        delta_type: str,
+    ) -> np.ndarray:
+        """
+        Return model input of the pairs as a contiguous float32 matrix.
+
+        "mean" averages every pixel delta over r, g, b, "full" keeps the three
+        channels of every pixel side by side.
+
+        :param first: Scene_0 indexes.
+        :param second: Scene_1 indexes.
+        :param max_frame_quantity: Pixels per frame fed to the model (ex: 6).
+        :param delta_type: "mean" or "full".
+        :return: float32 array (pairs, features).
+        """
+        deltas = self.frame_deltas(first, second, max_frame_quantity)
+
+        if delta_type == "mean":
+            features = deltas.sum(axis=2) / 3
+        elif delta_type == "full":
+            # без -1, иначе пустой список пар не решейпится
+            features = deltas.reshape(len(deltas), deltas.shape[1] * 3)
+        else:
+            raise Exception(f"Unknown delta_type: {delta_type}")
+
+        # sklearn деревья все равно работают в float32, копии при predict не будет
+        return np.ascontiguousarray(features, dtype=np.float32)
+
+
+class PairIndex:
+    """
+    Every scene pair as two int32 index arrays into a SceneTable.
+
+    Pairs follow the order of itertools.combinations, and the last scene is
+    never paired, as in the original create_all_scenes_combinations.
+    """
+
+    def __init__(self, scene_quantity: int):
+        """
+        Constructor of the index.
+
+        :param scene_quantity: Number of scenes in the table.
+        """
+        first, second = np.triu_indices(max(scene_quantity - 1, 0), k=1)
+        self.first = first.astype(np.int32)
+        self.second = second.astype(np.int32)
+
+    @classmethod
+    def nearest(
+        cls,
+        scenes: SceneTable,
+        neighbours: int,
+        max_frame_quantity: int,
+    ) -> "PairIndex":
+        """
+        Pair every scene only with its most similar later scenes.
+
+        The last frame of scene_0 and the first frame of scene_1 are compared
+        with a KD-tree, so a scene gets the neighbours later scenes whose
+        first frame is closest to its last one instead of every later scene.
+        Pairs keep the combinations order and the last scene is never paired.
+
+        :param scenes: SceneTable.
+        :param neighbours: Most scene_1 candidates per scene_0 (ex: 32).
+        :param max_frame_quantity: Pixels per frame fed to the model (ex: 6).
+        :return: PairIndex.
+        """
+        from sklearn.neighbors import KDTree
+
+        if neighbours < 0:
+            raise Exception("neighbours must be a non-negative int.")
+
+        paired = max(len(scenes) - 1, 0)
+        if neighbours >= paired - 1:
+            return cls(len(scenes))
+
+        first_points = scenes.first_rgb[:paired, :max_frame_quantity]
+        last_points = scenes.last_rgb[:paired, :max_frame_quantity]
+        tree = KDTree(first_points.reshape(paired, -1).astype(np.float32))
+        last_points = last_points.reshape(paired, -1).astype(np.float32)
+
+        # у последних сцен поздних партнеров не больше neighbours, они берут всех
+        rows = np.arange(paired - 1 - neighbours)
+        tail_first, tail_second = np.triu_indices(neighbours + 1, k=1)
+
+        first_parts = [tail_first + len(rows)]
+        second_parts = [tail_second + len(rows)]
+        query = min(paired, 2 * neighbours)
+        while len(rows):
+            # ближайшие с индексом не больше своего отбрасываются, поэтому
+            # строкам, которым их не хватило, запрос повторяется вдвое шире
+            found = tree.query(last_points[rows], k=query, return_distance=False)
+            later = found > rows[:, None]
+            enough = later.sum(axis=1) >= neighbours
+
+            order = np.argsort(~later[enough], axis=1, kind="stable")
+            second = np.take_along_axis(found[enough], order[:, :neighbours], axis=1)
+            first_parts.append(np.repeat(rows[enough], neighbours))
+            second_parts.append(second.ravel())
+
+            rows = rows[~enough]
+            query = min(paired, 2 * query)
+
+        first = np.concatenate(first_parts)
+        second = np.concatenate(second_parts)
+        order = np.lexsort((second, first))
+
+        index = cls(0)
+        index.first = first[order].astype(np.int32)
+        index.second = second[order].astype(np.int32)
+        return index
+
+    def __len__(self) -> int:
+        """Return number of pairs."""
+
+        return len(self.first)
+
+    def to_frame(self, scenes: SceneTable) -> pd.DataFrame:
+        """
+        Return the pair columns Jobs.rank_modelled_scenes works on.
+
+        :param scenes: SceneTable the index was built for.
+        :return: Data frame with one row per pair.
+        """
+        pairs_for_deltas_df = pd.DataFrame(
+            {
+                "first_frame_timestamp_0": scenes.start[self.first],
+                "last_frame_timestamp_0": scenes.end[self.first],
+                "first_frame_timestamp_1": scenes.start[self.second],
+                "last_frame_timestamp_1": scenes.end[self.second],
+                "median_mean_hits_0": scenes.median_hits[self.first],
+                "median_mean_hits_1": scenes.median_hits[self.second],
+            },
+        )
+        pairs_for_deltas_df["median_mean_hits_mean_0_1"] = (
+            pairs_for_deltas_df["median_mean_hits_0"]
+            + pairs_for_deltas_df["median_mean_hits_1"]
+        ) / 2
+
+        return pairs_for_deltas_df
+
+    def features(
+        self,
+        scenes: SceneTable,
+        max_frame_quantity: int,
+        delta_type: str,
+    ) -> np.ndarray:
+        """
+        Return model input of every pair.
+
+        :param scenes: SceneTable the index was built for.
+        :param max_frame_quantity: Pixels per frame fed to the model (ex: 6).
+        :param delta_type: "mean" or "full".
+        :return: float32 array (pairs, features).
+        """
+        return scenes.pair_features(
+            self.first,
+            self.second,
+            max_frame_quantity,
+            delta_type,
+        )
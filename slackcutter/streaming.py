@@ -0,0 +1,284 @@
+"""Bounded-memory scene pairing and ranking for long sources."""
+import os
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Union
+
+import numpy as np
+import pandas as pd
+from slackcutter import config
+from slackcutter.ranking import choose_scene_pairs, scene_keys, target_frame
+from slackcutter.scenes import PairIndex, SceneTable
+
+
+def iter_scene_bounds(
+    median_hits: Iterable[int],
+    median_hit_modificator: Union[int, float],
+) -> Iterator[int]:
+    """
+    Yield scene boundaries the way Jobs.scenes_split_on_median does.
+
+    Only the two hit counters are kept between seconds, so the flags may come
+    from any iterable, window by window.
+
+    :param median_hits: Per-second "удар_по_медиане" flags.
+    :param median_hit_modificator: Split ratio (ex: 1.5).
+    :return: Iterator of boundary seconds, starting with 0.
+    """
+    yield 0
+
+    count_0 = 0
+    count_1 = 0
+    for second, hit in enumerate(median_hits):
+        if hit == 1:
+            count_1 += 1
+        else:
+            count_0 += 1
+
+        if count_0 and count_1 / count_0 < median_hit_modificator:
+            yield second
+            count_0 = 0
+            count_1 = 0
+
+
+def iter_pair_blocks(
+    scene_quantity: int,
+    block_rows: int,
+) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    Yield scene pairs in the order of Jobs.create_all_scenes_combinations.
+
+    The last scene is never paired, as in the original combinations.
+
+    :param scene_quantity: Number of scenes.
+    :param block_rows: Most pairs per block.
+    :return: Iterator of (scene_0 indexes, scene_1 indexes) blocks.
+    """
+    first_parts: list = []
+    second_parts: list = []
+    rows = 0
+
+    for first in range(0, scene_quantity - 2):
+        second = np.arange(first + 1, scene_quantity - 1)
+        while len(second):
+            taken = second[: block_rows - rows]
+            second = second[len(taken) :]
+
+            first_parts.append(np.full(len(taken), first))
+            second_parts.append(taken)
+            rows += len(taken)
+
+            if rows == block_rows:
+                yield np.concatenate(first_parts), np.concatenate(second_parts)
+                first_parts, second_parts, rows = [], [], 0
+
+    if rows:
+        yield np.concatenate(first_parts), np.concatenate(second_parts)
+
+
+class PairStream:
+    """
+    Scores and ranks all scene pairs block by block under a memory limit.
+
+    Pairs over the model threshold are spilled to disk, so neither the pair
+    combinations nor their probabilities are held in memory at once. Ranking
+    reproduces Jobs.rank_modelled_scenes.
+    """
+
+    __columns = (("first", np.int64), ("second", np.int64), ("propaility", np.float64))
+
+    def __init__(
+        self,
+        scenes: SceneTable,
+        spill_dir: Union[str, Path],
+        memory_limit: int = config.streaming_memory_limit,
+        pairs: Union[PairIndex, None] = None,
+    ):
+        """
+        Constructor of the stream.
+
+        :param scenes: SceneTable.
+        :param spill_dir: Directory for passed pairs, owned by the job (ex: workspace.map_dir).
+        :param memory_limit: Bytes one block of pairs may take (ex: 256 * 1024 ** 2).
+        :param pairs: Candidate pairs, e.g. from PairIndex.nearest. None - every scene combination.
+        """
+        self.scenes = scenes
+        self.spill_dir = Path(spill_dir)
+        self.memory_limit = memory_limit
+        self.candidates = pairs
+
+        self.pairs = 0
+        self.passed = 0
+        self.blocks = 0
+        self.__hit_levels: set = set()
+
+    def block_rows(self, max_frame_quantity: int, feature_quantity: int) -> int:
+        """
+        Return number of pairs one scoring block may hold.
+
+        :param max_frame_quantity: Pixels per frame fed to the model (ex: 6).
+        :param feature_quantity: Model input width.
+        :return: Rows per block.
+        """
+        # int16 пиксели пары и их разность, сумма по ргб и ее float64 среднее,
+        # float32 признаки, индексы, вероятности, маска и уровни хитов
+        pair_bytes = 34 * max_frame_quantity + 4 * feature_quantity + 64
+        return max(1, self.memory_limit // pair_bytes)
+
+    def score(
+        self,
+        model: Any,
+        model_threshold: Union[int, float],
+        max_frame_quantity: int,
+        delta_type: str,
+    ) -> None:
+        """
+        Predict every pair and spill the ones over the threshold.
+
+        :param model: Fitted classifier with predict_proba.
+        :param model_threshold: Lowest kept probability, exclusive (ex: 0.2).
+        :param max_frame_quantity: Pixels per frame fed to the model (ex: 6).
+        :param delta_type: "mean" or "full".
+        """
+        feature_quantity = max_frame_quantity * (3 if delta_type == "full" else 1)
+        block_rows = self.block_rows(max_frame_quantity, feature_quantity)
+        hits = self.scenes.median_hits
+
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        spills = [open(self.__spill_path(name), "wb") for name, _ in self.__columns]
+        try:
+            for first, second in self.__iter_pairs(block_rows):
+                features = self.scenes.pair_features(
+                    first,
+                    second,
+                    max_frame_quantity,
+                    delta_type,
+                )
+                propaility = model.predict_proba(features)[:, 1]
+
+                passed = propaility > model_threshold
+                for spill, column in zip(
+                    spills,
+                    (first[passed], second[passed], propaility[passed]),
+                ):
+                    column.tofile(spill)
+
+                # уровни median_mean_hits_mean_0_1 прошедших пар нужны ранжированию
+                levels = (hits[first[passed]] + hits[second[passed]]) / 2
+                self.__hit_levels.update(np.unique(levels).tolist())
+
+                self.pairs += len(first)
+                self.passed += int(passed.sum())
+                self.blocks += 1
+        finally:
+            for spill in spills:
+                spill.close()
+
+    def rank(self) -> pd.DataFrame:
+        """
+        Choose one scene_1 for every scene_0, as Jobs.rank_modelled_scenes does.
+
+        :return: target_df with scene timestamps, best probability first.
+        """
+        scenes = self.scenes
+        keys = scene_keys(scenes.start, scenes.end)
+        used: set = set()
+
+        chosen_first = []
+        chosen_second = []
+        chosen_propaility = []
+        chosen_levels = []
+        for first, second, propaility in self.__iter_group_blocks():
+            levels = (scenes.median_hits[first] + scenes.median_hits[second]) / 2
+            chosen = choose_scene_pairs(
+                first,
+                keys[second],
+                scenes.start[second],
+                scenes.end[first] - scenes.start[second],
+                levels,
+                len(self.__hit_levels),
+                used,
+            )
+            chosen_first.append(first[chosen])
+            chosen_second.append(second[chosen])
+            chosen_propaility.append(propaility[chosen])
+            chosen_levels.append(levels[chosen])
+
+        first = np.concatenate(chosen_first or [np.empty(0, dtype=np.int64)])
+        second = np.concatenate(chosen_second or [np.empty(0, dtype=np.int64)])
+
+        return target_frame(
+            scenes.start[first],
+            scenes.end[first],
+            scenes.start[second],
+            scenes.end[second],
+            np.concatenate(chosen_propaility or [np.empty(0)]),
+            np.concatenate(chosen_levels or [np.empty(0)]),
+        )
+
+    def cleanup(self) -> None:
+        """Delete spilled pairs."""
+
+        for name, _ in self.__columns:
+            try:
+                os.remove(self.__spill_path(name))
+            except FileNotFoundError:
+                pass
+
+    def __iter_pairs(self, block_rows: int) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        if self.candidates is None:
+            yield from iter_pair_blocks(len(self.scenes), block_rows)
+            return
+
+        # индексы кандидатов int32, в спилл пишутся int64
+        for begin in range(0, len(self.candidates), block_rows):
+            yield (
+                self.candidates.first[begin : begin + block_rows].astype(np.int64),
+                self.candidates.second[begin : begin + block_rows].astype(np.int64),
+            )
+
+    def __iter_group_blocks(self) -> Iterator[tuple[np.ndarray, ...]]:
+        # пары пролиты по возрастанию scene_0, последняя группа блока
+        # может продолжиться в следующем, поэтому она переносится туда;
+        # сцены с одинаковыми границами (две 0_0 при min_crop_interval=0)
+        # идут подряд и, как по scene_id в старом коде, образуют одну группу
+        start, end = self.scenes.start, self.scenes.end
+        new_bounds = np.concatenate(
+            ([True], (start[1:] != start[:-1]) | (end[1:] != end[:-1])),
+        )
+        groups = np.maximum.accumulate(
+            np.where(new_bounds, np.arange(len(start)), 0),
+        )
+
+        # три колонки прочитанного блока, перенесенная группа и их склейка
+        block_rows = max(1, self.memory_limit // (3 * 24))
+        spills = [open(self.__spill_path(name), "rb") for name, _ in self.__columns]
+        try:
+            rest = [np.empty(0, dtype=dtype) for _, dtype in self.__columns]
+
+            while True:
+                block = [
+                    np.fromfile(spill, dtype=dtype, count=block_rows)
+                    for spill, (_, dtype) in zip(spills, self.__columns)
+                ]
+                if not len(block[0]):
+                    break
+
+                block[0] = groups[block[0]]
+                first, second, propaility = (
+                    np.concatenate((rest_column, column))
+                    for rest_column, column in zip(rest, block)
+                )
+
+                tail = int(np.searchsorted(first, first[-1]))
+                if tail:
+                    yield first[:tail], second[:tail], propaility[:tail]
+                rest = [first[tail:], second[tail:], propaility[tail:]]
+
+            if len(rest[0]):
+                yield tuple(rest)
+        finally:
+            for spill in spills:
+                spill.close()
+
+    def __spill_path(self, name: str) -> Path:
+        return self.spill_dir / f"stream_pairs_{name}.bin"
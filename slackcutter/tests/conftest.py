@@ -0,0 +1,99 @@
+import shutil
+import subprocess
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from slackcutter import config
+
+
+@pytest.fixture(scope="session")
+def trained_model(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """
+    Small forest over six pixel deltas, the layout of the trained models.
+
+    :param tmp_path_factory: pytest temp directories.
+    :return: Path to the .joblib model file.
+    """
+    rng = np.random.default_rng(0)
+    features = rng.uniform(-255, 255, (500, 6))
+    labels = (features.sum(axis=1) > 0).astype(int)
+
+    model_path = tmp_path_factory.mktemp("trained_models") / "forest.joblib"
+    joblib.dump(
+        RandomForestClassifier(20, max_depth=6, random_state=0).fit(features, labels),
+        model_path,
+    )
+    return model_path
+
+
+@pytest.fixture
+def models_folder(trained_model: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """
+    Point config.trained_models_folder at the test model.
+
+    :param trained_model: Test model.
+    :param monkeypatch: pytest monkeypatch.
+    :return: Models folder.
+    """
+    monkeypatch.setattr(
+        config,
+        "trained_models_folder",
+        trained_model.parent.as_posix(),
+    )
+    return trained_model.parent
+
+
+def make_video(dest: Path, seconds: int) -> Path:
+    """
+    Render a small h264/aac test video with changing colors and loudness.
+
+    :param dest: Output .mp4 path.
+    :param seconds: Duration.
+    :return: dest.
+    """
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc2=size=160x90:rate=10:duration={seconds},hue=H=2*PI*t/7",
+            "-f",
+            "lavfi",
+            "-i",
+            f"aevalsrc=0.2*sin(2*PI*t/9)+0.1*sin(2*PI*t/2.3)+0.05*random(0):"
+            f"s=8000:d={seconds}",
+            "-c:v",
+            "libx264",
+            "-g",
+            "20",
+            "-pix_fmt",
+            "yuv420p",
+            "-c:a",
+            "aac",
+            "-shortest",
+            str(dest),
+        ],
+        check=True,
+    )
+    return dest
+
+
+@pytest.fixture(scope="session")
+def source_video(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """
+    Two minute test video, skips the test when ffmpeg is not installed.
+
+    :param tmp_path_factory: pytest temp directories.
+    :return: Path to the video.
+    """
+    if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+        pytest.skip("ffmpeg is not installed")
+
+    return make_video(tmp_path_factory.mktemp("sources") / "source.mp4", 120)
@@ -0,0 +1,89 @@
+import errno
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from slackcutter import batch
+from slackcutter.tests.conftest import make_video
+
+
+@pytest.fixture
+def manifest(source_video: Path, tmp_path: Path) -> Path:
+    """
+    Two-job .json manifest, one job with its own output name and settings.
+
+    :param source_video: Two minute test video.
+    :param tmp_path: pytest temp directory.
+    :return: Path to the manifest.
+    """
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    make_video(sources / "short.mp4", 60)
+
+    manifest_dest = sources / "manifest.json"
+    manifest_dest.write_text(
+        json.dumps(
+            [
+                source_video.as_posix(),
+                {
+                    "source": "short.mp4",
+                    "output_name": "short_clip.mp4",
+                    "max_seconds_length": 10,
+                },
+            ],
+        ),
+        encoding="utf-8",
+    )
+    return manifest_dest
+
+
+def test_run_batch(manifest: Path, models_folder: Path, tmp_path: Path) -> None:
+    """Tests that a batch makes every clip and a second run skips them."""
+    output_dir = tmp_path / "clips"
+    jobs = batch.read_jobs(manifest)
+    settings = {"trained_model_name": "forest.joblib", "max_seconds_length": 30}
+
+    reports = list(batch.run_batch(jobs, settings, output_dir, workers=2))
+    rerun = list(batch.run_batch(jobs, settings, output_dir, workers=2))
+
+    assert [job["output_name"] for job in jobs] == ["source.mp4", "short_clip.mp4"]
+    assert sorted(report["status"] for report in reports) == ["done", "done"], reports
+    assert sorted(path.name for path in output_dir.iterdir()) == [
+        "short_clip.mp4",
+        "source.mp4",
+    ]
+    assert all((output_dir / job["output_name"]).stat().st_size for job in jobs)
+    assert [report["status"] for report in rerun] == ["skipped", "skipped"]
+
+
+def test_run_job_moves_within_output_filesystem(
+    source_video: Path,
+    models_folder: Path,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tests that the clip is never moved in from the system temp directory."""
+    output_dir = tmp_path / "clips"
+    output_dir.mkdir()
+    monkeypatch.setattr(batch.tempfile, "tempdir", (tmp_path / "other_fs").as_posix())
+    (tmp_path / "other_fs").mkdir()
+    replace = os.replace
+
+    def cross_device_replace(source: str, dest: str) -> None:
+        # система tmp на другой файловой системе, os.replace туда не умеет
+        if Path(source).parent.parent != Path(dest).parent:
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        replace(source, dest)
+
+    monkeypatch.setattr(batch.os, "replace", cross_device_replace)
+    report = batch.run_job(
+        {"source": source_video.as_posix(), "output_name": "clip.mp4", "settings": {}},
+        {"trained_model_name": "forest.joblib", "max_seconds_length": 30},
+        output_dir.as_posix(),
+    )
+
+    assert report["status"] == "done", report
+    assert [path.name for path in output_dir.iterdir()] == ["clip.mp4"]
+    assert not list((tmp_path / "other_fs").iterdir())
@@ -0,0 +1,79 @@
+import os
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+
+from slackcutter.cache import AnalysisCache
+
+
+def test_key_depends_on_params() -> None:
+    """Tests that keys change with any parameter and ignore their order."""
+    key = AnalysisCache.key("pairs", deltas="abc", crop_interval=[1, 5])
+
+    assert key == AnalysisCache.key("pairs", crop_interval=[1, 5], deltas="abc")
+    assert key != AnalysisCache.key("pairs", deltas="abc", crop_interval=[1, 6])
+    assert key != AnalysisCache.key("deltas", deltas="abc", crop_interval=[1, 5])
+
+
+def test_put_get(tmp_path: Path) -> None:
+    """Tests that stored values come back and misses give None."""
+    cache = AnalysisCache(tmp_path)
+    value = (np.arange(10), [1, 2])
+
+    cache.put("key", value)
+    cached = cache.get("key")
+
+    assert (cached[0] == value[0]).all() and cached[1] == value[1]
+    assert cache.get("other") is None
+    assert cache.fetch("key", lambda: None)[1] is True
+
+
+def test_evicts_least_recently_used(tmp_path: Path) -> None:
+    """Tests that entries over budget are evicted oldest access first."""
+    cache = AnalysisCache(tmp_path, max_bytes=10**9)
+    for number, key in enumerate(["first", "second", "third"]):
+        cache.put(key, np.zeros(1000, dtype=np.uint8))
+        os.utime(tmp_path / f"{key}.joblib", (number, number))
+
+    # get обновляет время доступа, так что first становится самой свежей
+    cache.get("first")
+    entry_size = (tmp_path / "second.joblib").stat().st_size
+    cache.max_bytes = 2 * entry_size
+    cache.evict()
+
+    assert cache.get("second") is None
+    assert cache.get("first") is not None
+    assert cache.get("third") is not None
+
+
+def test_put_is_atomic(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Tests that a failed write leaves neither an entry nor a temp file."""
+    cache = AnalysisCache(tmp_path)
+    cache.put("key", np.arange(3))
+
+    def broken_dump(value: object, path: str) -> None:
+        with open(path, "wb") as fp:
+            fp.write(b"partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(joblib, "dump", broken_dump)
+    with pytest.raises(OSError):
+        cache.put("key", np.arange(5))
+    with pytest.raises(OSError):
+        cache.put("new", np.arange(5))
+
+    assert (cache.get("key") == np.arange(3)).all()
+    assert cache.get("new") is None
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["key.joblib"]
+
+
+def test_get_ignores_partial_entry(tmp_path: Path) -> None:
+    """Tests that a truncated entry reads as a miss."""
+    cache = AnalysisCache(tmp_path)
+    cache.put("key", np.arange(1000))
+    entry = tmp_path / "key.joblib"
+    entry.write_bytes(entry.read_bytes()[:20])
+
+    assert cache.get("key") is None
@@ -0,0 +1,254 @@
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pytest
+
+from slackcutter import config
+from slackcutter.cache import AnalysisCache
+from slackcutter.core import SlackCutter
+from slackcutter.jobs import Jobs
+from slackcutter.workspace import Workspace
+
+
+@pytest.mark.parametrize("analysis_mode", ["full", "coarse"])
+def test_sweep_matches_plans(
+    source_video: Path,
+    models_folder: Path,
+    tmp_path: Path,
+    analysis_mode: str,
+) -> None:
+    """Tests that every sweep plan is the plan of the same settings."""
+    slack = SlackCutter(
+        source_video.as_posix(),
+        "forest.joblib",
+        max_seconds_length=30,
+        workspace=Workspace(tmp_path / "slack"),
+        analysis_mode=analysis_mode,
+    )
+    model_threshold = slack.model_threshold
+    plans = slack.sweep(
+        model_thresholds=[0.1, 0.5],
+        median_hit_modificators=[1, 1.5],
+    )
+
+    assert [settings["model_threshold"] for settings, _ in plans] == [
+        0.1,
+        0.5,
+        0.1,
+        0.5,
+    ]
+    assert slack.model_threshold == model_threshold
+    for settings, sweep_plan in plans:
+        slack.model_threshold = settings["model_threshold"]
+        slack.median_hit_modificator = settings["median_hit_modificator"]
+        pd.testing.assert_frame_equal(sweep_plan, slack.plan())
+    slack.workspace.cleanup()
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{"analysis_mode": "audio"}, {"streaming": True}],
+    ids=["audio", "streaming"],
+)
+def test_sweep_rejects_unsupported_modes(
+    source_video: Path,
+    models_folder: Path,
+    tmp_path: Path,
+    options: dict,
+) -> None:
+    """Tests that sweep refuses modes without in-memory pair probabilities."""
+    slack = SlackCutter(
+        source_video.as_posix(),
+        "forest.joblib",
+        max_seconds_length=30,
+        workspace=Workspace(tmp_path / "slack"),
+        **options,
+    )
+
+    with pytest.raises(Exception, match="sweep"):
+        slack.sweep(model_thresholds=[0.1, 0.5])
+    slack.workspace.cleanup()
+
+
+def coarse_and_full_plans(
+    source_video: Path,
+    tmp_path: Path,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Plan the same clip with coarse and full analysis.
+
+    :param source_video: Source video.
+    :param tmp_path: Directory for the workspaces.
+    :return: Coarse plan and full plan.
+    """
+    plans = []
+    for analysis_mode in ("coarse", "full"):
+        slack = SlackCutter(
+            source_video.as_posix(),
+            "forest.joblib",
+            max_seconds_length=30,
+            workspace=Workspace(tmp_path / analysis_mode),
+            analysis_mode=analysis_mode,
+        )
+        plans.append(slack.plan())
+        slack.workspace.cleanup()
+
+    return plans[0], plans[1]
+
+
+def test_coarse_plan_covering_source_matches_full(
+    source_video: Path,
+    models_folder: Path,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tests that coarse regions over the whole source give the full analysis plan."""
+    monkeypatch.setattr(config, "coarse_coverage", 10)
+
+    coarse_plan, full_plan = coarse_and_full_plans(source_video, tmp_path)
+
+    assert len(full_plan)
+    pd.testing.assert_frame_equal(coarse_plan, full_plan)
+
+
+def test_coarse_plan_stays_in_regions(
+    source_video: Path,
+    models_folder: Path,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tests that with partial coverage every planned scene lies inside a decoded region."""
+    monkeypatch.setattr(config, "coarse_coverage", 1)
+    found_regions: list = []
+    coarse_regions = Jobs.coarse_regions
+
+    def spy(*args: Any) -> list:
+        regions = coarse_regions(*args)
+        found_regions.extend(regions)
+        return regions
+
+    monkeypatch.setattr(Jobs, "coarse_regions", staticmethod(spy))
+
+    coarse_plan, _ = coarse_and_full_plans(source_video, tmp_path)
+
+    assert 0 < sum(end - start for start, end in found_regions) < 120
+    assert len(coarse_plan)
+    for start_sec, end_sec in coarse_plan[["start_sec", "end_sec"]].to_numpy():
+        assert any(start <= start_sec and end_sec < end for start, end in found_regions)
+
+
+def test_coarse_uses_cache(
+    source_video: Path,
+    models_folder: Path,
+    tmp_path: Path,
+) -> None:
+    """Tests that a second coarse run takes audio and region frames from the cache."""
+    plans = []
+    for _ in range(2):
+        slack = SlackCutter(
+            source_video.as_posix(),
+            "forest.joblib",
+            max_seconds_length=30,
+            workspace=Workspace(tmp_path / "slack"),
+            analysis_mode="coarse",
+            cache=AnalysisCache(tmp_path / "cache"),
+        )
+        plans.append(slack.plan())
+        slack.workspace.cleanup()
+
+    assert slack.profile["cache:audio"].counts["hit"] == 1
+    assert slack.profile["cache:coarse_frames"].counts["hit"] == 1
+    with pytest.raises(KeyError):
+        slack.profile["frames"]
+    pd.testing.assert_frame_equal(plans[1], plans[0])
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{}, {"streaming": True}, {"analysis_mode": "coarse"}, {"analysis_mode": "audio"}],
+    ids=["full", "streaming", "coarse", "audio"],
+)
+def test_range_without_scenes(
+    source_video: Path,
+    models_folder: Path,
+    tmp_path: Path,
+    options: dict,
+) -> None:
+    """Tests that a range shorter than one scene plans nothing and refuses to render."""
+    slack = SlackCutter(
+        source_video.as_posix(),
+        "forest.joblib",
+        max_seconds_length=2,
+        crop_interval=[5, 10],
+        workspace=Workspace(tmp_path / "slack"),
+        start=40,
+        end=43,
+        **options,
+    )
+
+    clip_plan = slack.plan()
+
+    assert len(clip_plan) == 0
+    assert list(clip_plan) == ["start_sec", "end_sec", "pair", "propaility", "score"]
+    with pytest.raises(Exception, match="No scenes in the analysed range"):
+        slack.render()
+    slack.workspace.cleanup()
+
+
+@pytest.mark.parametrize(
+    "options, message",
+    [
+        ({"analysis_mode": "Audio"}, "analysis_mode"),
+        ({"analysis_mode": "corse"}, "analysis_mode"),
+        ({"pairing_neighbours": -1}, "pairing_neighbours"),
+    ],
+    ids=["audio_case", "coarse_typo", "negative_neighbours"],
+)
+def test_rejects_bad_settings(
+    source_video: Path,
+    models_folder: Path,
+    tmp_path: Path,
+    options: dict,
+    message: str,
+) -> None:
+    """Tests that a mistyped analysis mode or a negative neighbour count is rejected."""
+    with pytest.raises(Exception, match=message):
+        SlackCutter(
+            source_video.as_posix(),
+            "forest.joblib",
+            max_seconds_length=30,
+            workspace=Workspace(tmp_path / "slack"),
+            **options,
+        )
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{}, {"streaming": True}, {"analysis_mode": "coarse"}, {"analysis_mode": "audio"}],
+    ids=["full", "streaming", "coarse", "audio"],
+)
+def test_range_plan_in_source_time(
+    source_video: Path,
+    models_folder: Path,
+    tmp_path: Path,
+    options: dict,
+) -> None:
+    """Tests that a range plans scenes in source seconds, all inside the range."""
+    slack = SlackCutter(
+        source_video.as_posix(),
+        "forest.joblib",
+        max_seconds_length=20,
+        workspace=Workspace(tmp_path / "slack"),
+        start=45,
+        end=100,
+        **options,
+    )
+
+    clip_plan = slack.plan()
+    slack.workspace.cleanup()
+
+    assert len(clip_plan)
+    assert (clip_plan["start_sec"] >= 45).all()
+    assert (clip_plan["end_sec"] < 100).all()
+    assert (clip_plan["start_sec"] <= clip_plan["end_sec"]).all()
@@ -0,0 +1,78 @@
+import shutil
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+from slackcutter.forest import PREDICT_BLOCK_ROWS, CompiledForest, compile_model
+from slackcutter.registry import ModelRegistry
+
+
+def pixel_deltas(seed: int, rows: int, width: int = 6) -> np.ndarray:
+    """
+    Return random mean pixel deltas, multiples of 1/3 like the real features.
+
+    :param seed: Random seed.
+    :param rows: Number of rows.
+    :param width: Features per row.
+    :return: Array (rows, width).
+    """
+    rng = np.random.default_rng(seed)
+    return np.round(rng.uniform(-255, 255, (rows, width)) * 3) / 3
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        RandomForestClassifier(30, max_depth=8, random_state=1),
+        RandomForestClassifier(5, random_state=2),
+        ExtraTreesClassifier(10, random_state=3),
+    ],
+    ids=["forest", "deep", "extra"],
+)
+def test_compiled_forest_matches_sklearn(model: object) -> None:
+    """Tests that the compiled forest gives sklearn probabilities across predict blocks."""
+    features = pixel_deltas(0, 2000)
+    model.fit(
+        features,
+        (features[:, :3].sum(axis=1) > features[:, 3:].sum(axis=1)).astype(int),
+    )
+    check = np.vstack((pixel_deltas(1, PREDICT_BLOCK_ROWS + 500), features[:200]))
+
+    forest = CompiledForest.from_sklearn(model)
+
+    assert (
+        np.abs(forest.predict_proba(check) - model.predict_proba(check)).max() <= 1e-12
+    )
+    assert forest.predict_proba(np.empty((0, 6))).shape == (0, 2)
+    assert forest.classes_.tolist() == model.classes_.tolist()
+
+
+def test_compiled_forest_rejects_wrong_width(trained_model: Path) -> None:
+    """Tests that rows of another width are rejected."""
+    forest = CompiledForest.from_sklearn(joblib.load(trained_model))
+
+    with pytest.raises(Exception, match="Expected 6 features"):
+        forest.predict_proba(np.zeros((3, 18)))
+
+
+def test_compile_model_roundtrip(trained_model: Path, tmp_path: Path) -> None:
+    """Tests that an exported .npz loads back and the registry prefers it."""
+    model_path = Path(shutil.copy(trained_model, tmp_path / "forest.joblib"))
+    check = pixel_deltas(2, 300)
+
+    compile_model(model_path, check_rows=500)
+    forest = CompiledForest.load(tmp_path / "forest.npz")
+    loaded = ModelRegistry(compiled=True).get(model_path)
+
+    assert isinstance(loaded, CompiledForest)
+    assert np.array_equal(forest.predict_proba(check), loaded.predict_proba(check))
+    assert (
+        np.abs(
+            forest.predict_proba(check) - joblib.load(model_path).predict_proba(check),
+        ).max()
+        <= 1e-12
+    )
+    assert not isinstance(ModelRegistry(compiled=False).get(model_path), CompiledForest)
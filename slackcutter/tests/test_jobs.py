@@ -0,0 +1,216 @@
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pytest
+
+from slackcutter.jobs import Jobs
+from slackcutter.probe import MediaProbe
+
+
+def reference_audio_features(
+    pcm: list,
+    step: int,
+    low_percentage_audio: int,
+    high_percentage_audio: int,
+) -> list:
+    """
+    Per-second audio features as the original audio_info_extractor_job7 loop made them.
+
+    :param pcm: PCM samples.
+    :param step: Samples per second.
+    :param low_percentage_audio: Low percentile (ex: 25).
+    :param high_percentage_audio: High percentile (ex: 75).
+    :return: Rows of mean, median, min, max, median hit, max hit.
+    """
+    chunks = [pcm[x : x + step] for x in range(0, len(pcm), step)]
+    rows = [
+        [
+            int(sum(chunk) / len(chunk)),
+            int(statistics.median(chunk)),
+            min(chunk),
+            max(chunk),
+        ]
+        for chunk in chunks
+    ]
+
+    medians = np.array([row[1] for row in rows])
+    p_25_median = np.percentile(medians, low_percentage_audio)
+    p_75_median = np.percentile(medians, high_percentage_audio)
+    p_75_max = np.percentile(np.array([row[3] for row in rows]), high_percentage_audio)
+
+    for row in rows:
+        median_hit = (row[1] > 0 and row[1] > p_75_median) or (
+            row[1] < 0 and row[1] > p_25_median
+        )
+        row.append(int(median_hit))
+        row.append(int(row[3] > p_75_max))
+
+    return rows
+
+
+@pytest.mark.parametrize("samples", [8000 * 30, 8000 * 30 + 1234, 777])
+def test_audio_features(samples: int) -> None:
+    """Tests that vectorized audio features match the original per-second loop."""
+    rng = np.random.default_rng(samples)
+    pcm = (rng.normal(0, 4000, samples) + rng.integers(-300, 300)).astype("<i2")
+
+    features = Jobs.audio_features(pcm, 8000, 25, 75)
+
+    assert features.tolist() == reference_audio_features(pcm.tolist(), 8000, 25, 75)
+
+
+def test_audio_seconds_stats_empty() -> None:
+    """Tests that empty PCM gives no seconds."""
+    stats = Jobs.audio_seconds_stats(np.empty(0, dtype="<i2"), 8000)
+
+    assert stats.shape == (0, 4)
+
+
+@pytest.mark.parametrize("window", [None, (17, 95)])
+def test_sharded_decode_matches(source_video: Path, window: Optional[tuple]) -> None:
+    """Tests that time shards decode the same frames and audio as one pass."""
+    frame_pixels, pcm = Jobs.decode_analysis_media(source_video, window=window)
+
+    shard_pixels, audio_stats = Jobs.decode_analysis_media_sharded(
+        source_video,
+        4,
+        window=window,
+    )
+
+    assert len(frame_pixels) == (120 if window is None else 78)
+    assert np.array_equal(shard_pixels, frame_pixels)
+    assert np.array_equal(audio_stats, Jobs.audio_seconds_stats(pcm, 8000))
+
+
+KEYFRAMES = np.array([[0.0, 0.0], [2.0, 1.96], [4.0, 3.96], [6.0, 5.96], [8.0, 7.96]])
+
+
+@pytest.mark.parametrize(
+    "segment, expected",
+    [
+        (
+            (1.5, 7.25),
+            [(1.5, 2.0, 2.0, False), (2.0, 6.0, 5.96, True), (6.0, 7.25, 7.25, False)],
+        ),
+        ((2.0, 6.0), [(2.0, 6.0, 5.96, True)]),
+        ((2.0, 5.0), [(2.0, 4.0, 3.96, True), (4.0, 5.0, 5.0, False)]),
+        ((2.5, 5.5), [(2.5, 5.5, 5.5, False)]),
+        ((6.5, 9.0), [(6.5, 9.0, 9.0, False)]),
+    ],
+    ids=["both_edges", "on_keyframes", "tail", "one_keyframe", "after_last"],
+)
+def test_smart_cut_parts(segment: tuple, expected: list) -> None:
+    """Tests that a segment is copied between its keyframes and encoded at the edges."""
+    parts = Jobs.smart_cut_parts(*segment, KEYFRAMES)
+
+    assert parts == expected
+    assert parts[0][0] == segment[0] and parts[-1][1] == segment[1]
+    assert all(part[1] == next_part[0] for part, next_part in zip(parts, parts[1:]))
+
+
+def test_source_concat_list_keeps_fractions(tmp_path: Path) -> None:
+    """Tests that concat lists carry fractional bounds and quote the source path."""
+    source = tmp_path / "it's.mp4"
+
+    concat_list = Jobs.source_concat_list(source, [[1.5, 3.25], [10, 12]])
+
+    quoted = source.resolve().as_posix().replace("'", "'\\''")
+    assert concat_list == (
+        "ffconcat version 1.0\n"
+        f"file 'file:{quoted}'\ninpoint 1.500000\noutpoint 3.250000\n"
+        f"file 'file:{quoted}'\ninpoint 10.000000\noutpoint 12.000000\n"
+    )
+
+
+@pytest.mark.parametrize(
+    "window, args",
+    [
+        (None, []),
+        ((17, 95), ["-ss", "17", "-t", "78"]),
+        ((0, 3), ["-ss", "0", "-t", "3"]),
+    ],
+)
+def test_input_window(window: Optional[tuple], args: list) -> None:
+    """Tests that a window seeks the input to its start and limits its length."""
+    assert Jobs.input_window(window) == args
+
+
+def test_predict_pairs_empty(trained_model: Path) -> None:
+    """Tests that no pairs give no probabilities instead of a model error."""
+    propaility = Jobs.predict_pairs(trained_model, np.empty((0, 6), dtype=np.float32))
+
+    assert propaility.shape == (0,)
+
+
+def mpegts_supported() -> bool:
+    """
+    Return whether ffmpeg can write and read back the mpegts parts of a smart cut.
+
+    :return: True when an encoded mpegts sample decodes.
+    """
+    sample = subprocess.run(
+        [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            "testsrc2=size=160x90:rate=10:duration=1",
+            "-c:v",
+            "libx264",
+            "-f",
+            "mpegts",
+            "pipe:1",
+        ],
+        capture_output=True,
+    )
+    decoded = subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "mpegts", "-i", "pipe:0", "-f", "null", "-"],
+        input=sample.stdout,
+        capture_output=True,
+    )
+    return sample.returncode == 0 and decoded.returncode == 0
+
+
+@pytest.mark.parametrize("sound_check", [True, False])
+def test_render_clip_smart(
+    source_video: Path,
+    tmp_path: Path,
+    sound_check: bool,
+) -> None:
+    """Tests that a clip of copied and encoded parts decodes cleanly at the segments' length."""
+    if not mpegts_supported():
+        pytest.skip("ffmpeg can't read back mpegts parts")
+    # ключевые кадры через 2 с (-g 20 при 10 fps): края в середине GOP и на ключевых
+    secs_crop_list = [[3.5, 9.2], [20, 31], [44.3, 50]]
+    output_dest = tmp_path / "clip.mp4"
+
+    segments, parts = Jobs.render_clip_smart(
+        secs_crop_list,
+        source_video,
+        output_dest,
+        sound_check,
+        60,
+        Jobs.probe_keyframes(source_video),
+        tmp_path,
+    )
+
+    assert segments == secs_crop_list
+    assert any(part[3] for part in parts) and not all(part[3] for part in parts)
+    media_info = MediaProbe().probe(output_dest)
+    assert (media_info.audio_codec is not None) == sound_check
+    assert media_info.duration == pytest.approx(
+        sum(end - start for start, end in segments),
+        abs=0.25,
+    )
+    decoded = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", str(output_dest), "-f", "null", "-"],
+        capture_output=True,
+        text=True,
+    )
+    assert decoded.returncode == 0
+    assert decoded.stderr == ""
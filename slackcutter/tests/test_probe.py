@@ -0,0 +1,116 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Union
+
+import pytest
+
+from slackcutter.probe import MediaInfo, MediaProbe, parse_duration
+
+PROBE = {
+    "format": {"duration": "12.5"},
+    "streams": [{"index": 0, "codec_type": "video", "codec_name": "h264"}],
+    "packets": [
+        {"stream_index": 0, "pts_time": "2.0", "flags": "K_"},
+        {"stream_index": 0, "pts_time": "0.0", "flags": "K_"},
+        {"stream_index": 0, "pts_time": "1.0", "flags": "__"},
+    ],
+}
+
+
+def test_key_priority(tmp_path: Path) -> None:
+    """Tests that a known content hash wins, then md5 of bytes, then the file stat."""
+    media = tmp_path / "media.mp4"
+    media.write_bytes(b"media")
+    os.utime(media, ns=(1, 1))
+
+    assert MediaProbe.key(media, content_hash="s3md5") == "s3md5"
+    assert MediaProbe.key(b"media", content_hash="s3md5") == "s3md5"
+    assert MediaProbe.key(b"media") == hashlib.md5(b"media").hexdigest()  # noqa: S324
+    assert MediaProbe.key(media) == f"{media.resolve().as_posix()}:5:1"
+
+    os.utime(media, ns=(2, 2))
+    assert MediaProbe.key(media) == f"{media.resolve().as_posix()}:5:2"
+
+
+def test_bytes_fall_back_to_temp_file(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Tests that bytes ffprobe can't read from a pipe are probed from a removed temp file."""
+    calls = []
+
+    def run(
+        self: MediaProbe,
+        target: str,
+        body: Union[bytes, None] = None,
+    ) -> Union[MediaInfo, None]:
+        calls.append((target, body))
+        if target == "pipe:0":
+            return None
+
+        assert Path(target).read_bytes() == b"moov at the end"
+        return MediaInfo(PROBE)
+
+    monkeypatch.setattr(MediaProbe, "_MediaProbe__run", run)
+    media_probe = MediaProbe()
+
+    info = media_probe.probe(b"moov at the end")
+    cached = media_probe.probe(b"moov at the end")
+
+    assert cached is info
+    assert len(calls) == 2
+    assert calls[0] == ("pipe:0", b"moov at the end") and calls[1][1] is None
+    assert not Path(calls[1][0]).exists()
+    assert info.duration == 12.5 and info.keyframes.tolist() == [0.0, 2.0]
+
+
+def test_probe_failure_is_not_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Tests that unreadable media raises and is probed again next time."""
+    calls = []
+    monkeypatch.setattr(
+        MediaProbe,
+        "_MediaProbe__run",
+        lambda self, target, body=None: calls.append(target),
+    )
+    media_probe = MediaProbe()
+
+    for _ in range(2):
+        with pytest.raises(Exception, match="Can't probe media"):
+            media_probe.probe(b"not media")
+
+    assert len(calls) == 4
+    assert len(media_probe) == 0
+
+
+def test_probe_keeps_max_entries(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Tests that the least recently used result is dropped over max_entries."""
+    monkeypatch.setattr(
+        MediaProbe,
+        "_MediaProbe__run",
+        lambda self, target, body=None: MediaInfo(PROBE),
+    )
+    media_probe = MediaProbe(max_entries=2)
+
+    first = media_probe.probe(b"first")
+    media_probe.probe(b"second")
+    media_probe.probe(b"first")
+    media_probe.probe(b"third")
+
+    assert len(media_probe) == 2
+    assert media_probe.probe(b"first") is first
+
+
+def test_probe_mp4_bytes(source_video: Path) -> None:
+    """Tests that an mp4 with the index at the end is probed from bytes."""
+    info = MediaProbe().probe(source_video.read_bytes())
+
+    assert info.video_codec == "h264" and info.audio_codec == "aac"
+    assert round(info.duration) == 120
+    assert info.keyframe_interval == pytest.approx(2)
+
+
+@pytest.mark.parametrize(
+    "value, seconds",
+    [("12.5", 12.5), ("00:01:02.500000000", 62.5), ("N/A", None), (None, None)],
+)
+def test_parse_duration(value: Union[str, None], seconds: Union[float, None]) -> None:
+    """Tests that ffprobe and matroska tag durations are parsed."""
+    assert parse_duration(value) == seconds
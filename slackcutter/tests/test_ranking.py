@@ -0,0 +1,221 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from slackcutter.jobs import Jobs
+from slackcutter.ranking import choose_scene_pairs, scene_keys
+from slackcutter.scenes import PairIndex, SceneTable
+
+TIMESTAMPS = [
+    "last_frame_timestamp_0",
+    "first_frame_timestamp_0",
+    "last_frame_timestamp_1",
+    "first_frame_timestamp_1",
+]
+
+
+def reference_rank(
+    pairs_for_deltas_df: pd.DataFrame,
+    propaility_list: np.ndarray,
+    model_threshold: float,
+) -> pd.DataFrame:
+    """
+    The original rank_modelled_scenes, DataFrame.append replaced with pd.concat.
+
+    :param pairs_for_deltas_df: Pairs with string timestamps, as the JSON stages gave them.
+    :param propaility_list: Model probabilities.
+    :param model_threshold: Probability threshold.
+    :return: target_df.
+    """
+    pairs_for_deltas_df["propaility"] = propaility_list
+    pairs_for_deltas_df["scene_id_0"] = (
+        pairs_for_deltas_df["first_frame_timestamp_0"]
+        + "_"
+        + pairs_for_deltas_df["last_frame_timestamp_0"]
+    )
+    pairs_for_deltas_df["scene_id_1"] = (
+        pairs_for_deltas_df["first_frame_timestamp_1"]
+        + "_"
+        + pairs_for_deltas_df["last_frame_timestamp_1"]
+    )
+    pairs_for_deltas_df = pairs_for_deltas_df.loc[
+        pairs_for_deltas_df["propaility"] > model_threshold
+    ]
+
+    chosen_frames = []
+    no_repeats_list: list = []
+
+    for scene_index in list(pairs_for_deltas_df["scene_id_0"].unique()):
+        temp_df = pairs_for_deltas_df.loc[
+            pairs_for_deltas_df["scene_id_0"] == scene_index
+        ].sort_values(by=["median_mean_hits_mean_0_1"], ascending=False)
+        temp_df = temp_df.reset_index()
+        for column in TIMESTAMPS:
+            temp_df[column] = temp_df[column].astype(int)
+        temp_df["timestamp_check"] = (
+            temp_df["last_frame_timestamp_0"] - temp_df["first_frame_timestamp_1"]
+        )
+
+        ult_temp_df = (
+            temp_df.loc[
+                (
+                    temp_df["median_mean_hits_mean_0_1"]
+                    == temp_df["median_mean_hits_mean_0_1"][0]
+                )
+                & (temp_df["timestamp_check"] != -1)
+            ]
+            .sort_values(by=["first_frame_timestamp_1"], ascending=True)
+            .reset_index(drop=True)
+        )
+        ult_temp_df = ult_temp_df.loc[
+            ult_temp_df["scene_id_1"].apply(lambda x: x not in no_repeats_list)
+        ].reset_index(drop=True)[0:1]
+        chosen_frames.append(ult_temp_df)
+        try:
+            no_repeats_list.append(ult_temp_df["scene_id_1"][0])
+        except KeyError:
+            pass
+
+        if len(ult_temp_df) == 0:
+            schet_temp = 1
+            stopper = 0
+            while stopper == 0:
+                try:
+                    ult_temp_df = (
+                        temp_df.loc[
+                            (
+                                temp_df["median_mean_hits_mean_0_1"]
+                                == temp_df["median_mean_hits_mean_0_1"][schet_temp]
+                            )
+                            & (temp_df["timestamp_check"] != -1)
+                        ]
+                        .sort_values(by=["first_frame_timestamp_1"], ascending=True)
+                        .reset_index(drop=True)
+                    )
+                    ult_temp_df = ult_temp_df.loc[
+                        ult_temp_df["scene_id_1"].apply(
+                            lambda x: x not in no_repeats_list,
+                        )
+                    ].reset_index(drop=True)[0:1]
+                    chosen_frames.append(ult_temp_df)
+                    no_repeats_list.append(ult_temp_df["scene_id_1"][0])
+                    if len(ult_temp_df) != 0:
+                        stopper += 1
+                except KeyError:
+                    if schet_temp > len(
+                        pairs_for_deltas_df["median_mean_hits_mean_0_1"].unique(),
+                    ):
+                        stopper += 1
+
+                    schet_temp += 1
+
+        no_repeats_list = list(set(no_repeats_list))
+
+    df_chosen_scenes = pd.concat(
+        [frame for frame in chosen_frames if len(frame)],
+    ).reset_index(drop=True)
+
+    return df_chosen_scenes.sort_values(by=["propaility"], ascending=False)[
+        TIMESTAMPS
+    ].reset_index(drop=True)
+
+
+def synthetic_pairs(seed: int) -> pd.DataFrame:
+    """
+    Return the pair frame of random media with coarse median hit levels.
+
+    :param seed: Random seed.
+    :return: pairs_for_deltas_df.
+    """
+    rng = np.random.default_rng(seed)
+    seconds = int(rng.integers(60, 160))
+    frame_pixels = rng.integers(0, 256, (seconds, 6, 3)).astype(np.uint8)
+    audio_stats = rng.integers(-2000, 2000, (seconds, 4))
+
+    fin_deltas_df = Jobs.pixel_delta_analizer_job7(
+        frame_pixels,
+        np.hstack((audio_stats, Jobs.audio_hit_flags(audio_stats, 25, 75))),
+    )
+    df_cropframes = Jobs.scene_mapping(
+        Jobs.scenes_split_on_median(fin_deltas_df, 1),
+        0,
+        int(rng.integers(3, 6)),
+    )
+    scenes = SceneTable.from_cropframes(df_cropframes, fin_deltas_df)
+
+    return PairIndex(len(scenes)).to_frame(scenes)
+
+
+@pytest.mark.parametrize("seed", range(12))
+@pytest.mark.parametrize("model_threshold", [0.2, 0.6])
+def test_ranking_matches_original(seed: int, model_threshold: float) -> None:
+    """Tests that the sorted ranking chooses the pairs of the original group loop."""
+    pairs_for_deltas_df = synthetic_pairs(seed)
+    propaility = np.random.default_rng(seed).uniform(0, 1, len(pairs_for_deltas_df))
+
+    target_df = Jobs.rank_modelled_scenes(
+        pairs_for_deltas_df,
+        propaility,
+        model_threshold,
+    )
+    expected = reference_rank(
+        pairs_for_deltas_df.astype({column: str for column in TIMESTAMPS}),
+        propaility,
+        model_threshold,
+    )
+
+    assert len(expected)
+    pd.testing.assert_frame_equal(target_df[TIMESTAMPS], expected)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_ranking_grid_matches_original(seed: int) -> None:
+    """Tests that one ranking over a threshold grid gives the original ranking of every threshold."""
+    rng = np.random.default_rng(seed)
+    # повторы пар старый цикл выбирает по порядку нестабильной сортировки, их убираем;
+    # группы scene_0 вперемешку, порядок групп берется из первой прошедшей пары
+    pairs_for_deltas_df = synthetic_pairs(seed).drop_duplicates(TIMESTAMPS)
+    pairs_for_deltas_df = pairs_for_deltas_df.iloc[
+        rng.permutation(len(pairs_for_deltas_df))
+    ].reset_index(drop=True)
+    propaility = rng.uniform(0, 1, len(pairs_for_deltas_df))
+    model_thresholds = [0.9, 0.1, 0.5, 0.99, 1.0]
+
+    target_dfs = Jobs.rank_modelled_scenes_grid(
+        pairs_for_deltas_df,
+        propaility,
+        model_thresholds,
+    )
+
+    assert len(target_dfs) == len(model_thresholds)
+    for model_threshold, target_df in zip(model_thresholds, target_dfs):
+        if (propaility > model_threshold).any():
+            expected = reference_rank(
+                pairs_for_deltas_df.astype({column: str for column in TIMESTAMPS}),
+                propaility,
+                model_threshold,
+            )
+            pd.testing.assert_frame_equal(target_df[TIMESTAMPS], expected)
+        else:
+            assert len(target_df) == 0
+
+
+def test_choose_scene_pairs_skips_used() -> None:
+    """Tests that a used scene_1 is skipped and an adjacent scene_1 is never chosen."""
+    first = np.array([0, 0, 0, 1, 1])
+    second_start = np.array([10, 20, 30, 10, 20])
+    timestamp_check = np.array([-1, -5, -15, -3, -13])
+    keys = scene_keys(second_start, second_start + 5)
+
+    chosen = choose_scene_pairs(
+        first,
+        keys,
+        second_start,
+        timestamp_check,
+        np.array([0.5, 0.5, 0.5, 0.5, 0.5]),
+        1,
+        set(),
+    )
+
+    assert chosen.tolist() == [1, 3]
+    assert len(choose_scene_pairs(*[np.empty(0)] * 5, 0, set())) == 0
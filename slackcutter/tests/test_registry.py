@@ -0,0 +1,52 @@
+import os
+from pathlib import Path
+
+from slackcutter.registry import ModelRegistry
+
+
+def test_preload_skips_broken_models(trained_model: Path, tmp_path: Path) -> None:
+    """Tests that one missing or broken model doesn't stop preloading the others."""
+    broken = tmp_path / "broken.joblib"
+    broken.write_bytes(b"not a pickle")
+    missing = tmp_path / "missing.joblib"
+    registry = ModelRegistry()
+
+    failed = registry.preload([missing, trained_model, broken])
+
+    assert sorted(failed) == sorted([missing.as_posix(), broken.as_posix()])
+    assert len(registry) == 1
+    assert registry.get(trained_model) is registry.get(trained_model)
+
+
+def test_get_reloads_changed_model(trained_model: Path, tmp_path: Path) -> None:
+    """Tests that a model file with a new mtime is loaded again and replaces the old entry."""
+    model_path = tmp_path / "forest.joblib"
+    model_path.write_bytes(trained_model.read_bytes())
+    registry = ModelRegistry(mmap_mode=None)
+    model = registry.get(model_path)
+
+    mtime_ns = model_path.stat().st_mtime_ns + 1_000_000_000
+    os.utime(model_path, ns=(mtime_ns, mtime_ns))
+    reloaded = registry.get(model_path)
+
+    assert reloaded is not model
+    assert registry.get(model_path) is reloaded
+    assert len(registry) == 1
+
+
+def test_get_evicts_least_recently_used(trained_model: Path, tmp_path: Path) -> None:
+    """Tests that past max_models the least recently used model is dropped."""
+    model_paths = []
+    for name in ("first", "second", "third"):
+        model_paths.append(tmp_path / f"{name}.joblib")
+        model_paths[-1].write_bytes(trained_model.read_bytes())
+    registry = ModelRegistry(max_models=2, mmap_mode=None)
+    first = registry.get(model_paths[0])
+    second = registry.get(model_paths[1])
+
+    assert registry.get(model_paths[0]) is first
+    registry.get(model_paths[2])
+
+    assert len(registry) == 2
+    assert registry.get(model_paths[0]) is first
+    assert registry.get(model_paths[1]) is not second
@@ -0,0 +1,226 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from slackcutter.jobs import Jobs
+from slackcutter.scenes import PairIndex, SceneTable
+
+
+def synthetic_deltas(seed: int) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Return pixel_delta_analizer_job7 and scene_mapping frames of random media.
+
+    :param seed: Random seed.
+    :return: fin_deltas_df and df_cropframes.
+    """
+    rng = np.random.default_rng(seed)
+    seconds = int(rng.integers(30, 150))
+    frame_pixels = rng.integers(0, 256, (seconds, 6, 3)).astype(np.uint8)
+    audio_stats = rng.integers(-2000, 2000, (seconds, 4))
+
+    fin_deltas_df = Jobs.pixel_delta_analizer_job7(
+        frame_pixels,
+        np.hstack((audio_stats, Jobs.audio_hit_flags(audio_stats, 25, 75))),
+    )
+    frames_map = Jobs.scenes_split_on_median(
+        fin_deltas_df,
+        float(rng.choice([1, 1.5, 2])),
+    )
+    crop_interval = [int(rng.integers(0, 2)), int(rng.integers(3, 8))]
+
+    return fin_deltas_df, Jobs.scene_mapping(frames_map, *crop_interval)
+
+
+def reference_pairs(
+    fin_deltas_df: pd.DataFrame,
+    df_cropframes: pd.DataFrame,
+) -> list[dict]:
+    """
+    Scene pairs the way the original create_all_single_scenes, create_all_scenes_combinations,
+    create_frame_deltas_pairs and add_median_hit_statistics built them, one dict per pair.
+
+    :param fin_deltas_df: Per-second pixel lists and audio columns.
+    :param df_cropframes: Scenes with start_sec and end_sec columns.
+    :return: Pairs.
+    """
+    scenes = []
+    for ind in range(len(df_cropframes)):
+        rows = fin_deltas_df[
+            df_cropframes["start_sec"][ind] : df_cropframes["end_sec"][ind] + 1
+        ].reset_index()
+        values = rows.values.tolist()
+        hits = rows["удар_по_медиане"].tolist()
+        scenes.append(
+            {
+                "first_frame_rgb": values[0][1:7],
+                "last_frame_rgb": values[-1][1:7],
+                "first_frame_timestamp": values[0][0],
+                "last_frame_timestamp": values[-1][0],
+                "median_mean_hits": sum(hits) / len(hits),
+            },
+        )
+
+    pairs = []
+    for first, second in combinations(range(len(scenes) - 1), 2):
+        pair = {f"{key}_0": value for key, value in scenes[first].items()}
+        pair.update({f"{key}_1": value for key, value in scenes[second].items()})
+        pair["median_mean_hits_mean_0_1"] = (
+            pair["median_mean_hits_0"] + pair["median_mean_hits_1"]
+        ) / 2
+        pairs.append(pair)
+
+    return pairs
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_pair_frame_matches_original(seed: int) -> None:
+    """Tests that SceneTable and PairIndex give the pairs of the original pandas code."""
+    fin_deltas_df, df_cropframes = synthetic_deltas(seed)
+
+    scenes = SceneTable.from_cropframes(df_cropframes, fin_deltas_df)
+    pairs_for_deltas_df = PairIndex(len(scenes)).to_frame(scenes)
+    expected = reference_pairs(fin_deltas_df, df_cropframes)
+
+    assert len(pairs_for_deltas_df) == len(expected)
+    for column in pairs_for_deltas_df:
+        assert pairs_for_deltas_df[column].tolist() == [
+            pair[column] for pair in expected
+        ]
+
+
+def test_pair_index_skips_last_scene() -> None:
+    """Tests that pairs follow combinations order and never use the last scene."""
+    pairs = PairIndex(5)
+
+    assert list(zip(pairs.first.tolist(), pairs.second.tolist())) == list(
+        combinations(range(4), 2),
+    )
+    assert len(PairIndex(0)) == len(PairIndex(1)) == len(PairIndex(2)) == 0
+
+
+def test_from_bounds_matches_cropframes() -> None:
+    """Tests that scene boundaries build the same table as scene_mapping frames."""
+    fin_deltas_df, _ = synthetic_deltas(7)
+    frames_map = Jobs.scenes_split_on_median(fin_deltas_df, 1.5)
+    pixels = np.array(fin_deltas_df[list(range(6))].to_numpy().tolist(), dtype=np.uint8)
+
+    expected = SceneTable.from_cropframes(
+        Jobs.scene_mapping(frames_map, 1, 5),
+        fin_deltas_df,
+    )
+    scenes = SceneTable.from_bounds(
+        pixels,
+        fin_deltas_df["удар_по_медиане"].to_numpy(),
+        frames_map,
+        1,
+        5,
+    )
+
+    for column in ("start", "end", "first_rgb", "last_rgb", "median_hits"):
+        assert np.array_equal(getattr(scenes, column), getattr(expected, column))
+
+
+def reference_features(
+    pairs: list[dict],
+    max_frame_quantity: int,
+    delta_type: str,
+) -> list:
+    """
+    Model input as the original calculate_rgb_frame_deltas and markup_frame_pixels made it.
+
+    :param pairs: Pairs of reference_pairs.
+    :param max_frame_quantity: Pixels per frame fed to the model (ex: 6).
+    :param delta_type: "mean" or "full".
+    :return: One feature row per pair.
+    """
+    rows = []
+    for pair in pairs:
+        row = []
+        for frame_id in range(max_frame_quantity):
+            temp = [
+                pair["first_frame_rgb_1"][frame_id][rgb_index]
+                - pair["last_frame_rgb_0"][frame_id][rgb_index]
+                for rgb_index in range(3)
+            ]
+            if delta_type == "full":
+                row.extend(temp)
+            else:
+                row.append(sum(temp) / 3)
+        rows.append(row)
+
+    return rows
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("delta_type", ["mean", "full"])
+def test_pair_features_match_original(seed: int, delta_type: str) -> None:
+    """Tests that the float32 feature matrix holds the original per-pair pixel deltas."""
+    fin_deltas_df, df_cropframes = synthetic_deltas(seed)
+
+    scenes = SceneTable.from_cropframes(df_cropframes, fin_deltas_df)
+    features = PairIndex(len(scenes)).features(scenes, 6, delta_type)
+    expected = reference_features(
+        reference_pairs(fin_deltas_df, df_cropframes),
+        6,
+        delta_type,
+    )
+
+    assert features.dtype == np.float32 and features.flags["C_CONTIGUOUS"]
+    assert features.shape == (len(expected), 6 if delta_type == "mean" else 18)
+    assert np.array_equal(
+        features,
+        np.array(expected, dtype=np.float32).reshape(features.shape),
+    )
+
+
+def test_pair_features_unknown_delta_type() -> None:
+    """Tests that an unknown delta_type is rejected."""
+    fin_deltas_df, df_cropframes = synthetic_deltas(0)
+    scenes = SceneTable.from_cropframes(df_cropframes, fin_deltas_df)
+
+    with pytest.raises(Exception, match="Unknown delta_type"):
+        PairIndex(len(scenes)).features(scenes, 6, "median")
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("neighbours", [1, 2, 4])
+def test_nearest_pairs_are_later_neighbours(seed: int, neighbours: int) -> None:
+    """Tests that nearest pairing keeps a sorted subset of all pairs, k later scenes each."""
+    fin_deltas_df, df_cropframes = synthetic_deltas(seed)
+    scenes = SceneTable.from_cropframes(df_cropframes, fin_deltas_df)
+    all_pairs = PairIndex(len(scenes))
+
+    pairs = PairIndex.nearest(scenes, neighbours, 6)
+
+    found = list(zip(pairs.first.tolist(), pairs.second.tolist()))
+    expected = list(zip(all_pairs.first.tolist(), all_pairs.second.tolist()))
+    assert found == sorted(set(found) & set(expected))
+    paired = len(scenes) - 1
+    assert paired > neighbours + 1
+    assert np.bincount(pairs.first, minlength=paired - 1).tolist() == [
+        min(neighbours, paired - 1 - first) for first in range(paired - 1)
+    ]
+
+
+@pytest.mark.parametrize("extra", [0, 1, 10])
+def test_nearest_with_enough_neighbours_pairs_all(extra: int) -> None:
+    """Tests that k of at least n - 2 neighbours gives every combination."""
+    fin_deltas_df, df_cropframes = synthetic_deltas(3)
+    scenes = SceneTable.from_cropframes(df_cropframes, fin_deltas_df)
+
+    pairs = PairIndex.nearest(scenes, len(scenes) - 2 + extra, 6)
+    expected = PairIndex(len(scenes))
+
+    assert pairs.first.tolist() == expected.first.tolist()
+    assert pairs.second.tolist() == expected.second.tolist()
+
+
+def test_nearest_rejects_negative_neighbours() -> None:
+    """Tests that a negative neighbour count is rejected."""
+    fin_deltas_df, df_cropframes = synthetic_deltas(0)
+    scenes = SceneTable.from_cropframes(df_cropframes, fin_deltas_df)
+
+    with pytest.raises(Exception, match="non-negative"):
+        PairIndex.nearest(scenes, -1, 6)
@@ -0,0 +1,120 @@
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from slackcutter.core import SlackCutter
+from slackcutter.jobs import Jobs
+from slackcutter.scenes import PairIndex, SceneTable
+from slackcutter.streaming import PairStream, iter_scene_bounds, iter_pair_blocks
+from slackcutter.workspace import Workspace
+
+
+def synthetic_media(seed: int, seconds: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return random frame rows and audio stats with slowly changing loudness.
+
+    :param seed: Random seed.
+    :param seconds: Length.
+    :return: Frame pixels (seconds, 6, 3) and audio stats (seconds, 4).
+    """
+    rng = np.random.default_rng(seed)
+    frame_pixels = rng.integers(0, 256, (seconds, 6, 3)).astype(np.uint8)
+    median = rng.normal(0, 500, seconds) + 400 * np.sin(np.arange(seconds) / 5)
+    audio_stats = np.column_stack(
+        (median, median, median - 3000, median + rng.uniform(0, 6000, seconds)),
+    ).astype(np.int64)
+    return frame_pixels, audio_stats
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("neighbours", [0, 3])
+def test_streaming_ranking_matches(
+    seed: int,
+    neighbours: int,
+    trained_model: Path,
+    tmp_path: Path,
+) -> None:
+    """Tests that block-wise streaming ranking matches the in-memory pipeline."""
+    model = joblib.load(trained_model)
+    frame_pixels, audio_stats = synthetic_media(seed, 400)
+    median_hit_modificator = [1.5, 2][seed % 2]
+    crop_interval = [[1, 5], [0, 8]][seed // 2 % 2]
+
+    fin_deltas_df = Jobs.pixel_delta_analizer_job7(
+        frame_pixels,
+        np.hstack((audio_stats, Jobs.audio_hit_flags(audio_stats, 25, 75))),
+    )
+    df_cropframes = Jobs.scene_mapping(
+        Jobs.scenes_split_on_median(fin_deltas_df, median_hit_modificator),
+        *crop_interval,
+    )
+    scenes = SceneTable.from_cropframes(df_cropframes, fin_deltas_df)
+    pairs = (
+        PairIndex.nearest(scenes, neighbours, 6)
+        if neighbours
+        else PairIndex(len(scenes))
+    )
+    expected = Jobs.rank_modelled_scenes(
+        pairs.to_frame(scenes),
+        model.predict_proba(pairs.features(scenes, 6, "mean"))[:, 1],
+        0.2,
+    )
+
+    median_hits = Jobs.audio_hit_flags(audio_stats, 25, 75)[:, 0]
+    stream_scenes = SceneTable.from_bounds(
+        frame_pixels,
+        median_hits,
+        iter_scene_bounds(median_hits, median_hit_modificator),
+        *crop_interval,
+    )
+    # блоки по полсотни пар, чтобы группы сцен рвались между блоками
+    pair_stream = PairStream(
+        stream_scenes,
+        tmp_path,
+        memory_limit=16 * 1024,
+        pairs=PairIndex.nearest(stream_scenes, neighbours, 6) if neighbours else None,
+    )
+    pair_stream.score(model, 0.2, 6, "mean")
+    ranked = pair_stream.rank()
+    pair_stream.cleanup()
+
+    assert pair_stream.blocks > 1
+    assert len(expected)
+    pd.testing.assert_frame_equal(ranked, expected)
+
+
+def test_pair_blocks_cover_combinations() -> None:
+    """Tests that pair blocks give every combination in order, the last scene unpaired."""
+    first, second = np.concatenate(
+        [np.stack(block) for block in iter_pair_blocks(9, 5)],
+        axis=1,
+    )
+    expected = PairIndex(9)
+
+    assert first.tolist() == expected.first.tolist()
+    assert second.tolist() == expected.second.tolist()
+
+
+def test_streaming_plan_matches(
+    source_video: Path,
+    models_folder: Path,
+    tmp_path: Path,
+) -> None:
+    """Tests that streaming and in-memory SlackCutter plans match on a real video."""
+    plans = []
+    for streaming in (False, True):
+        slack = SlackCutter(
+            source_video.as_posix(),
+            "forest.joblib",
+            max_seconds_length=30,
+            workspace=Workspace(tmp_path / f"streaming_{streaming}"),
+            streaming=streaming,
+        )
+        plans.append(slack.plan())
+        slack.workspace.cleanup()
+
+    assert len(plans[0])
+    pd.testing.assert_frame_equal(plans[1], plans[0])
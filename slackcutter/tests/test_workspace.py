@@ -0,0 +1,45 @@
+from pathlib import Path
+
+from slackcutter.workspace import Workspace
+
+
+def test_default_workspaces_are_separate() -> None:
+    """Tests that recreating one default workspace keeps another one's clips."""
+    first = Workspace()
+    second = Workspace()
+    try:
+        first.recreate()
+        second.recreate()
+        clip = second.output_dir / "output.mp4"
+        clip.write_bytes(b"clip")
+
+        first.recreate()
+
+        assert first.output_dir != second.output_dir
+        assert clip.read_bytes() == b"clip"
+    finally:
+        first.cleanup()
+        second.cleanup()
+
+    assert not first.temp_dir.exists()
+    assert not second.temp_dir.exists()
+
+
+def test_cleanup_keeps_existing_directories(tmp_path: Path) -> None:
+    """Tests that directories the workspace didn't create are never deleted."""
+    output_dir = tmp_path / "clips"
+    output_dir.mkdir()
+    (output_dir / "done.mp4").write_bytes(b"clip")
+    workspace = Workspace(temp_dir=tmp_path / "slack", output_dir=output_dir)
+
+    workspace.recreate()
+    (workspace.map_dir / "stage.npz").write_bytes(b"stage")
+    workspace.recreate()
+
+    assert (output_dir / "done.mp4").is_file()
+    assert not (workspace.map_dir / "stage.npz").exists()
+
+    workspace.cleanup()
+
+    assert (output_dir / "done.mp4").is_file()
+    assert not workspace.temp_dir.exists()
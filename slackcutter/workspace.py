@@ -0,0 +1,75 @@
+"""Per-job working directories of SlackCutter."""
+import tempfile
+from pathlib import Path
+from shutil import rmtree
+from typing import Union
+
+from slackcutter import config
+
+
+class Workspace:
+    """
+    Set of temp, map, media, images and output directories of a single job.
+
+    Every SlackCutter owns its workspace, so several jobs can run
+    concurrently in one process as long as their workspaces differ.
+    Only directories the workspace created itself are ever deleted.
+    """
+
+    def __init__(
+        self,
+        temp_dir: Union[str, Path, None] = None,
+        output_dir: Union[str, Path, None] = None,
+    ):
+        """
+        Constructor of the workspace.
+
+        :param temp_dir: Directory for temporary job files (ex: temp/<user>/slack).
+                         None - a fresh directory in the system temp folder.
+        :param output_dir: Directory for the final clip (ex: temp/<user>/output).
+                           None - "output" directory inside temp_dir.
+        """
+        self.__created: list[Path] = []
+        if temp_dir is None:
+            temp_dir = tempfile.mkdtemp(prefix="slackcutter-")
+            self.__created.append(Path(temp_dir))
+
+        self.temp_dir = Path(temp_dir)
+        self.output_dir = (
+            Path(output_dir) if output_dir is not None else self.temp_dir / "output"
+        )
+        self.map_dir = self.temp_dir / config.map_folder
+        self.media_dir = self.temp_dir / config.temp_media_folder
+        self.images_dir = self.temp_dir / config.temp_images_folder
+
+    @classmethod
+    def from_config(cls) -> "Workspace":
+        """Return workspace laid out by config.temp_folder and config.output_folder."""
+
+        return cls(config.temp_folder, config.output_folder)
+
+    def recreate(self) -> None:
+        """Creates workspace directories and deletes the ones created before."""
+
+        self.cleanup()
+
+        for directory in (
+            self.temp_dir,
+            self.output_dir,
+            self.map_dir,
+            self.media_dir,
+            self.images_dir,
+        ):
+            # уже существующие папки (общий save, папка пользователя) чужие
+            if not directory.is_dir():
+                directory.mkdir(parents=True, exist_ok=True)
+                self.__created.append(directory)
+
+    def cleanup(self) -> None:
+        """Deletes workspace directories created by this workspace."""
+
+        for directory in self.__created:
+            if directory.is_dir():
+                rmtree(directory)
+
+        self.__created = []